@@ -0,0 +1,98 @@
+"""Denormalized engagement counters stored on ``posts``."""
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.ranking import hot_score
+from app.models import Comment, Post, Rating
+
+
+async def bump_post_counters(db: AsyncSession, post_id: int, **deltas: int) -> bool:
+    """Atomically add ``deltas`` to the named counter columns; return False if the post is gone.
+
+    Runs inside the caller's transaction so the counters, and the hot score derived from
+    them, commit together with the comment/rating row that changed them.
+    """
+    values = {name: getattr(Post, name) + delta for name, delta in deltas.items()}
+    # Engagement is not an edit of the post, so keep updated_at out of the onupdate hook.
+    values["updated_at"] = Post.updated_at
+    # Set from Python for microsecond resolution: SQLite's CURRENT_TIMESTAMP has whole
+    # seconds, and two writes in the same second must still produce different ETags.
+    values["last_interaction_at"] = datetime.utcnow()
+    result = await db.execute(
+        update(Post)
+        .where(Post.id == post_id)
+        .values(**values)
+        .returning(Post.comment_count, Post.rating_sum, Post.created_at)
+    )
+    row = result.one_or_none()
+    if row is None:
+        return False
+    await db.execute(
+        update(Post)
+        .where(Post.id == post_id)
+        .values(hot_score=hot_score(*row), updated_at=Post.updated_at)
+    )
+    return True
+
+
+def _recounted_values() -> dict:
+    """Counter columns recomputed from the comments and ratings tables, correlated on Post."""
+    return {
+        "comment_count": select(func.count(Comment.id)).where(Comment.post_id == Post.id).scalar_subquery(),
+        "rating_sum": select(func.coalesce(func.sum(Rating.score), 0))
+        .where(Rating.post_id == Post.id)
+        .scalar_subquery(),
+        "rating_count": select(func.count(Rating.id)).where(Rating.post_id == Post.id).scalar_subquery(),
+    }
+
+
+async def recount_posts(db: AsyncSession, post_ids: List[int]) -> None:
+    """Recompute counters and hot scores of ``post_ids`` after a bulk delete of their children.
+
+    Two statements however many posts are affected, instead of one ``bump_post_counters``
+    per deleted row.
+    """
+    if not post_ids:
+        return
+    result = await db.execute(
+        update(Post)
+        .where(Post.id.in_(post_ids))
+        .values(**_recounted_values(), updated_at=Post.updated_at, last_interaction_at=datetime.utcnow())
+        .returning(Post.id, Post.comment_count, Post.rating_sum, Post.created_at)
+        .execution_options(synchronize_session=False)
+    )
+    scores = [{"post_id": row.id, "score": hot_score(*row[1:])} for row in result.all()]
+    if scores:
+        table = Post.__table__
+        await db.execute(
+            update(table)
+            .where(table.c.id == bindparam("post_id"))
+            .values(hot_score=bindparam("score"), updated_at=table.c.updated_at),
+            scores,
+        )
+
+
+async def repair_post_counters(db: AsyncSession, chunk_size: int = 1000) -> int:
+    """Recompute every post's counters from the source tables, ``chunk_size`` posts per statement."""
+    recounted = _recounted_values()
+    repaired = 0
+    last_id = 0
+    while True:
+        result = await db.execute(
+            select(Post.id).where(Post.id > last_id).order_by(Post.id).limit(chunk_size)
+        )
+        ids = result.scalars().all()
+        if not ids:
+            return repaired
+        await db.execute(
+            update(Post)
+            .where(Post.id.between(ids[0], ids[-1]))
+            .values(**recounted, updated_at=Post.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        repaired += len(ids)
+        last_id = ids[-1]
@@ -2,8 +2,21 @@ import os
 from pathlib import Path
 from typing import AsyncGenerator
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy.orm import declarative_base
+from sqlalchemy import event
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, declarative_base
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
+
+from app.core.pool import (
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_TIMEOUT,
+    DB_STATEMENT_CACHE_SIZE,
+    TimedQueuePool,
+    pool_limits,
+)
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 DEFAULT_SQLITE_URL = f"sqlite+aiosqlite:///{BASE_DIR / 'app.db'}"
@@ -11,8 +24,135 @@ DEFAULT_SQLITE_URL = f"sqlite+aiosqlite:///{BASE_DIR / 'app.db'}"
 # Use DATABASE_URL env var when provided, otherwise fall back to a local SQLite file.
 DATABASE_URL = os.getenv("DATABASE_URL", DEFAULT_SQLITE_URL)
 
-engine = create_async_engine(DATABASE_URL, echo=False)
-AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+# SQLite profile: see _configure_sqlite.
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", str(64 * 1024)))
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "8"))
+
+
+def _configure_sqlite(sync_engine, begin: str) -> None:
+    @event.listens_for(sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        # WAL lets readers run alongside the writer, and with synchronous=NORMAL a commit
+        # is an append to the WAL with no fsync (those happen at checkpoints).
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        # Negative cache_size is in KiB rather than pages.
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        # SQLite ignores REFERENCES ... ON DELETE CASCADE unless enabled per connection.
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+        # Leave BEGIN to the "begin" hook below instead of the driver's implicit one, which
+        # is only issued before DML and breaks SAVEPOINT.
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(sync_engine, "begin")
+    def _begin(connection) -> None:
+        connection.exec_driver_sql(begin)
+
+
+def async_url(url: str) -> URL:
+    parsed = make_url(url)
+    if parsed.drivername in ("postgres", "postgresql", "postgresql+psycopg2"):
+        # The app is async end to end: plain postgresql:// URLs get the asyncpg driver.
+        parsed = parsed.set(drivername="postgresql+asyncpg")
+    return parsed
+
+
+def _is_sqlite_file(url: URL) -> bool:
+    return url.get_backend_name() == "sqlite" and bool(url.database) and url.database != ":memory:"
+
+
+def _sqlite_engine(url: URL, pool_size: int, begin: str) -> AsyncEngine:
+    sqlite_engine = create_async_engine(
+        url, echo=False, poolclass=TimedQueuePool, pool_size=pool_size, max_overflow=0, pool_timeout=DB_POOL_TIMEOUT
+    )
+    _configure_sqlite(sqlite_engine.sync_engine, begin)
+    return sqlite_engine
+
+
+def _server_engine(url: URL) -> AsyncEngine:
+    pool_size, max_overflow = pool_limits()
+    connect_args = {}
+    if url.get_driver_name() == "asyncpg":
+        connect_args = {
+            "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            # JIT compilation costs more than it saves on short OLTP queries whose plans
+            # merely look expensive, like the feed's correlated subqueries.
+            "server_settings": {"application_name": "moments-api", "jit": "off"},
+        }
+    return create_async_engine(
+        url,
+        echo=False,
+        poolclass=TimedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+
+
+def create_read_engine(url: str) -> AsyncEngine:
+    """An engine for reads only, e.g. on a replica, with the same pool settings."""
+    parsed = async_url(url)
+    if _is_sqlite_file(parsed):
+        return _sqlite_engine(parsed, SQLITE_READ_POOL_SIZE, "BEGIN")
+    return _server_engine(parsed)
+
+
+_url = async_url(DATABASE_URL)
+if _is_sqlite_file(_url):
+    # One connection writes, so concurrent writers queue on the pool instead of colliding
+    # on the database lock. BEGIN IMMEDIATE takes the lock up front: a deferred
+    # transaction that read first could fail to upgrade with SQLITE_BUSY however long
+    # busy_timeout is.
+    engine = _sqlite_engine(_url, 1, "BEGIN IMMEDIATE")
+    # Where sessions send plain reads.
+    read_engine = create_read_engine(DATABASE_URL)
+elif _url.get_backend_name() == "sqlite":
+    engine = read_engine = create_async_engine(_url, echo=False)
+    _configure_sqlite(engine.sync_engine, "BEGIN")
+else:
+    engine = read_engine = _server_engine(_url)
+
+
+class RoutingSession(Session):
+    """Runs a transaction on ``read_engine`` until its first write, then on ``engine``.
+
+    Reads after the first write stay on the writer connection so they see the
+    transaction's own changes; the next transaction starts on the readers again.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if not self.info.get("writing") and (self._flushing or _is_write(clause)):
+            self.info["writing"] = True
+        return (engine if self.info.get("writing") else read_engine).sync_engine
+
+
+def _is_write(clause) -> bool:
+    if isinstance(clause, UpdateBase):
+        return True
+    return isinstance(clause, TextClause) and not clause.text.lstrip().lower().startswith("select")
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _end_routing(session, transaction) -> None:
+    if transaction.parent is None:
+        session.info.pop("writing", None)
+
+
+if read_engine is engine:
+    AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+else:
+    AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False, sync_session_class=RoutingSession)
+# Sessions that only write, such as app.core.write_queue's batches.
+WriteSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
 
 Base = declarative_base()
 
@@ -20,3 +160,8 @@ Base = declarative_base()
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         yield session
+
+
+def dialect_name(db: AsyncSession) -> str:
+    """``"sqlite"`` or ``"postgresql"``: for the few statements the two spell differently."""
+    return db.get_bind().dialect.name
@@ -0,0 +1,42 @@
+"""Keyset pages of a post's comments and ratings, newest first.
+
+Shared by the post detail (first page) and the ``/posts/{id}/comments`` and
+``/posts/{id}/ratings`` endpoints (following pages), so a cursor handed out by one
+resumes correctly in the other.
+"""
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from app.core.pagination import before_time_key, decode_time_cursor, page_with_cursor
+from app.models import Comment, Rating
+
+
+async def _page(db: AsyncSession, model, post_id: int, cursor: Optional[str], limit: int) -> Tuple[list, Optional[str]]:
+    if limit <= 0:
+        return [], None
+    query = (
+        select(model)
+        .options(joinedload(model.user))
+        .where(model.post_id == post_id)
+        .order_by(model.created_at.desc(), model.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        query = query.where(before_time_key(model.created_at, model.id, *decode_time_cursor(cursor)))
+    result = await db.execute(query)
+    return page_with_cursor(result.scalars().all(), limit, lambda row: (row.created_at, row.id))
+
+
+async def comment_page(
+    db: AsyncSession, post_id: int, cursor: Optional[str], limit: int
+) -> Tuple[List[Comment], Optional[str]]:
+    return await _page(db, Comment, post_id, cursor, limit)
+
+
+async def rating_page(
+    db: AsyncSession, post_id: int, cursor: Optional[str], limit: int
+) -> Tuple[List[Rating], Optional[str]]:
+    return await _page(db, Rating, post_id, cursor, limit)
@@ -0,0 +1,166 @@
+"""Streaming table exports for analytics: NDJSON or CSV, optionally gzipped.
+
+Rows are read with ``yield_per`` (a server-side cursor on Postgres) and encoded one
+batch at a time into the response body, so memory stays at one batch whatever the
+table size. The session is opened inside the body generator rather than taken from a
+dependency: dependencies are closed before a streaming body runs.
+
+Incremental exports: every export covers rows created up to a watermark, sent in the
+``X-Export-Watermark`` header before the body; passing it back as ``since`` exports
+only rows created after it. The watermark trails the clock by
+``EXPORT_WATERMARK_LAG_SECONDS`` (plus the replica's lag, when reading from one) so rows
+still being committed when it was taken are not skipped. Rows are not ordered, and a
+row changed after it was exported (an edited post, its counters) is not exported again.
+"""
+import csv
+import io
+import os
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+from sqlalchemy import JSON, DateTime, Text, cast, select
+from sqlalchemy import Enum as SAEnum
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.serialize import dumps
+from app.models import Comment, Follow, Post, Rating
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+EXPORT_WATERMARK_LAG_SECONDS = float(os.getenv("EXPORT_WATERMARK_LAG_SECONDS", "5"))
+
+WATERMARK_HEADER = "X-Export-Watermark"
+
+EXPORT_COLUMNS = {
+    "posts": (
+        Post.id,
+        Post.user_id,
+        Post.content,
+        Post.media_type,
+        Post.media_urls,
+        Post.comment_count,
+        Post.rating_count,
+        Post.rating_sum,
+        Post.created_at,
+        Post.updated_at,
+    ),
+    "comments": (Comment.id, Comment.post_id, Comment.user_id, Comment.content, Comment.created_at),
+    "ratings": (Rating.id, Rating.post_id, Rating.user_id, Rating.score, Rating.created_at),
+    "follows": (Follow.follower_id, Follow.followed_id, Follow.created_at),
+}
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def watermark(lag_seconds: float = 0.0) -> datetime:
+    """Upper bound of an export started now, as a naive UTC datetime like the stored ones."""
+    until = datetime.utcnow() - timedelta(seconds=EXPORT_WATERMARK_LAG_SECONDS + lag_seconds)
+    return until.replace(microsecond=0)
+
+
+def as_utc(value: datetime) -> datetime:
+    """``value`` as naive UTC, however the client wrote it."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _csv_converter(column) -> Optional[Callable]:
+    """How a column's values are written to CSV; None for plain str/int columns."""
+    kind = column.type
+    if isinstance(kind, SAEnum):
+        return lambda value: getattr(value, "value", value)
+    if isinstance(kind, DateTime):
+        return lambda value: value and value.isoformat()
+    return None
+
+
+def _csv_column(column):
+    # JSON goes out as stored: decoding it only to encode it again doubles the cost of CSV.
+    return cast(column, Text).label(column.key) if isinstance(column.type, JSON) else column
+
+
+# Encoders take a batch of rows and return its bytes; each comes with the body's header.
+Encoder = Tuple[bytes, Callable[[Iterable[tuple]], bytes]]
+
+
+def _ndjson_encoder(columns: Sequence) -> Encoder:
+    names = [column.key for column in columns]
+
+    def encode(rows: Iterable[tuple]) -> bytes:
+        return b"".join(dumps(dict(zip(names, row))) + b"\n" for row in rows)
+
+    return b"", encode
+
+
+def _csv_encoder(columns: Sequence) -> Encoder:
+    # Only the enum and timestamp columns need converting.
+    converters = [(i, convert) for i, column in enumerate(columns) if (convert := _csv_converter(column)) is not None]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def drain() -> bytes:
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    def convert(row: tuple) -> list:
+        row = list(row)
+        for i, converter in converters:
+            row[i] = converter(row[i])
+        return row
+
+    def encode(rows: Iterable[tuple]) -> bytes:
+        writer.writerows(map(convert, rows))
+        return drain()
+
+    writer.writerow([column.key for column in columns])
+    return drain(), encode
+
+
+async def export_rows(
+    sessions: Callable[[], AsyncSession],
+    table: str,
+    fmt: str,
+    since: Optional[datetime],
+    until: datetime,
+    gzip: bool,
+) -> AsyncIterator[bytes]:
+    """Body of an export of ``table`` rows created in ``(since, until]``."""
+    columns = EXPORT_COLUMNS[table]
+    created_at = columns[0].table.c.created_at
+    if fmt == "csv":
+        columns = tuple(_csv_column(column) for column in columns)
+    query = select(*columns).where(created_at <= until)
+    if since is not None:
+        query = query.where(created_at > since)
+    header, encode = (_csv_encoder if fmt == "csv" else _ndjson_encoder)(columns)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+
+    def chunk(data: bytes) -> bytes:
+        return compressor.compress(data) if compressor is not None else data
+
+    if header:
+        yield chunk(header)
+    async with sessions() as db:
+        # Core rows: the ORM's per-row loading would cost more than the encoding.
+        connection = await db.connection()
+        result = await connection.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for partition in result.partitions():
+            data = chunk(encode(partition))
+            if data:
+                yield data
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def filename(table: str, fmt: str, gzip: bool) -> str:
+    return f"{table}.{fmt}" + (".gz" if gzip else "")
+
+
+def export_headers(table: str, fmt: str, gzip: bool, until: datetime) -> Dict[str, str]:
+    return {
+        "Content-Disposition": f'attachment; filename="{filename(table, fmt, gzip)}"',
+        WATERMARK_HEADER: until.isoformat() + "Z",
+    }
@@ -0,0 +1,92 @@
+"""Single-statement feed query.
+
+A feed page needs each post with its author, tags, engagement counters and two
+viewer-specific flags. Author is joined, tags are folded into one aggregated string per
+post and ``is_liked`` is a correlated ``EXISTS`` subquery, so the whole page is fetched in
+one round trip instead of one per relationship. ``is_following`` is answered from the
+viewer's cached followees (:mod:`app.core.follow_graph`) rather than by the database.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Integer, Select, String, bindparam, cast, exists, false, func, select
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.follow_graph import Followees, follow_graph
+from app.models import Post, PostTag, Rating, Tag
+
+# ASCII unit separator: cannot be typed into a tag name by a client.
+_TAG_SEPARATOR = "\x1f"
+
+
+def _tag_list():
+    tag = aliased(Tag)
+    link = aliased(PostTag)
+    return (
+        select(func.aggregate_strings(cast(tag.id, String) + ":" + tag.name, _TAG_SEPARATOR))
+        .select_from(link)
+        .join(tag, tag.id == link.tag_id)
+        .where(link.post_id == Post.id)
+        .correlate(Post)
+        .scalar_subquery()
+    )
+
+
+def _is_liked():
+    viewer_id = bindparam("viewer_id", type_=Integer)
+    rating = aliased(Rating)
+    return exists().where(rating.user_id == viewer_id, rating.post_id == Post.id, rating.score > 0).correlate(Post)
+
+
+# Built once: constructing the correlated subqueries per request is measurable CPU and
+# leaves cyclic garbage behind, which shows up as GC pauses in the p99.
+_TAG_LIST = _tag_list().label("tag_list")
+_IS_LIKED = _is_liked()
+_ANONYMOUS_FEED = select(Post, false().label("is_liked"), _TAG_LIST).options(joinedload(Post.user))
+_VIEWER_FEED = select(Post, _IS_LIKED.label("is_liked"), _TAG_LIST).options(joinedload(Post.user))
+
+
+def feed_query(viewer_id: Optional[int]) -> Select:
+    """``SELECT post, is_liked, tag_list`` with the author eagerly joined."""
+    if viewer_id is None:
+        return _ANONYMOUS_FEED
+    return _VIEWER_FEED.params(viewer_id=viewer_id)
+
+
+async def viewer_followees(db: AsyncSession, viewer_id: Optional[int]) -> Optional[Followees]:
+    """The viewer's followees, for :func:`unpack_feed_rows`; None when anonymous."""
+    if viewer_id is None:
+        return None
+    return await follow_graph.following(db, viewer_id)
+
+
+async def viewer_flags(db: AsyncSession, viewer_id: int, page: List[dict]) -> Dict[int, Tuple[bool, bool]]:
+    """``{post_id: (is_following, is_liked)}`` for a page served from the shared feed cache."""
+    followees = await follow_graph.following(db, viewer_id)
+    result = await db.execute(
+        select(Post.id).where(Post.id.in_([post["id"] for post in page]), _IS_LIKED).params(viewer_id=viewer_id)
+    )
+    liked = set(result.scalars())
+    return {post["id"]: (post["user_id"] in followees, post["id"] in liked) for post in page}
+
+
+def _parse_tags(tag_list: Optional[str]) -> List[Tag]:
+    if not tag_list:
+        return []
+    tags = []
+    for item in tag_list.split(_TAG_SEPARATOR):
+        tag_id, _, name = item.partition(":")
+        tags.append(Tag(id=int(tag_id), name=name))
+    return sorted(tags, key=lambda tag: tag.id)
+
+
+def unpack_feed_rows(rows: Sequence[Row], followees: Optional[Followees]) -> List[Tuple[Post, bool, bool]]:
+    """Attach the aggregated tags to each post and return ``(post, is_following, is_liked)``."""
+    unpacked = []
+    for post, is_liked, tag_list in rows:
+        set_committed_value(post, "tags", _parse_tags(tag_list))
+        is_following = followees is not None and post.user_id in followees
+        unpacked.append((post, is_following, bool(is_liked)))
+    return unpacked
@@ -0,0 +1,118 @@
+"""In-process cache of shared (viewer-independent) feed pages.
+
+Entries are tagged with the version of every scope they were built from: the feed
+filters (``posts``, ``tag:<name>``, ``user:<id>``, ``media:<type>``, ``hot``) and each
+post on the page (``post:<id>``). Writes bump the scopes they touch after committing, so an
+entry whose recorded versions no longer match is treated as a miss and never served.
+Versions are per process; with several workers the TTL bounds how long another
+worker's writes can go unnoticed.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable, List, Optional, Tuple
+
+FEED_CACHE_MAX_ENTRIES = int(os.getenv("FEED_CACHE_MAX_ENTRIES", "512"))
+FEED_CACHE_TTL_SECONDS = float(os.getenv("FEED_CACHE_TTL_SECONDS", "30"))
+
+
+def filter_scopes(
+    tag: Optional[str], user_id: Optional[int], media_type: Optional[str], sort: str = "new"
+) -> List[str]:
+    scopes = []
+    if tag:
+        scopes.append(f"tag:{tag}")
+    if user_id:
+        scopes.append(f"user:{user_id}")
+    if media_type:
+        scopes.append(f"media:{media_type.lower()}")
+    if not scopes:
+        scopes.append("posts")
+    if sort == "hot":
+        # Engagement reorders the hot feed, so comment and rating writes bump "hot" too.
+        scopes.append("hot")
+    return scopes
+
+
+def post_scopes(post_id: int, user_id: int, media_type: str, tag_names: Iterable[str]) -> List[str]:
+    """Every scope whose membership changes when this post is created or deleted."""
+    return [
+        "posts",
+        f"post:{post_id}",
+        f"user:{user_id}",
+        f"media:{media_type.lower()}",
+        *(f"tag:{name}" for name in tag_names),
+    ]
+
+
+class FeedCache:
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, Tuple[Tuple[str, int], ...], Any]]" = OrderedDict()
+        self._versions: dict[str, int] = {}
+        # Bumped on every write; lets a reader detect writes that raced its query.
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, deps, value = entry
+        if expires_at < time.monotonic() or any(self._versions.get(scope, 0) != v for scope, v in deps):
+            del self._entries[key]
+            self.stale += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, scopes: Iterable[str], value: Any, generation: int) -> None:
+        """Store ``value`` unless a write happened since ``generation`` was read."""
+        if generation != self.generation or self.max_entries <= 0:
+            return
+        deps = tuple((scope, self._versions.setdefault(scope, 0)) for scope in set(scopes))
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, deps, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        if len(self._versions) > self.max_entries * 128:
+            self._prune_versions()
+
+    def bump(self, *scopes: str) -> None:
+        self.generation += 1
+        for scope in scopes:
+            # Scopes no cached entry depends on need no version.
+            if scope in self._versions:
+                self._versions[scope] += 1
+
+    def _prune_versions(self) -> None:
+        live = {scope for _, deps, _ in self._entries.values() for scope, _ in deps}
+        self._versions = {scope: v for scope, v in self._versions.items() if scope in live}
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._entries.clear()
+        self._versions.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+feed_cache = FeedCache(FEED_CACHE_MAX_ENTRIES, FEED_CACHE_TTL_SECONDS)
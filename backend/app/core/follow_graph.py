@@ -0,0 +1,153 @@
+"""In-process cache of the follow graph.
+
+Every authenticated feed page and post detail needs "does the viewer follow this
+author". Instead of a correlated subquery per post, each recently active viewer's
+followees are kept here as a sorted ``array('i')``: 4 bytes per id, where a ``set`` of
+ints costs ~60, and a membership test is a binary search.
+
+Users are evicted least recently used first, once the cache holds more than
+``FOLLOW_CACHE_MAX_IDS`` ids in total. ``follow_user`` / ``unfollow_user`` update the
+affected entries in place after committing. Like the feed cache this is per process,
+so entries also expire after ``FOLLOW_CACHE_TTL_SECONDS`` to pick up follows made
+through another worker. Follow counts are not kept here: they are columns on ``users``.
+"""
+import os
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Dict, Iterable, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Follow
+
+FOLLOW_CACHE_MAX_IDS = int(os.getenv("FOLLOW_CACHE_MAX_IDS", "1000000"))
+FOLLOW_CACHE_TTL_SECONDS = float(os.getenv("FOLLOW_CACHE_TTL_SECONDS", "300"))
+
+
+class Followees:
+    """Sorted ids a user follows; supports ``in``, ``len`` and iteration."""
+
+    __slots__ = ("ids",)
+
+    def __init__(self, ids: Iterable[int]) -> None:
+        self.ids = array("i", sorted(ids))
+
+    def __contains__(self, user_id: object) -> bool:
+        i = bisect_left(self.ids, user_id)
+        return i < len(self.ids) and self.ids[i] == user_id
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def add(self, user_id: int) -> None:
+        if user_id not in self:
+            insort(self.ids, user_id)
+
+    def discard(self, user_id: int) -> None:
+        i = bisect_left(self.ids, user_id)
+        if i < len(self.ids) and self.ids[i] == user_id:
+            del self.ids[i]
+
+
+class _Entry:
+    __slots__ = ("followees", "expires_at")
+
+    def __init__(self, followees: Followees, expires_at: float) -> None:
+        self.followees = followees
+        self.expires_at = expires_at
+
+
+class FollowGraphCache:
+    def __init__(self, max_ids: int, ttl_seconds: float) -> None:
+        self.max_ids = max_ids
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._ids = 0
+        # Users with a load in flight, and those of them changed meanwhile: such a load may
+        # have read the graph before the change and must not be stored.
+        self._loading: Dict[int, int] = {}
+        self._changed: Set[int] = set()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def following(self, db: AsyncSession, user_id: int) -> Followees:
+        entry = self._entries.get(user_id)
+        if entry is not None and entry.expires_at >= time.monotonic():
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry.followees
+        self.misses += 1
+        self._loading[user_id] = self._loading.get(user_id, 0) + 1
+        try:
+            result = await db.execute(select(Follow.followed_id).where(Follow.follower_id == user_id))
+            followees = Followees(result.scalars())
+        finally:
+            remaining = self._loading.pop(user_id) - 1
+            changed = user_id in self._changed
+            if remaining:
+                self._loading[user_id] = remaining
+            else:
+                self._changed.discard(user_id)
+        if not changed:
+            self._store(user_id, followees)
+        return followees
+
+    def followed(self, follower_id: int, followed_id: int) -> None:
+        """Record a committed follow."""
+        self._apply(follower_id, followed_id, Followees.add)
+
+    def unfollowed(self, follower_id: int, followed_id: int) -> None:
+        """Record a committed unfollow."""
+        self._apply(follower_id, followed_id, Followees.discard)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._ids = 0
+        self._changed.update(self._loading)
+
+    def _store(self, user_id: int, followees: Followees) -> None:
+        if len(followees) > self.max_ids:
+            return
+        self._drop(user_id)
+        self._entries[user_id] = _Entry(followees, time.monotonic() + self.ttl_seconds)
+        self._ids += len(followees)
+        while self._ids > self.max_ids:
+            _, evicted = self._entries.popitem(last=False)
+            self._ids -= len(evicted.followees)
+            self.evictions += 1
+
+    def _drop(self, user_id: int) -> None:
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self._ids -= len(entry.followees)
+
+    def _apply(self, follower_id: int, followed_id: int, change) -> None:
+        if follower_id in self._loading:
+            self._changed.add(follower_id)
+        entry = self._entries.get(follower_id)
+        if entry is not None:
+            before = len(entry.followees)
+            change(entry.followees, followed_id)
+            self._ids += len(entry.followees) - before
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "users": len(self._entries),
+            "ids": self._ids,
+            "max_ids": self.max_ids,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+follow_graph = FollowGraphCache(FOLLOW_CACHE_MAX_IDS, FOLLOW_CACHE_TTL_SECONDS)
@@ -0,0 +1,136 @@
+"""Follow rows, the denormalized ``users.follower_count`` / ``following_count``, and list pages.
+
+A follow is one ``INSERT ... ON CONFLICT DO NOTHING`` plus one ``UPDATE`` adjusting both
+users' counters, in the caller's transaction; an unfollow is the matching ``DELETE ...
+RETURNING`` and ``UPDATE``. A repeated or concurrent follow of the same user conflicts
+instead of raising, and touches no counter. Profile pages read the counters rather than
+counting rows.
+
+Follower and following lists are paged newest follow first, keyed on
+``(follows.created_at, other user's id)``.
+"""
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import dialect_name
+from app.core.pagination import before_time_key, decode_time_cursor, page_with_cursor
+from app.models import Follow, User
+
+
+async def _bump_follow_counts(db: AsyncSession, follower_id: int, followed_id: int, delta: int) -> None:
+    # Both rows in one statement, locked in index order whichever way round the follow is.
+    await db.execute(
+        update(User)
+        .where(User.id.in_((follower_id, followed_id)))
+        .values(
+            following_count=case(
+                (User.id == follower_id, User.following_count + delta), else_=User.following_count
+            ),
+            follower_count=case(
+                (User.id == followed_id, User.follower_count + delta), else_=User.follower_count
+            ),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def add_follow(db: AsyncSession, follower_id: int, followed_id: int) -> bool:
+    """Insert the follow and bump both counters; False if it already existed."""
+    dialect = postgresql if dialect_name(db) == "postgresql" else sqlite
+    table = Follow.__table__
+    result = await db.execute(
+        dialect.insert(table)
+        .values(follower_id=follower_id, followed_id=followed_id)
+        .on_conflict_do_nothing(index_elements=[table.c.follower_id, table.c.followed_id])
+        .returning(table.c.follower_id)
+    )
+    if result.scalar_one_or_none() is None:
+        return False
+    await _bump_follow_counts(db, follower_id, followed_id, 1)
+    return True
+
+
+async def remove_follow(db: AsyncSession, follower_id: int, followed_id: int) -> bool:
+    """Delete the follow and decrement both counters; False if there was none."""
+    result = await db.execute(
+        delete(Follow)
+        .where(Follow.follower_id == follower_id, Follow.followed_id == followed_id)
+        .returning(Follow.follower_id)
+    )
+    if result.scalar_one_or_none() is None:
+        return False
+    await _bump_follow_counts(db, follower_id, followed_id, -1)
+    return True
+
+
+def _recounted_values() -> dict:
+    """Counter columns recomputed from the follows table, correlated on User."""
+    followers = select(func.count()).select_from(Follow).where(Follow.followed_id == User.id)
+    following = select(func.count()).select_from(Follow).where(Follow.follower_id == User.id)
+    return {"follower_count": followers.scalar_subquery(), "following_count": following.scalar_subquery()}
+
+
+async def recount_follows(db: AsyncSession, user_ids: Iterable[int]) -> None:
+    """Recompute the counters of ``user_ids`` after a bulk delete of their follows."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    await db.execute(
+        update(User)
+        .where(User.id.in_(user_ids))
+        .values(**_recounted_values())
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def repair_follow_counts(db: AsyncSession, chunk_size: int = 1000) -> int:
+    """Recompute every user's counters from ``follows``, ``chunk_size`` users per statement."""
+    recounted = _recounted_values()
+    repaired = 0
+    last_id = 0
+    while True:
+        result = await db.execute(select(User.id).where(User.id > last_id).order_by(User.id).limit(chunk_size))
+        ids = result.scalars().all()
+        if not ids:
+            return repaired
+        await db.execute(
+            update(User)
+            .where(User.id.between(ids[0], ids[-1]))
+            .values(**recounted)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        repaired += len(ids)
+        last_id = ids[-1]
+
+
+async def _page(
+    db: AsyncSession, user_column, other_column, user_id: int, cursor: Optional[str], limit: int
+) -> Tuple[List[User], Optional[str]]:
+    query = (
+        select(User, Follow.created_at)
+        .join(Follow, other_column == User.id)
+        .where(user_column == user_id)
+        .order_by(Follow.created_at.desc(), other_column.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        query = query.where(before_time_key(Follow.created_at, other_column, *decode_time_cursor(cursor)))
+    result = await db.execute(query)
+    rows, next_cursor = page_with_cursor(result.all(), limit, lambda row: (row.created_at, row.User.id))
+    return [row.User for row in rows], next_cursor
+
+
+async def follower_page(
+    db: AsyncSession, user_id: int, cursor: Optional[str], limit: int
+) -> Tuple[List[User], Optional[str]]:
+    return await _page(db, Follow.followed_id, Follow.follower_id, user_id, cursor, limit)
+
+
+async def following_page(
+    db: AsyncSession, user_id: int, cursor: Optional[str], limit: int
+) -> Tuple[List[User], Optional[str]]:
+    return await _page(db, Follow.follower_id, Follow.followed_id, user_id, cursor, limit)
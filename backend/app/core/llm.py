@@ -1,3 +1,4 @@
+import asyncio
 import json
 import os
 from typing import Any, Dict, List, Optional
@@ -17,6 +18,10 @@ client = AsyncOpenAI(
     max_retries=3
 ) if _api_key else None
 
+# Inference calls in flight at once for a batch of posts
+TAG_INFERENCE_CONCURRENCY = int(os.getenv("TAG_INFERENCE_CONCURRENCY", "8"))
+_inference_slots = asyncio.Semaphore(max(1, TAG_INFERENCE_CONCURRENCY))
+
 
 def _fallback_summary(content: str, mode: str = "summary") -> Dict[str, Any]:
     clean = (content or "").strip()
@@ -81,6 +86,16 @@ async def analyze_content(text: str) -> List[str]:
     return _keyword_tags(text)
 
 
+async def analyze_contents(texts: List[str]) -> List[List[str]]:
+    """:func:`analyze_content` of each text, at most ``TAG_INFERENCE_CONCURRENCY`` at a time."""
+
+    async def analyze(text: str) -> List[str]:
+        async with _inference_slots:
+            return await analyze_content(text)
+
+    return list(await asyncio.gather(*(analyze(text) for text in texts)))
+
+
 async def ask_ai_assistant(
     content: str,
     mode: str = "summary",
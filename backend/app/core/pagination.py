@@ -0,0 +1,79 @@
+"""Opaque keyset cursors shared by the paginated list endpoints."""
+import base64
+import json
+from datetime import datetime, timedelta
+from typing import Any, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_
+from sqlalchemy.sql.elements import ColumnElement
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+_ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+def encode_cursor(*values: Any) -> str:
+    """Pack the sort key of the last row of a page into an opaque string."""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Unpack a cursor produced by :func:`encode_cursor`; raise HTTP 400 if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError("cursor has the wrong shape")
+        return values
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def decode_time_cursor(cursor: str) -> tuple[datetime, int]:
+    """Decode a ``(created_at, id)`` cursor."""
+    created_at, row_id = decode_cursor(cursor, 2)
+    try:
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def decode_score_cursor(cursor: str) -> tuple[float, int]:
+    """Decode a ``(score, id)`` cursor."""
+    score, row_id = decode_cursor(cursor, 2)
+    try:
+        return float(score), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def before_score_key(score_col, id_col, score: float, row_id: int) -> ColumnElement:
+    """Rows strictly after ``(score, row_id)`` in ``score DESC, id DESC`` order."""
+    return or_(score_col < score, and_(score_col == score, id_col < row_id))
+
+
+def before_time_key(created_col, id_col, created_at: datetime, row_id: int) -> ColumnElement:
+    """Rows strictly after ``(created_at, row_id)`` in ``created_at DESC, id DESC`` order.
+
+    SQLite stores ``CURRENT_TIMESTAMP`` defaults without microseconds while bound datetimes
+    are rendered with them, so an exact ``created_col == created_at`` test can miss the very
+    row the cursor was taken from. Comparing against a one-microsecond window behaves the
+    same as a plain equality on Postgres and tolerates both text formats on SQLite.
+    """
+    lower = created_at - _ONE_MICROSECOND
+    upper = created_at + _ONE_MICROSECOND
+    return or_(
+        created_col <= lower,
+        and_(created_col > lower, created_col < upper, id_col < row_id),
+    )
+
+
+def page_with_cursor(rows: list, limit: int, key) -> tuple[list, Optional[str]]:
+    """Trim a ``limit + 1`` fetch to ``limit`` rows and build the cursor for the next page."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*key(rows[-1]))
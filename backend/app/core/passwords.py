@@ -0,0 +1,141 @@
+"""Password hashing off the event loop.
+
+bcrypt is slow on purpose: ~0.3 s of CPU per hash or check at 12 rounds. Run inline in
+``register`` and ``login``, every call froze the worker's event loop for that long, so
+a burst of logins stalled every other request on the worker. Calls now run in a small
+thread pool; bcrypt releases the GIL while it works.
+
+- At most ``PASSWORD_HASH_CONCURRENCY`` calls run at once (default: half the CPUs, at
+  least one), leaving the remaining cores to request handling.
+- On Linux the hashing threads run ``PASSWORD_HASH_NICE`` steps below normal priority,
+  so even on a single core the event loop gets the CPU first and logins take what is
+  left over.
+- Callers queue for a slot. Past ``PASSWORD_HASH_MAX_QUEUE`` waiting, a request fails
+  straight away with 503 rather than waiting behind seconds of queued hashing.
+- Queueing and hashing times are reported in ``GET /stats/pool``.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from app.core.security import hash_password, verify_and_update_password
+
+PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", str(max(1, (os.cpu_count() or 1) // 2))))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+PASSWORD_HASH_NICE = int(os.getenv("PASSWORD_HASH_NICE", "10"))
+
+_RECENT_CALLS = 1000
+
+
+def _lower_priority(nice: int) -> None:
+    # Linux schedules threads individually, so this only affects the calling thread.
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), nice)
+    except (AttributeError, OSError):
+        pass
+
+
+class PasswordHasher:
+    def __init__(self, concurrency: int, max_queue: int, nice: int) -> None:
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max_queue
+        self.nice = nice
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.waiting = 0
+        self.calls = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.queue_seconds_total = 0.0
+        self.queue_seconds_max = 0.0
+        self.recent_queue: deque = deque(maxlen=_RECENT_CALLS)
+        self.recent_run: deque = deque(maxlen=_RECENT_CALLS)
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.concurrency,
+                thread_name_prefix="password-hash",
+                initializer=_lower_priority if self.nice else None,
+                initargs=(self.nice,) if self.nice else (),
+            )
+        return self._executor
+
+    async def _run(self, fn: Callable, *args) -> Any:
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many logins in progress, please retry",
+                headers={"Retry-After": "1"},
+            )
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        started = time.perf_counter()
+        queued = started - queued_at
+        self.calls += 1
+        self.queue_seconds_total += queued
+        self.queue_seconds_max = max(self.queue_seconds_max, queued)
+        self.recent_queue.append(queued)
+
+        loop = asyncio.get_running_loop()
+
+        def done(_) -> None:
+            # When the thread finishes, not when the caller stops waiting: a cancelled
+            # request's hash still holds its slot until the thread is free again.
+            self.recent_run.append(time.perf_counter() - started)
+            try:
+                loop.call_soon_threadsafe(self._slots.release)
+            except RuntimeError:
+                pass  # the loop is closed
+
+        try:
+            future = self._pool().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(done)
+        return await asyncio.wrap_future(future)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+        """``(valid, new_hash)``; ``new_hash`` is set when ``password_hash`` was made with
+        other cost settings than the current ones and should replace it."""
+        return await self._run(verify_and_update_password, password, password_hash)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        queued = sorted(self.recent_queue)
+        run = sorted(self.recent_run)
+        return {
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "waiting": self.waiting,
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "queue_ms_total": round(self.queue_seconds_total * 1000, 1),
+            "queue_ms_max": round(self.queue_seconds_max * 1000, 1),
+            "recent_queue_ms_p50": round(queued[len(queued) // 2] * 1000, 2) if queued else 0.0,
+            "recent_queue_ms_p99": round(queued[int(len(queued) * 0.99)] * 1000, 2) if queued else 0.0,
+            "recent_hash_ms_p50": round(run[len(run) // 2] * 1000, 2) if run else 0.0,
+        }
+
+
+password_hasher = PasswordHasher(PASSWORD_HASH_CONCURRENCY, PASSWORD_HASH_MAX_QUEUE, PASSWORD_HASH_NICE)
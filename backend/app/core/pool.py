@@ -0,0 +1,123 @@
+"""Connection pool settings and usage metrics.
+
+Every engine uses :class:`TimedQueuePool`, SQLAlchemy's asyncio queue pool with a
+timer around checkout, so ``GET /stats/pool`` can show how long requests wait for a
+connection, not only how many are checked out.
+"""
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Dict, Tuple
+
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Fail a request with 503 after this long instead of letting it hang on a drained pool.
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+# Below the usual server/proxy idle timeouts, so a recycled connection is never a dead one.
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+# asyncpg prepared statements cached per connection; 0 behind pgbouncer in transaction mode.
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))
+# Connections the database allows this deployment; each of the WEB_CONCURRENCY worker
+# processes (uvicorn's own setting) gets an equal share. 0 leaves the pool as configured.
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "0"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# Checkouts slower than this count as having waited for a connection.
+_WAIT_THRESHOLD_SECONDS = 0.001
+_RECENT_WAITS = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def pool_limits() -> Tuple[int, int]:
+    """``(pool_size, max_overflow)`` for one worker process, within its connection share."""
+    size, overflow = DB_POOL_SIZE, DB_MAX_OVERFLOW
+    if DB_MAX_CONNECTIONS:
+        share = max(1, DB_MAX_CONNECTIONS // max(1, WEB_CONCURRENCY))
+        size = min(size, share)
+        overflow = min(overflow, share - size)
+    return size, overflow
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """``AsyncAdaptedQueuePool`` that records how long each checkout waited.
+
+    The counters start over when SQLAlchemy recreates the pool (after a disconnect).
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.recent_waits: deque = deque(maxlen=_RECENT_WAITS)
+
+    def connect(self):
+        # Covers queueing for a free connection, opening a new one and the pre-ping.
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.recent_waits.append(waited)
+            if waited >= _WAIT_THRESHOLD_SECONDS:
+                self.waits += 1
+                self.wait_seconds_total += waited
+                self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+
+def pool_stats(engine: AsyncEngine) -> Dict[str, Any]:
+    pool = engine.pool
+    stats: Dict[str, Any] = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(0, pool.overflow()),
+    }
+    if isinstance(pool, TimedQueuePool):
+        recent = sorted(pool.recent_waits)
+        stats.update(
+            max_overflow=pool._max_overflow,
+            timeout_seconds=pool.timeout(),
+            checkouts=pool.checkouts,
+            waits=pool.waits,
+            timeouts=pool.timeouts,
+            wait_ms_total=round(pool.wait_seconds_total * 1000, 1),
+            wait_ms_max=round(pool.wait_seconds_max * 1000, 1),
+            recent_wait_ms_p50=round(recent[len(recent) // 2] * 1000, 2) if recent else 0.0,
+            recent_wait_ms_p99=round(recent[int(len(recent) * 0.99)] * 1000, 2) if recent else 0.0,
+        )
+    return stats
+
+
+async def check_connection_budget(engine: AsyncEngine) -> None:
+    """Warn at startup if all workers' pools together could exceed Postgres' max_connections."""
+    if engine.dialect.name != "postgresql":
+        return
+    async with engine.connect() as conn:
+        max_connections = int((await conn.execute(text("SHOW max_connections"))).scalar_one())
+        reserved = int((await conn.execute(text("SHOW superuser_reserved_connections"))).scalar_one())
+    size, overflow = pool_limits()
+    wanted = WEB_CONCURRENCY * (size + overflow)
+    if wanted > max_connections - reserved:
+        logger.warning(
+            "%d workers x (pool_size %d + max_overflow %d) = %d connections, but the server allows %d; "
+            "set DB_MAX_CONNECTIONS or lower DB_POOL_SIZE/DB_MAX_OVERFLOW",
+            WEB_CONCURRENCY,
+            size,
+            overflow,
+            wanted,
+            max_connections - reserved,
+        )
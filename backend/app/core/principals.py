@@ -0,0 +1,111 @@
+"""In-process cache of authenticated principals, by bearer token.
+
+Every authenticated request used to verify its token and then load the user row, the
+most frequent query of all. A verified token now maps to a snapshot of the columns
+requests use (id, username, nickname, avatar, is_admin, created_at) for up to
+``AUTH_PRINCIPAL_TTL_SECONDS``, and never past the token's own expiry. Logging in
+stores the new token's snapshot straight away.
+
+Changes to a user made through the API call :meth:`PrincipalCache.invalidate` after
+committing (deleting an account does). Invalidation is per process: other workers, and
+changes made outside the API such as ``scripts/create_admin.py``, are seen within the
+TTL, which is therefore the longest a deleted or demoted account can keep its access.
+0 disables the cache.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.models import User
+
+AUTH_PRINCIPAL_TTL_SECONDS = float(os.getenv("AUTH_PRINCIPAL_TTL_SECONDS", "30"))
+AUTH_PRINCIPAL_CACHE_SIZE = int(os.getenv("AUTH_PRINCIPAL_CACHE_SIZE", "10000"))
+
+PRINCIPAL_COLUMNS = (User.id, User.username, User.nickname, User.avatar_url, User.is_admin, User.created_at)
+
+Snapshot = Dict[str, object]
+
+
+def snapshot_of(user: User) -> Snapshot:
+    return {column.key: getattr(user, column.key) for column in PRINCIPAL_COLUMNS}
+
+
+async def load_principal(db: AsyncSession, user_id: int) -> Optional[Snapshot]:
+    """The snapshot of an active user; accounts being purged no longer authenticate."""
+    result = await db.execute(select(*PRINCIPAL_COLUMNS).where(User.id == user_id, User.deleted_at.is_(None)))
+    row = result.one_or_none()
+    return dict(row._mapping) if row is not None else None
+
+
+def principal_user(snapshot: Snapshot) -> User:
+    """A detached ``User`` with only the snapshot's columns loaded; a new one per request,
+    so nothing a request does to it reaches the cache."""
+    user = User(**snapshot)
+    # Detached rather than transient: should it be cascaded into a session it is taken
+    # as the existing row, not inserted again.
+    make_transient_to_detached(user)
+    return user
+
+
+class PrincipalCache:
+    def __init__(self, ttl_seconds: float, max_entries: int) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, float, Snapshot]]" = OrderedDict()
+        # Bumped on every invalidation; lets a loader detect one that raced its query.
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[Snapshot]:
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+        fresh_until, expires_at, snapshot = entry
+        if fresh_until < time.monotonic() or expires_at <= time.time():
+            del self._entries[token]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return snapshot
+
+    def put(self, token: str, expires_at: float, snapshot: Snapshot, generation: int) -> None:
+        """Store ``snapshot`` unless the cache was invalidated since ``generation`` was read."""
+        if generation != self.generation or self.ttl_seconds <= 0 or self.max_entries <= 0:
+            return
+        self._entries[token] = (time.monotonic() + self.ttl_seconds, expires_at, snapshot)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        """Forget every token of ``user_id``; call after committing a change to the user."""
+        self.generation += 1
+        stale = [token for token, (_, _, snapshot) in self._entries.items() if snapshot["id"] == user_id]
+        for token in stale:
+            del self._entries[token]
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+principal_cache = PrincipalCache(AUTH_PRINCIPAL_TTL_SECONDS, AUTH_PRINCIPAL_CACHE_SIZE)
@@ -0,0 +1,171 @@
+"""Deleting users and posts without loading what they own.
+
+Every foreign key is declared ``ON DELETE CASCADE`` and the relationships use
+``passive_deletes``, so deleting a post row removes its comments, ratings, tags and
+timeline entries inside the database. A user is purged in chunks instead of through one
+cascading delete: their comments and ratings on other people's posts first (fixing
+those posts' counters), then their posts, follows and timeline, then the user row.
+Each chunk is its own short transaction, so a heavy account never holds SQLite's write
+lock for long, and a purge interrupted by a restart picks up where it stopped: the user
+stays marked with ``deleted_at`` until the final step.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import List, Set
+
+from sqlalchemy import delete, func, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import search
+from app.core.counters import recount_posts
+from app.core.feed_cache import feed_cache
+from app.core.follow_graph import follow_graph
+from app.core.follows import recount_follows
+from app.core.suggestions import mark_stale
+from app.core.uploads import remove_uploads
+from app.models import Comment, Follow, Post, Rating, TimelineEntry, User
+
+PURGE_CHUNK_SIZE = int(os.getenv("PURGE_CHUNK_SIZE", "500"))
+# Users owning at most this many posts, comments and ratings are purged within the request.
+PURGE_INLINE_MAX_ROWS = int(os.getenv("PURGE_INLINE_MAX_ROWS", "2000"))
+# Sleep between a background purge's chunks so interactive writes are not starved.
+PURGE_CHUNK_PAUSE_SECONDS = float(os.getenv("PURGE_CHUNK_PAUSE_SECONDS", "0.05"))
+
+logger = logging.getLogger(__name__)
+
+# Strong references to running purge tasks; the event loop only keeps weak ones.
+_purge_tasks: Set[asyncio.Task] = set()
+
+
+async def delete_post(db: AsyncSession, post: Post) -> None:
+    """Delete one post and, after committing, its uploaded media."""
+    media_urls = list(post.media_urls or [])
+    await search.unindex_posts(db, [post.id])
+    await db.delete(post)
+    await db.commit()
+    await remove_uploads(media_urls)
+
+
+async def owned_rows(db: AsyncSession, user_id: int) -> int:
+    """How many posts, comments and ratings a purge of ``user_id`` has to delete."""
+    counts = [
+        select(func.count()).select_from(model).where(model.user_id == user_id).scalar_subquery()
+        for model in (Post, Comment, Rating)
+    ]
+    result = await db.execute(select(counts[0] + counts[1] + counts[2]))
+    return result.scalar_one()
+
+
+async def _commit_chunk(db: AsyncSession, pause: float) -> None:
+    await db.commit()
+    if pause:
+        # Let other writers take the (SQLite) write lock between chunks.
+        await asyncio.sleep(pause)
+
+
+async def _purge_engagement(db: AsyncSession, model, user_id: int, chunk_size: int, pause: float) -> None:
+    """Delete the user's comments or ratings and recount the posts they were on."""
+    while True:
+        result = await db.execute(select(model.id, model.post_id).where(model.user_id == user_id).limit(chunk_size))
+        rows = result.all()
+        if not rows:
+            return
+        post_ids = sorted({post_id for _, post_id in rows})
+        await db.execute(delete(model).where(model.id.in_([row_id for row_id, _ in rows])))
+        await recount_posts(db, post_ids)
+        await _commit_chunk(db, pause)
+        feed_cache.bump(*(f"post:{post_id}" for post_id in post_ids), "hot")
+
+
+async def _purge_posts(db: AsyncSession, user_id: int, chunk_size: int, pause: float) -> None:
+    while True:
+        result = await db.execute(select(Post.id, Post.media_urls).where(Post.user_id == user_id).limit(chunk_size))
+        rows = result.all()
+        if not rows:
+            return
+        post_ids = [post_id for post_id, _ in rows]
+        await search.unindex_posts(db, post_ids)
+        # Comments, ratings, post_tags and timeline entries follow by ON DELETE CASCADE.
+        await db.execute(delete(Post).where(Post.id.in_(post_ids)))
+        await _commit_chunk(db, pause)
+        await remove_uploads(url for _, urls in rows for url in (urls or []))
+
+
+async def _purge_graph(db: AsyncSession, user_id: int, chunk_size: int, pause: float) -> None:
+    while True:
+        result = await db.execute(
+            select(Follow.follower_id, Follow.followed_id)
+            .where(or_(Follow.follower_id == user_id, Follow.followed_id == user_id))
+            .limit(chunk_size)
+        )
+        pairs = [tuple(row) for row in result.all()]
+        if not pairs:
+            break
+        await db.execute(delete(Follow).where(tuple_(Follow.follower_id, Follow.followed_id).in_(pairs)))
+        # The other side of each removed follow loses a follower or a followee.
+        await recount_follows(db, {b if a == user_id else a for a, b in pairs})
+        # Suggestions of the user's followers ran through them.
+        await mark_stale(db, [a for a, b in pairs if b == user_id])
+        await _commit_chunk(db, pause)
+    while True:
+        result = await db.execute(
+            select(TimelineEntry.post_id).where(TimelineEntry.user_id == user_id).limit(chunk_size)
+        )
+        post_ids = result.scalars().all()
+        if not post_ids:
+            return
+        await db.execute(
+            delete(TimelineEntry).where(TimelineEntry.user_id == user_id, TimelineEntry.post_id.in_(post_ids))
+        )
+        await _commit_chunk(db, pause)
+
+
+async def purge_user(
+    db: AsyncSession, user_id: int, chunk_size: int = PURGE_CHUNK_SIZE, pause: float = 0.0
+) -> None:
+    """Delete everything ``user_id`` owns in ``chunk_size`` batches, then the user.
+
+    ``pause`` seconds are slept after each chunk's commit, to throttle background purges.
+    """
+    await _purge_engagement(db, Comment, user_id, chunk_size, pause)
+    await _purge_engagement(db, Rating, user_id, chunk_size, pause)
+    await _purge_posts(db, user_id, chunk_size, pause)
+    await _purge_graph(db, user_id, chunk_size, pause)
+
+    avatar_url = (await db.execute(select(User.avatar_url).where(User.id == user_id))).scalar_one_or_none()
+    await db.execute(delete(User).where(User.id == user_id))
+    await db.commit()
+    await remove_uploads([avatar_url] if avatar_url else [])
+    feed_cache.clear()
+    follow_graph.clear()
+
+
+async def _run_purge(session_factory, user_id: int) -> None:
+    started = datetime.utcnow()
+    try:
+        async with session_factory() as db:
+            await purge_user(db, user_id, pause=PURGE_CHUNK_PAUSE_SECONDS)
+    except Exception:
+        # deleted_at stays set, so the purge is retried on the next startup.
+        logger.exception("purge of user %s failed", user_id)
+    else:
+        logger.info("purged user %s in %.1fs", user_id, (datetime.utcnow() - started).total_seconds())
+
+
+def schedule_user_purge(session_factory, user_id: int) -> None:
+    """Purge ``user_id`` in a background task; the user must already be marked deleted."""
+    task = asyncio.create_task(_run_purge(session_factory, user_id))
+    _purge_tasks.add(task)
+    task.add_done_callback(_purge_tasks.discard)
+
+
+async def resume_pending_purges(session_factory) -> List[int]:
+    """Restart purges of users marked deleted whose purge did not finish (e.g. a restart)."""
+    async with session_factory() as db:
+        result = await db.execute(select(User.id).where(User.deleted_at.is_not(None)))
+        user_ids = result.scalars().all()
+    for user_id in user_ids:
+        schedule_user_purge(session_factory, user_id)
+    return user_ids
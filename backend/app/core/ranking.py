@@ -0,0 +1,118 @@
+"""Time-decayed "hot" score stored on ``posts.hot_score``.
+
+The score is ``ln(1 + engagement) + decay * created_at``. At any instant this orders
+posts exactly like ``(1 + engagement) * 2 ** (-age / half_life)``, but it is expressed
+in log space relative to a fixed epoch, so a stored score never has to be lowered as
+the post ages. Writes refresh a single post's score from its counters, and
+:func:`redecay_hot_scores` periodically re-derives the scores of recent posts so a
+counter repair is reflected in the ranking.
+
+Scores made with different weights or half-lives are on different scales and cannot be
+ordered against each other, so a change of either rescores every post, not only the
+recent ones: ``hot_score_params`` records what the stored scores were computed with, and
+the first re-decay pass after a change (at startup) redoes them all.
+"""
+import asyncio
+import logging
+import math
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.feed_cache import feed_cache
+from app.models import HotScoreParams, Post
+
+HOT_HALF_LIFE_HOURS = float(os.getenv("HOT_HALF_LIFE_HOURS", "12"))
+HOT_COMMENT_WEIGHT = float(os.getenv("HOT_COMMENT_WEIGHT", "2"))
+HOT_REDECAY_INTERVAL_SECONDS = float(os.getenv("HOT_REDECAY_INTERVAL_SECONDS", "600"))
+HOT_REDECAY_WINDOW_DAYS = float(os.getenv("HOT_REDECAY_WINDOW_DAYS", "7"))
+
+_DECAY_PER_SECOND = math.log(2) / (HOT_HALF_LIFE_HOURS * 3600)
+_EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+logger = logging.getLogger(__name__)
+
+
+def hot_score(comment_count: int, rating_sum: int, created_at: datetime) -> float:
+    if created_at.tzinfo is None:
+        # SQLite hands back naive datetimes; they are stored in UTC.
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    engagement = max(HOT_COMMENT_WEIGHT * comment_count + rating_sum, 0)
+    return math.log1p(engagement) + _DECAY_PER_SECOND * (created_at - _EPOCH).total_seconds()
+
+
+async def redecay_hot_scores(db: AsyncSession, window_days: Optional[float], chunk_size: int = 1000) -> int:
+    """Recompute ``hot_score`` for posts newer than ``window_days``.
+
+    With ``window_days=None`` every post is rescored, and the current parameters are then
+    recorded as the ones the stored scores use.
+    """
+    table = Post.__table__
+    refresh = (
+        update(table)
+        .where(table.c.id == bindparam("post_id"))
+        .values(hot_score=bindparam("score"), updated_at=table.c.updated_at)
+    )
+    query = select(Post.id, Post.comment_count, Post.rating_sum, Post.created_at).order_by(Post.id)
+    if window_days is not None:
+        query = query.where(Post.created_at >= datetime.utcnow() - timedelta(days=window_days))
+
+    refreshed = 0
+    last_id = 0
+    while True:
+        result = await db.execute(query.where(Post.id > last_id).limit(chunk_size))
+        rows = result.all()
+        if not rows:
+            if window_days is None:
+                await _record_params(db)
+            return refreshed
+        await db.execute(
+            refresh,
+            [{"post_id": row.id, "score": hot_score(row.comment_count, row.rating_sum, row.created_at)} for row in rows],
+        )
+        await db.commit()
+        refreshed += len(rows)
+        last_id = rows[-1].id
+
+
+async def _record_params(db: AsyncSession) -> None:
+    await db.merge(
+        HotScoreParams(
+            id=1,
+            half_life_hours=HOT_HALF_LIFE_HOURS,
+            comment_weight=HOT_COMMENT_WEIGHT,
+            rescored_at=datetime.now(timezone.utc),
+        )
+    )
+    await db.commit()
+
+
+async def params_changed(db: AsyncSession) -> bool:
+    """Whether the stored scores were computed with another weight or half-life (or are unrecorded)."""
+    stored = await db.get(HotScoreParams, 1)
+    return stored is None or (stored.half_life_hours, stored.comment_weight) != (
+        HOT_HALF_LIFE_HOURS,
+        HOT_COMMENT_WEIGHT,
+    )
+
+
+async def run_redecay_loop(session_factory) -> None:
+    """Background task started with the app: re-derive recent scores every interval.
+
+    A pass rescores every post instead when the parameters changed; the first pass runs at
+    startup so a change takes effect straight away.
+    """
+    while True:
+        try:
+            async with session_factory() as db:
+                everything = await params_changed(db)
+                await redecay_hot_scores(db, None if everything else HOT_REDECAY_WINDOW_DAYS)
+            if everything:
+                logger.info("hot score parameters changed; rescored every post")
+            feed_cache.bump("hot")
+        except Exception:
+            logger.exception("hot score re-decay pass failed")
+        await asyncio.sleep(HOT_REDECAY_INTERVAL_SECONDS)
@@ -0,0 +1,226 @@
+"""Writing ratings (likes) without a read-modify-write per request.
+
+A rating is written with one ``INSERT ... ON CONFLICT (post_id, user_id) DO UPDATE``.
+The post's counters are adjusted in the same transaction, just before it, by an
+``UPDATE`` that derives the delta from the rater's previous score in a subquery. The
+request never loads the post or the old rating.
+
+Every rating write first locks the post's row, in a statement of its own. On Postgres
+READ COMMITTED a statement that waits for a row lock still reads everything else as of
+its start, so a counter update that queued behind a concurrent first rating by the same
+user would not see that rating and would count it a second time. Statements issued
+after the lock is held read the other transaction's committed rating.
+
+With ``RATING_WRITE_BEHIND_MS`` set, requests only record the rater's latest score in
+:data:`rating_buffer`. A background task flushes the buffer every that many
+milliseconds, one transaction per flush: repeated taps by the same user coalesce into
+one row change, and each touched post's counters are bumped once per flush instead of
+once per like. Until the flush commits, the rater's own ``is_liked`` flags are read from
+the buffer; counters and other viewers catch up with the flush.
+"""
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import case, delete, func, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.counters import bump_post_counters
+from app.core.database import dialect_name
+from app.core.feed_cache import feed_cache
+from app.models import Post, Rating, User
+
+# 0 writes every rating within its request; otherwise the flush interval of the buffer.
+RATING_WRITE_BEHIND_MS = float(os.getenv("RATING_WRITE_BEHIND_MS", "0"))
+# Keys per IN (...) list when a flush looks up previous scores.
+_FLUSH_CHUNK = 500
+
+logger = logging.getLogger(__name__)
+
+
+async def _lock_posts(db: AsyncSession, post_ids: Iterable[int]) -> Set[int]:
+    """Lock the rows of ``post_ids`` in id order, so writers cannot deadlock; the ones that exist.
+
+    SQLite has no row locks and ignores ``FOR UPDATE``: its single writer already
+    serializes rating writes.
+    """
+    ids = sorted(set(post_ids))
+    found: Set[int] = set()
+    for start in range(0, len(ids), _FLUSH_CHUNK):
+        chunk = ids[start : start + _FLUSH_CHUNK]
+        result = await db.execute(select(Post.id).where(Post.id.in_(chunk)).order_by(Post.id).with_for_update())
+        found.update(result.scalars().all())
+    return found
+
+
+def _upsert(db: AsyncSession):
+    dialect = postgresql if dialect_name(db) == "postgresql" else sqlite
+    statement = dialect.insert(Rating.__table__)
+    return statement.on_conflict_do_update(
+        index_elements=[Rating.__table__.c.post_id, Rating.__table__.c.user_id],
+        set_={"score": statement.excluded.score},
+    )
+
+
+async def upsert_rating(
+    db: AsyncSession, post_id: int, user_id: int, score: int
+) -> Optional[Tuple[int, datetime]]:
+    """Set ``user_id``'s score on ``post_id``; ``(rating_id, created_at)``, or None if no such post.
+
+    Runs in the caller's transaction. The post's row is locked before anything is read, and
+    the counter update comes before the upsert so its subquery still sees the previous score.
+    """
+    if not await _lock_posts(db, [post_id]):
+        return None
+    previous = (
+        select(Rating.score).where(Rating.post_id == post_id, Rating.user_id == user_id).scalar_subquery()
+    )
+    found = await bump_post_counters(
+        db,
+        post_id,
+        rating_sum=score - func.coalesce(previous, 0),
+        rating_count=case((previous.is_(None), 1), else_=0),
+    )
+    if not found:
+        return None
+    result = await db.execute(
+        _upsert(db)
+        .values(post_id=post_id, user_id=user_id, score=score)
+        .returning(Rating.__table__.c.id, Rating.__table__.c.created_at)
+    )
+    return tuple(result.one())
+
+
+async def remove_rating(db: AsyncSession, post_id: int, user_id: int) -> bool:
+    """Delete ``user_id``'s rating of ``post_id`` and its counter contribution; False if none."""
+    # Post before rating, in the same order as upsert_rating.
+    if not await _lock_posts(db, [post_id]):
+        return False
+    result = await db.execute(
+        delete(Rating).where(Rating.post_id == post_id, Rating.user_id == user_id).returning(Rating.score)
+    )
+    score = result.scalar_one_or_none()
+    if score is None:
+        return False
+    await bump_post_counters(db, post_id, rating_sum=-score, rating_count=-1)
+    return True
+
+
+class RatingBuffer:
+    """The latest unflushed score per ``(post_id, user_id)``; None records a removal."""
+
+    def __init__(self) -> None:
+        self._pending: Dict[Tuple[int, int], Optional[int]] = {}
+        # The batch being written, still visible to readers until its commit.
+        self._flushing: Dict[Tuple[int, int], Optional[int]] = {}
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pending) + len(self._flushing)
+
+    def record(self, post_id: int, user_id: int, score: Optional[int]) -> None:
+        self._pending[(post_id, user_id)] = score
+
+    def is_liked(self, user_id: int, post_id: int, stored: bool) -> bool:
+        """``user_id``'s ``is_liked`` for ``post_id``, given the flag read from the database."""
+        key = (post_id, user_id)
+        for layer in (self._pending, self._flushing):
+            if key in layer:
+                return layer[key] is not None
+        return stored
+
+    def overlay(self, user_id: int, posts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Apply the viewer's unflushed likes to serialized posts (their own copies) in place."""
+        if len(self):
+            for post in posts:
+                post["is_liked"] = self.is_liked(user_id, post["id"], post["is_liked"])
+        return posts
+
+    async def flush(self, db: AsyncSession) -> int:
+        """Write the pending changes in one transaction; returns how many were written."""
+        async with self._lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            self._flushing = batch
+            try:
+                post_ids = await _write_batch(db, batch)
+            except BaseException:
+                # Including cancellation at shutdown, which flushes once more afterwards.
+                await db.rollback()
+                # Keep the batch for the next flush, behind anything recorded since.
+                self._pending = {**batch, **self._pending}
+                raise
+            finally:
+                self._flushing = {}
+        feed_cache.bump(*(f"post:{post_id}" for post_id in post_ids), "hot")
+        return len(batch)
+
+
+async def _write_batch(db: AsyncSession, batch: Dict[Tuple[int, int], Optional[int]]) -> List[int]:
+    keys = list(batch)
+    # Lock first so the previous scores read below are the latest committed ones, even when
+    # another worker's flush is writing the same keys.
+    await _lock_posts(db, {post_id for post_id, _ in keys})
+    previous: Dict[Tuple[int, int], int] = {}
+    for start in range(0, len(keys), _FLUSH_CHUNK):
+        chunk = keys[start : start + _FLUSH_CHUNK]
+        result = await db.execute(
+            select(Rating.post_id, Rating.user_id, Rating.score).where(
+                tuple_(Rating.post_id, Rating.user_id).in_(chunk)
+            )
+        )
+        previous.update({(post_id, user_id): score for post_id, user_id, score in result.all()})
+    # Users deleted since they rated are skipped rather than failing the batch on the FK.
+    result = await db.execute(
+        select(User.id).where(User.id.in_({user_id for _, user_id in keys}), User.deleted_at.is_(None))
+    )
+    live_users = set(result.scalars().all())
+
+    # One counter bump per post, however many of its ratings the batch changes. A post
+    # that is gone makes the bump return False, and its ratings are dropped.
+    deltas: Dict[int, List[int]] = defaultdict(lambda: [0, 0])
+    for key, score in batch.items():
+        old = previous.get(key)
+        if key[1] not in live_users or (score is None and old is None):
+            continue
+        deltas[key[0]][0] += (score or 0) - (old or 0)
+        deltas[key[0]][1] += (score is not None) - (old is not None)
+    live_posts = [
+        post_id
+        for post_id, (rating_sum, rating_count) in deltas.items()
+        if await bump_post_counters(db, post_id, rating_sum=rating_sum, rating_count=rating_count)
+    ]
+
+    live = set(live_posts)
+    upserts = [
+        {"post_id": post_id, "user_id": user_id, "score": score}
+        for (post_id, user_id), score in batch.items()
+        if score is not None and post_id in live and user_id in live_users
+    ]
+    removals = [key for key, score in batch.items() if score is None and key in previous]
+    if upserts:
+        await db.execute(_upsert(db), upserts)
+    for start in range(0, len(removals), _FLUSH_CHUNK):
+        chunk = removals[start : start + _FLUSH_CHUNK]
+        await db.execute(delete(Rating).where(tuple_(Rating.post_id, Rating.user_id).in_(chunk)))
+    await db.commit()
+    return live_posts
+
+
+rating_buffer = RatingBuffer()
+
+
+async def run_flush_loop(session_factory) -> None:
+    """Background task started with the app when write-behind is enabled."""
+    while True:
+        await asyncio.sleep(RATING_WRITE_BEHIND_MS / 1000)
+        try:
+            async with session_factory() as db:
+                await rating_buffer.flush(db)
+        except Exception:
+            logger.exception("rating flush failed; retrying with the next flush")
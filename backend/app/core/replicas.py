@@ -0,0 +1,163 @@
+"""Routing read-only endpoints to read replicas.
+
+``DATABASE_REPLICA_URLS`` lists the replicas, comma separated. :func:`get_read_db` is
+the dependency for endpoints that only read. It hands out sessions on the healthy
+replicas in turn, and on the primary when there is none, or when the caller wrote
+within the last ``REPLICA_STICKY_SECONDS``. Replication lag must not hide a user's
+own comment or follow from them. :class:`StickyWriteMiddleware` records those writes:
+any successful non-GET request carrying a bearer token.
+
+The sticky window lives in the worker process. With several workers behind a
+balancer without session affinity, a user's next read can land on another worker and
+see replica state for up to the replication lag.
+
+A background task checks every replica each ``REPLICA_HEALTH_INTERVAL_SECONDS``. A
+replica that fails the check, lags by more than ``REPLICA_MAX_LAG_SECONDS`` (Postgres)
+or errors during a request is skipped until a later check passes.
+"""
+import asyncio
+import itertools
+import logging
+import os
+import time
+from typing import AsyncGenerator, Dict, List, Optional
+
+from fastapi import Header
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from app.core.database import AsyncSessionLocal, async_url, create_read_engine
+from app.core.security import token_user_id
+
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+REPLICA_HEALTH_INTERVAL_SECONDS = float(os.getenv("REPLICA_HEALTH_INTERVAL_SECONDS", "10"))
+REPLICA_HEALTH_TIMEOUT_SECONDS = float(os.getenv("REPLICA_HEALTH_TIMEOUT_SECONDS", "2"))
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "30"))
+
+# Prune expired sticky entries once the map grows past this.
+_STICKY_PRUNE_AT = 10_000
+
+logger = logging.getLogger(__name__)
+
+
+class Replica:
+    def __init__(self, url: str) -> None:
+        self.name = async_url(url).render_as_string(hide_password=True)
+        self.engine: AsyncEngine = create_read_engine(url)
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.healthy = True
+        self.lag_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    async def check(self) -> None:
+        try:
+            await asyncio.wait_for(self._probe(), REPLICA_HEALTH_TIMEOUT_SECONDS)
+        except Exception as error:  # Any failure, timeouts included, takes it out of rotation.
+            self.mark_down(repr(error))
+            return
+        if self.lag_seconds is not None and self.lag_seconds > REPLICA_MAX_LAG_SECONDS:
+            self.mark_down(f"lagging {self.lag_seconds:.1f}s")
+            return
+        if not self.healthy:
+            logger.info("replica %s is back", self.name)
+        self.healthy = True
+        self.last_error = None
+
+    async def _probe(self) -> None:
+        async with self.engine.connect() as conn:
+            if self.engine.dialect.name == "postgresql":
+                # NULL on a primary or on a replica with nothing replayed yet.
+                lag = await conn.scalar(text("SELECT EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())"))
+                self.lag_seconds = float(lag) if lag is not None else None
+            else:
+                await conn.execute(text("SELECT 1"))
+
+    def mark_down(self, reason: str) -> None:
+        if self.healthy:
+            logger.warning("replica %s out of rotation: %s", self.name, reason)
+        self.healthy = False
+        self.last_error = reason
+
+
+class ReplicaSet:
+    def __init__(self, urls: List[str]) -> None:
+        self.replicas = [Replica(url) for url in urls]
+        self._turns = itertools.cycle(range(len(self.replicas))) if self.replicas else None
+        self._sticky_until: Dict[int, float] = {}
+
+    def note_write(self, user_id: int) -> None:
+        now = time.monotonic()
+        if len(self._sticky_until) >= _STICKY_PRUNE_AT:
+            self._sticky_until = {uid: until for uid, until in self._sticky_until.items() if until > now}
+        self._sticky_until[user_id] = now + REPLICA_STICKY_SECONDS
+
+    def is_sticky(self, user_id: Optional[int]) -> bool:
+        return user_id is not None and self._sticky_until.get(user_id, 0.0) > time.monotonic()
+
+    def pick(self, user_id: Optional[int]) -> Optional[Replica]:
+        """The next healthy replica in turn; None means use the primary."""
+        if self._turns is None or self.is_sticky(user_id):
+            return None
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._turns)]
+            if replica.healthy:
+                return replica
+        return None
+
+    async def check_all(self) -> None:
+        await asyncio.gather(*(replica.check() for replica in self.replicas))
+
+    def stats(self) -> List[dict]:
+        return [
+            {"name": r.name, "healthy": r.healthy, "lag_seconds": r.lag_seconds, "last_error": r.last_error}
+            for r in self.replicas
+        ]
+
+
+replica_set = ReplicaSet(DATABASE_REPLICA_URLS)
+
+
+async def run_health_loop() -> None:
+    """Background task started with the app when replicas are configured."""
+    while True:
+        await replica_set.check_all()
+        await asyncio.sleep(REPLICA_HEALTH_INTERVAL_SECONDS)
+
+
+async def get_read_db(authorization: Optional[str] = Header(default=None)) -> AsyncGenerator[AsyncSession, None]:
+    """Session for endpoints that never write: a replica, or the primary (see module doc)."""
+    replica = replica_set.pick(token_user_id(authorization))
+    if replica is None:
+        async with AsyncSessionLocal() as session:
+            yield session
+        return
+    async with replica.sessions() as session:
+        try:
+            yield session
+        except (exc.OperationalError, exc.InterfaceError) as error:
+            # The replica went away mid-request: stop sending reads there until it recovers.
+            replica.mark_down(repr(error))
+            raise
+
+
+class StickyWriteMiddleware:
+    """Pin a user's reads to the primary for a while after each successful write request."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in ("GET", "HEAD", "OPTIONS") or not replica_set.replicas:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_and_note(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                authorization = dict(scope["headers"]).get(b"authorization")
+                user_id = token_user_id(authorization.decode("latin-1") if authorization else None)
+                if user_id is not None:
+                    replica_set.note_write(user_id)
+            await send(message)
+
+        await self.app(scope, receive, send_and_note)
@@ -0,0 +1,141 @@
+"""Weekly signup-cohort retention behind ``GET /stats/retention``.
+
+For the last ``weeks`` ISO weeks (Monday to Sunday, UTC), the cohort of a week is
+everyone who signed up in it, and cell ``k`` counts its members who posted, commented
+or rated ``k`` weeks after their signup week (``k = 0`` being the signup week itself).
+
+Only users who signed up inside the window can appear, and their ids are nearly
+contiguous, so state is kept in arrays indexed by ``user_id - first id``: the cohort of
+each user (``int16``) and a bitmask of the weeks they were active in (``uint64``, hence
+at most 52 weeks). That is 10 bytes per id in the window's id range, however much
+activity there is.
+
+Activity is reduced in SQL before it reaches Python: a ``UNION`` over the three tables
+yields each distinct (user, week) pair once, packed into one integer as
+``user_id * 64 + week``, so the rows fetched are bounded by users × weeks rather than by
+the number of posts, comments and ratings. They are streamed ``_LOAD_BATCH`` at a time
+and folded into the bitmasks with NumPy; the matrix is then one ``bincount`` per column.
+
+The result only changes as activity accrues, so it is cached per process until the
+daily activity rollup next runs (see :mod:`app.core.rollups`).
+"""
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy import Integer, cast, func, select, union
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import dialect_name
+from app.core.rollups import StatsCache, utc_today
+from app.models import Comment, DailyActivity, Post, Rating, User
+
+MAX_WEEKS = 52
+
+# Rows fetched per round trip while streaming activity.
+_LOAD_BATCH = 100_000
+# 1970-01-01 was a Thursday: day number + 3 counts from the Monday before it.
+_EPOCH = date(1970, 1, 1)
+_MONDAY_OFFSET = 3
+# Keys are user_id * _PACK + week within the window (< MAX_WEEKS).
+_PACK = 64
+
+retention_cache = StatsCache(ttl_seconds=24 * 3600, max_entries=16)
+
+
+def _week_number(db: AsyncSession, column):
+    """Monday-based weeks since 1970 (UTC) of a timestamp column, as an integer."""
+    if dialect_name(db) == "postgresql":
+        # date_part returns a double; EXTRACT's numeric is markedly slower per row.
+        day = cast(func.floor(func.date_part("epoch", column) / 86400), Integer)
+    else:
+        day = cast(func.julianday(column) - 2440587.5, Integer)
+    return (day + _MONDAY_OFFSET) // 7
+
+
+def _packed(db: AsyncSession, user_id, created_at, first_week: int):
+    return user_id * _PACK + _week_number(db, created_at) - first_week
+
+
+def _week_start(week: int) -> date:
+    return _EPOCH + timedelta(days=7 * week - _MONDAY_OFFSET)
+
+
+async def _stream_keys(db: AsyncSession, query):
+    """``(user_ids, weeks)`` arrays of a query for packed keys, a batch at a time."""
+    # On the Core connection: the ORM's per-row loading costs more than the query here.
+    connection = await db.connection()
+    result = await connection.stream(query.execution_options(yield_per=_LOAD_BATCH))
+    async for partition in result.partitions():
+        keys = np.fromiter((key for key, in partition), dtype=np.int64, count=len(partition))
+        yield keys // _PACK, keys % _PACK
+
+
+async def _retention(db: AsyncSession, weeks: int) -> dict:
+    this_week = ((utc_today() - _EPOCH).days + _MONDAY_OFFSET) // 7
+    first_week = this_week - weeks + 1
+    window_start = datetime.combine(_week_start(first_week), datetime.min.time())
+
+    user_ids: List[np.ndarray] = []
+    user_weeks: List[np.ndarray] = []
+    signups = select(_packed(db, User.id, User.created_at, first_week)).where(User.created_at >= window_start)
+    async for ids, signup_weeks in _stream_keys(db, signups):
+        user_ids.append(ids)
+        user_weeks.append(signup_weeks)
+    ids = np.concatenate(user_ids) if user_ids else np.empty(0, dtype=np.int64)
+
+    sizes = np.zeros(weeks, dtype=np.int64)
+    active = np.zeros((weeks, weeks), dtype=np.int64)
+    if len(ids):
+        base, top = int(ids.min()), int(ids.max())
+        cohort = np.full(top - base + 1, -1, dtype=np.int16)
+        cohort[ids - base] = np.clip(np.concatenate(user_weeks), 0, weeks - 1)
+        del user_ids, user_weeks, ids
+        seen = np.zeros(top - base + 1, dtype=np.uint64)
+
+        activity = union(
+            *(
+                select(_packed(db, model.user_id, model.created_at, first_week)).where(
+                    model.created_at >= window_start, model.user_id.between(base, top)
+                )
+                for model in (Post, Comment, Rating)
+            )
+        )
+        async for uids, active_weeks in _stream_keys(db, activity):
+            offsets = uids - base
+            cohorts = cohort[offsets]
+            since_signup = active_weeks - cohorts
+            keep = (cohorts >= 0) & (since_signup >= 0) & (since_signup < weeks)
+            # Pairs are distinct, so no two updates hit the same bit; a user can still
+            # appear more than once in a batch, hence the unbuffered ``at``.
+            np.bitwise_or.at(seen, offsets[keep], np.left_shift(np.uint64(1), since_signup[keep].astype(np.uint64)))
+
+        members = cohort >= 0
+        cohort, seen = cohort[members], seen[members]
+        sizes = np.bincount(cohort, minlength=weeks)
+        for k in range(weeks):
+            bit = ((seen >> np.uint64(k)) & np.uint64(1)).astype(np.int64)
+            active[:, k] = np.bincount(cohort, weights=bit, minlength=weeks)
+
+    rows = []
+    for c in range(weeks):
+        # Weeks after the current one have not happened yet.
+        elapsed = weeks - c
+        size = int(sizes[c])
+        rows.append(
+            {
+                "week": _week_start(first_week + c).isoformat(),
+                "users": size,
+                "active": [int(n) for n in active[c, :elapsed]],
+                "retention": [round(int(n) / size, 4) if size else None for n in active[c, :elapsed]],
+            }
+        )
+    return {"weeks": weeks, "cohorts": rows}
+
+
+async def retention_matrix(db: AsyncSession, weeks: int) -> dict:
+    """The matrix for the last ``weeks`` signup weeks, cached until the next rollup."""
+    generation: Optional[datetime] = (await db.execute(select(func.max(DailyActivity.rolled_up_at)))).scalar_one()
+    # Without rollups running the key still changes daily.
+    key = ("retention", weeks, generation or utc_today())
+    return await retention_cache.get(key, lambda: _retention(db, weeks))
@@ -0,0 +1,240 @@
+"""Daily activity rollups behind ``GET /stats/dashboard``, and the cache in front of it.
+
+``daily_activity`` holds one row per UTC day: signups, posts, comments, ratings and
+distinct active users (anyone who posted, commented or rated), plus posts per media
+type in ``daily_media_posts``. The dashboard reads the totals, the last week and the
+media split from these tables, a few rows instead of scanning the source tables.
+
+Rows are recomputed from the source tables by :func:`roll_up`, for a range of days:
+every ``STATS_ROLLUP_INTERVAL_SECONDS`` the background loop redoes today and the
+previous ``STATS_ROLLUP_REOPEN_DAYS`` days, range scans of their ``created_at``
+indexes. Older days are only redone by the daily full rebuild, so deleting old content
+shows in the totals up to a day later. ``scripts/rebuild_daily_activity.py`` runs a
+full rebuild by hand, e.g. after deploying this on an existing database.
+
+Computed stats are cached per process for ``STATS_CACHE_TTL_SECONDS`` and dropped
+after each rollup; concurrent misses share one computation.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy import delete, func, select, union
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import dialect_name
+from app.models import Comment, DailyActivity, DailyMediaPosts, Post, Rating, User
+
+STATS_ROLLUP_INTERVAL_SECONDS = float(os.getenv("STATS_ROLLUP_INTERVAL_SECONDS", "60"))
+STATS_ROLLUP_REOPEN_DAYS = int(os.getenv("STATS_ROLLUP_REOPEN_DAYS", "1"))
+STATS_CACHE_TTL_SECONDS = float(os.getenv("STATS_CACHE_TTL_SECONDS", "30"))
+
+# Days shown in the dashboard's active-user chart, today included.
+DASHBOARD_DAYS = 7
+
+logger = logging.getLogger(__name__)
+
+
+class StatsCache:
+    """Computed stats by key for a short TTL; a miss computes once for every waiter."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 256) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._values: Dict[Hashable, Tuple[float, Any]] = {}
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+
+    def _fresh(self, key: Hashable) -> Optional[Tuple[float, Any]]:
+        entry = self._values.get(key)
+        if entry is not None and entry[0] >= time.monotonic():
+            return entry
+        return None
+
+    async def get(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._fresh(key)
+        if entry is not None:
+            return entry[1]
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self._fresh(key)
+            if entry is not None:
+                return entry[1]
+            try:
+                value = await compute()
+            finally:
+                self._locks.pop(key, None)
+            self._store(key, value)
+            return value
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        now = time.monotonic()
+        if len(self._values) >= self.max_entries:
+            self._values = {k: v for k, v in self._values.items() if v[0] >= now}
+            while len(self._values) >= self.max_entries:
+                del self._values[next(iter(self._values))]
+        self._values[key] = (now + self.ttl_seconds, value)
+
+    def clear(self) -> None:
+        self._values.clear()
+
+
+stats_cache = StatsCache(STATS_CACHE_TTL_SECONDS)
+
+
+def utc_today() -> date:
+    return datetime.utcnow().date()
+
+
+def as_date(value) -> date:
+    # SQLite's date() returns text.
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+
+def utc_day(db: AsyncSession, column):
+    if dialect_name(db) == "postgresql":
+        return func.date(func.timezone("UTC", column))
+    return func.date(column)
+
+
+async def _counts_by_day(db: AsyncSession, column, since: Optional[datetime], *group_by) -> list:
+    day = utc_day(db, column).label("day")
+    query = select(day, *group_by, func.count()).group_by(day, *group_by)
+    if since is not None:
+        query = query.where(column >= since)
+    return (await db.execute(query)).all()
+
+
+async def roll_up(db: AsyncSession, since: Optional[date] = None) -> int:
+    """Recompute the rows of ``since`` through today, or of every day; returns days written."""
+    start = datetime.combine(since, datetime.min.time()) if since is not None else None
+    rolled_up_at = datetime.utcnow()
+    rows: Dict[date, dict] = {}
+
+    def row(day) -> dict:
+        day = as_date(day)
+        if day not in rows:
+            rows[day] = {
+                "day": day,
+                "signups": 0,
+                "posts": 0,
+                "comments": 0,
+                "ratings": 0,
+                "active_users": 0,
+                "rolled_up_at": rolled_up_at,
+            }
+        return rows[day]
+
+    for model, field in ((User, "signups"), (Comment, "comments"), (Rating, "ratings")):
+        for day, count in await _counts_by_day(db, model.created_at, start):
+            row(day)[field] = count
+    media_rows = []
+    for day, media_type, count in await _counts_by_day(db, Post.created_at, start, Post.media_type):
+        row(day)["posts"] += count
+        media_rows.append(
+            {"day": as_date(day), "media_type": getattr(media_type, "value", media_type), "posts": count}
+        )
+
+    # UNION drops repeated (day, user) pairs, leaving one per active user and day.
+    actions = []
+    for model in (Post, Comment, Rating):
+        action = select(utc_day(db, model.created_at).label("day"), model.user_id.label("user_id"))
+        actions.append(action.where(model.created_at >= start) if start is not None else action)
+    active = union(*actions).subquery()
+    result = await db.execute(select(active.c.day, func.count()).group_by(active.c.day))
+    for day, count in result.all():
+        row(day)["active_users"] = count
+
+    # Replace the range in one transaction; upserts, so two workers rolling up at once
+    # do not trip over each other's rows.
+    dialect = postgresql if dialect_name(db) == "postgresql" else sqlite
+    for model, values, keys in (
+        (DailyActivity, list(rows.values()), ("day",)),
+        (DailyMediaPosts, media_rows, ("day", "media_type")),
+    ):
+        stale = delete(model)
+        await db.execute(stale.where(model.day >= since) if since is not None else stale)
+        if values:
+            table = model.__table__
+            statement = dialect.insert(table)
+            await db.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[table.c[key] for key in keys],
+                    set_={
+                        column.name: statement.excluded[column.name]
+                        for column in table.columns
+                        if column.name not in keys
+                    },
+                ),
+                values,
+            )
+    await db.commit()
+    return len(rows)
+
+
+async def reopened_since(db: AsyncSession) -> Optional[date]:
+    """First day the periodic rollup redoes: None (everything) while the table is empty."""
+    last = (await db.execute(select(func.max(DailyActivity.day)))).scalar_one_or_none()
+    if last is None:
+        return None
+    return min(as_date(last), utc_today() - timedelta(days=STATS_ROLLUP_REOPEN_DAYS))
+
+
+async def _dashboard(db: AsyncSession) -> dict:
+    today = utc_today()
+    first_day = today - timedelta(days=DASHBOARD_DAYS - 1)
+    totals = (
+        await db.execute(
+            select(
+                func.coalesce(func.sum(DailyActivity.signups), 0),
+                func.coalesce(func.sum(DailyActivity.posts), 0),
+                func.coalesce(func.sum(DailyActivity.comments + DailyActivity.ratings), 0),
+            )
+        )
+    ).one()
+    result = await db.execute(
+        select(DailyActivity.day, DailyActivity.active_users).where(DailyActivity.day >= first_day)
+    )
+    active = {as_date(day): count for day, count in result.all()}
+    result = await db.execute(
+        select(DailyMediaPosts.media_type, func.sum(DailyMediaPosts.posts))
+        .group_by(DailyMediaPosts.media_type)
+        .order_by(DailyMediaPosts.media_type)
+    )
+    return {
+        "total_users": totals[0],
+        "total_posts": totals[1],
+        "total_interactions": totals[2],
+        "daily_active": [
+            {"date": day.isoformat(), "active": active.get(day, 0)}
+            for day in (first_day + timedelta(days=i) for i in range(DASHBOARD_DAYS))
+        ],
+        "content_type_distribution": [{"name": name, "value": value} for name, value in result.all()],
+    }
+
+
+async def dashboard_stats(db: AsyncSession) -> dict:
+    return await stats_cache.get("dashboard", lambda: _dashboard(db))
+
+
+async def run_rollup_loop(session_factory) -> None:
+    """Background task started with the app unless STATS_ROLLUP_INTERVAL_SECONDS is 0."""
+    rebuilt_on = utc_today()
+    while True:
+        try:
+            async with session_factory() as db:
+                today = utc_today()
+                if today != rebuilt_on:
+                    # Once a day, redo every day, picking up deletions of older content.
+                    days = await roll_up(db)
+                    rebuilt_on = today
+                    logger.info("rebuilt daily activity rollups: %d days", days)
+                else:
+                    await roll_up(db, await reopened_since(db))
+            stats_cache.clear()
+        except Exception:
+            logger.exception("daily activity rollup failed")
+        await asyncio.sleep(STATS_ROLLUP_INTERVAL_SECONDS)
@@ -0,0 +1,193 @@
+"""Full-text index over post content.
+
+Neither FTS5's ``unicode61`` tokenizer nor Postgres' ``simple`` parser splits CJK text
+into words: a whole run of Han characters becomes one token. Documents and queries are
+therefore segmented here first: runs of CJK characters become overlapping bigrams and
+everything else is split into lower-cased words. Each distinct CJK character is indexed
+once more on its own, after all the bigrams so phrase positions are unaffected, which
+lets a one-character query such as 猫 match. The segmented text is what gets indexed, so
+both engines only ever see space-separated tokens and rank the same way.
+
+The index lives in ``post_search``: an FTS5 virtual table keyed by ``rowid = posts.id`` on
+SQLite, a ``tsvector`` column with a GIN index on Postgres.
+"""
+import re
+import unicodedata
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import Float, Integer, column, func, literal_column, select, table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Subquery
+
+from app.core.database import dialect_name
+from app.models import Post
+
+SNIPPET_CHARS = 120
+
+_CJK = (
+    "぀-ヿ"  # Hiragana, Katakana
+    "㐀-䶿一-鿿豈-﫿"  # Han
+    "가-힯"  # Hangul syllables
+)
+# Letters and digits; everything else, ``_`` included, separates words in unicode61.
+_WORD_CHAR = r"[^\W_]"
+# A run of CJK characters, or a word of any other letters/digits.
+_TOKEN_RUN = re.compile(rf"[{_CJK}]+|[^\W_{_CJK}]+")
+_IS_CJK = re.compile(rf"[{_CJK}]")
+
+_SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS post_search USING fts5(body, tokenize='unicode61 remove_diacritics 0')",
+)
+_POSTGRES_DDL = (
+    "CREATE TABLE IF NOT EXISTS post_search ("
+    " post_id INTEGER PRIMARY KEY REFERENCES posts (id) ON DELETE CASCADE,"
+    " document TSVECTOR NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS ix_post_search_document ON post_search USING GIN (document)",
+)
+
+_fts = table("post_search", column("rowid", Integer), column("body"))
+_tsv = table("post_search", column("post_id", Integer), column("document"))
+
+
+def _runs(content: str) -> List[str]:
+    return _TOKEN_RUN.findall(unicodedata.normalize("NFKC", content).lower())
+
+
+def _bigrams(run: str) -> List[str]:
+    if len(run) == 1:
+        return [run]
+    return [run[i : i + 2] for i in range(len(run) - 1)]
+
+
+def segment(content: str) -> str:
+    """Space-separated index tokens for ``content``."""
+    tokens: List[str] = []
+    characters: List[str] = []
+    for run in _runs(content):
+        if _IS_CJK.match(run):
+            if len(run) > 1:
+                tokens.extend(_bigrams(run))
+            characters.extend(run)
+        else:
+            tokens.append(run)
+    return " ".join(tokens + list(dict.fromkeys(characters)))
+
+
+def _query_runs(q: str) -> List[List[str]]:
+    """One token list per query term; a CJK run must match as a phrase of its bigrams."""
+    return [_bigrams(run) if _IS_CJK.match(run) else [run] for run in _runs(q)]
+
+
+def _fts5_query(runs: List[List[str]]) -> str:
+    # Tokens are word characters only, so quoting cannot be escaped out of.
+    return " ".join('"' + " ".join(tokens) + '"' for tokens in runs)
+
+
+def _tsquery(runs: List[List[str]]) -> str:
+    return " & ".join("(" + " <-> ".join(f"'{token}'" for token in tokens) + ")" for tokens in runs)
+
+
+def create_search_index(sync_conn) -> None:
+    """Create ``post_search`` if missing; run alongside ``Base.metadata.create_all``."""
+    for statement in _POSTGRES_DDL if sync_conn.dialect.name == "postgresql" else _SQLITE_DDL:
+        sync_conn.execute(text(statement))
+
+
+async def index_posts(db: AsyncSession, posts: Iterable[Tuple[int, str]]) -> None:
+    """Add or replace the index rows of ``(post_id, content)`` pairs in the caller's transaction."""
+    params = [{"post_id": post_id, "body": segment(content)} for post_id, content in posts]
+    if not params:
+        return
+    if dialect_name(db) == "postgresql":
+        await db.execute(
+            text(
+                "INSERT INTO post_search (post_id, document) VALUES (:post_id, to_tsvector('simple', :body))"
+                " ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document"
+            ),
+            params,
+        )
+    else:
+        await db.execute(text("INSERT OR REPLACE INTO post_search (rowid, body) VALUES (:post_id, :body)"), params)
+
+
+async def unindex_posts(db: AsyncSession, post_ids: Iterable[int]) -> None:
+    params = [{"post_id": post_id} for post_id in post_ids]
+    if not params:
+        return
+    key = "post_id" if dialect_name(db) == "postgresql" else "rowid"
+    await db.execute(text(f"DELETE FROM post_search WHERE {key} = :post_id"), params)
+
+
+def search_matches(db: AsyncSession, q: str) -> Optional[Subquery]:
+    """``(post_id, rank)`` of posts matching ``q``, lower rank is more relevant; None if ``q`` has no terms."""
+    runs = _query_runs(q)
+    if not runs:
+        return None
+    if dialect_name(db) == "postgresql":
+        query = func.to_tsquery("simple", _tsquery(runs))
+        matches = select(
+            _tsv.c.post_id.label("post_id"),
+            (-func.ts_rank_cd(_tsv.c.document, query)).label("rank"),
+        ).where(_tsv.c.document.op("@@")(query))
+    else:
+        matches = select(
+            _fts.c.rowid.label("post_id"),
+            func.bm25(literal_column("post_search"), type_=Float).label("rank"),
+        ).where(_fts.c.body.op("MATCH")(_fts5_query(runs)))
+    return matches.subquery("matches")
+
+
+def snippet(content: str, q: str, size: int = SNIPPET_CHARS) -> Tuple[str, List[Tuple[int, int]]]:
+    """An excerpt of ``content`` around the first hit and the ``(start, end)`` offsets of hits in it.
+
+    Built from the original text rather than the index: the indexed form is bigrams, which
+    would show every CJK character twice.
+    """
+    content = unicodedata.normalize("NFKC", content)
+    terms = sorted(set(_runs(q)), key=len, reverse=True)
+    hits: List[Tuple[int, int]] = []
+    if terms:
+        # Words only match whole words, as in the index; CJK runs match anywhere.
+        alternatives = [
+            re.escape(t) if _IS_CJK.match(t) else rf"(?<!{_WORD_CHAR}){re.escape(t)}(?!{_WORD_CHAR})" for t in terms
+        ]
+        hits = [m.span() for m in re.finditer("|".join(alternatives), content, re.IGNORECASE)]
+
+    start = 0
+    if hits and len(content) > size:
+        start = min(max(hits[0][0] - size // 4, 0), len(content) - size)
+    end = start + size
+    excerpt = content[start:end]
+    highlights = [(s - start, e - start) for s, e in hits if s >= start and e <= end]
+    if start > 0:
+        excerpt = "…" + excerpt
+        highlights = [(s + 1, e + 1) for s, e in highlights]
+    if end < len(content):
+        excerpt += "…"
+    return excerpt, highlights
+
+
+async def rebuild_search_index(db: AsyncSession, chunk_size: int = 1000) -> int:
+    """Re-index every post, ``chunk_size`` posts per transaction, then drop orphaned rows.
+
+    Rows are replaced in place rather than truncated first, so search keeps answering
+    while the rebuild runs.
+    """
+    indexed = 0
+    last_id = 0
+    while True:
+        result = await db.execute(
+            select(Post.id, Post.content).where(Post.id > last_id).order_by(Post.id).limit(chunk_size)
+        )
+        rows = result.all()
+        if not rows:
+            break
+        await index_posts(db, rows)
+        await db.commit()
+        indexed += len(rows)
+        last_id = rows[-1].id
+
+    key = "post_id" if dialect_name(db) == "postgresql" else "rowid"
+    await db.execute(text(f"DELETE FROM post_search WHERE {key} NOT IN (SELECT id FROM posts)"))
+    await db.commit()
+    return indexed
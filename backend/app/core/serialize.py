@@ -0,0 +1,135 @@
+"""Response bodies built straight from ORM objects.
+
+Feed and detail pages are read-only views of rows that were validated when they were
+written, so running them back through ``PostOut.from_orm(...).copy(...)`` re-validates
+every nested user, tag and comment for nothing. The builders here produce the same JSON
+as the Pydantic schemas in ``app.schemas`` (field for field) as plain dicts, and
+:class:`FastJSONResponse` encodes them with orjson when it is installed.
+"""
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from starlette.responses import Response
+
+from app.models import Comment, Post, Rating, Tag, User
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional speed-up
+    orjson = None
+
+
+def _default(value: Any) -> str:
+    if isinstance(value, datetime):
+        text = value.isoformat()
+        # Match Pydantic, which writes UTC as "Z".
+        return text[:-6] + "Z" if value.utcoffset() == timezone.utc.utcoffset(None) else text
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _values(obj: Any, names: tuple) -> Dict[str, Any]:
+    # Loaded column values live in the instance __dict__; reading them there skips the
+    # instrumented-attribute descriptor, which dominates the cost on a large page.
+    # Anything not loaded yet goes through getattr and loads as usual.
+    state = obj.__dict__
+    return {name: state[name] if name in state else getattr(obj, name) for name in names}
+
+
+_USER_FIELDS = ("id", "username", "nickname", "avatar_url", "is_admin", "created_at")
+_COMMENT_FIELDS = ("id", "post_id", "user_id", "content", "created_at")
+_RATING_FIELDS = ("id", "post_id", "user_id", "score", "created_at")
+_POST_FIELDS = ("id", "user_id", "content", "media_type", "media_urls", "created_at", "updated_at")
+
+
+def user_dict(user: User, users: Optional[Dict[int, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """``UserOut``; pass the same ``users`` memo across a page to build each author once."""
+    if users is None:
+        return _values(user, _USER_FIELDS)
+    body = users.get(user.id)
+    if body is None:
+        body = users[user.id] = _values(user, _USER_FIELDS)
+    return body
+
+
+def tag_dict(tag: Tag) -> Dict[str, Any]:
+    return {"id": tag.id, "name": tag.name}
+
+
+def comment_dict(comment: Comment, users: Optional[Dict[int, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    body = _values(comment, _COMMENT_FIELDS)
+    body["user"] = user_dict(comment.user, users)
+    return body
+
+
+def rating_dict(rating: Rating, users: Optional[Dict[int, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    body = _values(rating, _RATING_FIELDS)
+    body["user"] = user_dict(rating.user, users)
+    return body
+
+
+def post_dict(
+    post: Post,
+    is_following: bool = False,
+    is_liked: bool = False,
+    comments: Optional[Iterable[Comment]] = None,
+    users: Optional[Dict[int, Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """The ``PostOut`` shape; ``comments`` defaults to whatever is loaded on ``post.comments``."""
+    if users is None:
+        users = {}
+    body = _values(post, _POST_FIELDS)
+    body["media_type"] = body["media_type"].value
+    body["user"] = user_dict(post.user, users)
+    body["tags"] = [tag_dict(tag) for tag in post.tags]
+    body["comment_count"] = post.comment_count
+    body["average_rating"] = post.average_rating
+    body["is_following"] = is_following
+    body["is_liked"] = is_liked
+    body["comments"] = [
+        comment_dict(comment, users) for comment in (post.comments if comments is None else comments)
+    ]
+    return body
+
+
+def post_detail_dict(
+    post: Post,
+    is_following: bool,
+    is_liked: bool,
+    comments: List[Comment],
+    comments_cursor: Optional[str],
+    ratings: List[Rating],
+    ratings_cursor: Optional[str],
+) -> Dict[str, Any]:
+    """The ``PostDetail`` shape: ``PostOut`` plus first pages of comments and ratings."""
+    users: Dict[int, Dict[str, Any]] = {}
+    body = post_dict(post, is_following, is_liked, comments=comments, users=users)
+    body["ratings"] = [rating_dict(rating, users) for rating in ratings]
+    body["rating_count"] = post.rating_count
+    body["comments_cursor"] = comments_cursor
+    body["ratings_cursor"] = ratings_cursor
+    return body
+
+
+def with_viewer_flags(posts: List[Dict[str, Any]], flags: Dict[int, tuple]) -> List[Dict[str, Any]]:
+    """Shallow copies of shared post dicts with one viewer's ``is_following`` / ``is_liked``."""
+    page = []
+    for post in posts:
+        is_following, is_liked = flags.get(post["id"], (False, False))
+        page.append({**post, "is_following": is_following, "is_liked": is_liked})
+    return page
@@ -0,0 +1,210 @@
+"""Batch "people you may know" over the follow graph, with NumPy/SciPy.
+
+``follows`` is loaded into a sparse adjacency matrix ``A`` (``A[u, x] = 1`` when ``u``
+follows ``x``). Candidates for ``u`` are the users followed by the users ``u`` follows::
+
+    mutual[u, c] = sum_x A[u, x] * A[x, c]                          (common neighbours)
+    score[u, c]  = sum_x A[u, x] * A[x, c] / log(2 + following[x])  (Adamic-Adar)
+
+minus ``u`` and everyone ``u`` already follows. Both are sparse matrix products over a
+block of rows at a time; the best ``SUGGESTIONS_TOP_K`` per user replace that user's rows
+in ``follow_suggestions``.
+
+Memory: ``A`` and its weighted copy take ~8 bytes per follow each (int32 indices,
+float32 values). A row's product has at most ``sum(following[x] for x in A[u])``
+entries, so rows are grouped into blocks whose bound fits ``SUGGESTIONS_MEMORY_MB``;
+only one block's products exist at a time, and each block is written out before the
+next is computed.
+
+Incremental runs: a user's row only depends on their own followees and on those
+followees' follows (the weights use the followee's ``following`` count). So when ``u``'s
+follows change, exactly ``u`` and ``u``'s followers need recomputing. Follow/unfollow
+mark ``u`` in ``stale_suggestions`` (:func:`app.core.suggestions.mark_stale`); an
+incremental run loads the whole graph, but scores and writes only those rows.
+
+The products run in a worker thread; still, they compete with request handling for the
+CPU, so large deployments run ``scripts/refresh_suggestions.py`` from cron instead of
+setting ``SUGGESTIONS_REFRESH_INTERVAL_SECONDS``.
+"""
+import asyncio
+import itertools
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Follow, FollowSuggestion, StaleSuggestions, User
+
+SUGGESTIONS_TOP_K = int(os.getenv("SUGGESTIONS_TOP_K", "20"))
+SUGGESTIONS_MEMORY_MB = float(os.getenv("SUGGESTIONS_MEMORY_MB", "256"))
+# 0 leaves refreshing to scripts/refresh_suggestions.py.
+SUGGESTIONS_REFRESH_INTERVAL_SECONDS = float(os.getenv("SUGGESTIONS_REFRESH_INTERVAL_SECONDS", "0"))
+
+# Follows fetched per round trip while loading the graph.
+_LOAD_BATCH = 50_000
+# Users whose rows are replaced per transaction.
+_WRITE_CHUNK = 1000
+# Peak bytes per candidate bound while scoring a block: both products, the masked copies
+# and SciPy's intermediate buffers (measured at ~34 with tracemalloc).
+_BYTES_PER_PRODUCT_ENTRY = 36
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FollowGraph:
+    adjacency: sparse.csr_matrix  # A[u, x] = 1 if u follows x
+    weighted: sparse.csr_matrix  # row x scaled by 1 / log(2 + following[x])
+    work: np.ndarray  # per-row bound on the number of candidates
+
+
+async def load_graph(db: AsyncSession) -> FollowGraph:
+    n = ((await db.execute(select(func.max(User.id)))).scalar_one() or 0) + 1
+    followers: List[np.ndarray] = []
+    followed: List[np.ndarray] = []
+    result = await db.stream(
+        select(Follow.follower_id, Follow.followed_id).execution_options(yield_per=_LOAD_BATCH)
+    )
+    async for partition in result.partitions():
+        # fromiter over the flattened rows: np.array() on a list of Row objects is ~7x slower.
+        pairs = np.fromiter(itertools.chain.from_iterable(partition), dtype=np.int32, count=2 * len(partition))
+        followers.append(pairs[0::2])
+        followed.append(pairs[1::2])
+    rows = np.concatenate(followers) if followers else np.empty(0, dtype=np.int32)
+    cols = np.concatenate(followed) if followed else np.empty(0, dtype=np.int32)
+    del followers, followed
+    adjacency = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(n, n))
+    del rows, cols
+    following = np.diff(adjacency.indptr)
+    weights = (1.0 / np.log(2.0 + following)).astype(np.float32)
+    weighted = sparse.diags(weights, format="csr") @ adjacency
+    work = adjacency @ following.astype(np.float64)
+    return FollowGraph(adjacency, weighted, work)
+
+
+def affected_users(graph: FollowGraph, stale: np.ndarray) -> np.ndarray:
+    """``stale`` plus everyone following one of them: the rows their changes reach."""
+    stale = stale[stale < graph.adjacency.shape[0]]
+    followers = np.flatnonzero(np.diff(graph.adjacency[:, stale].indptr))
+    return np.union1d(stale, followers).astype(np.int64)
+
+
+def blocks(graph: FollowGraph, users: np.ndarray, memory_mb: float) -> Iterator[np.ndarray]:
+    """Split ``users`` into runs whose products fit ``memory_mb``; a heavier row goes alone."""
+    budget = max(1.0, memory_mb * 2**20 / _BYTES_PER_PRODUCT_ENTRY)
+    start = 0
+    total = 0.0
+    for i, work in enumerate(graph.work[users]):
+        if total + work > budget and i > start:
+            yield users[start:i]
+            start, total = i, 0.0
+        total += work
+    if start < len(users):
+        yield users[start:]
+
+
+def score_block(graph: FollowGraph, users: np.ndarray, top_k: int) -> Tuple[np.ndarray, ...]:
+    """``(user_ids, suggested_ids, scores, mutual_counts)`` of the top ``top_k`` per user."""
+    rows = graph.adjacency[users]
+    own = sparse.csr_matrix(
+        (np.ones(len(users), dtype=np.float32), (np.arange(len(users)), users)), shape=rows.shape
+    )
+    excluded = rows + own
+    results = []
+    for product in (rows @ graph.weighted, rows @ graph.adjacency):
+        product = product - product.multiply(excluded)
+        product.eliminate_zeros()
+        product.sort_indices()
+        results.append(product.tocsr())
+    scores, mutual = results
+    # Weights are positive, so both products have the same non-zeros in the same order.
+    assert np.array_equal(scores.indptr, mutual.indptr)
+
+    picked: List[np.ndarray] = []
+    for i in range(len(users)):
+        start, end = scores.indptr[i], scores.indptr[i + 1]
+        if end - start > top_k:
+            picked.append(start + np.argpartition(scores.data[start:end], -top_k)[-top_k:])
+        elif end > start:
+            picked.append(np.arange(start, end))
+    index = np.concatenate(picked) if picked else np.empty(0, dtype=np.int64)
+    owners = np.repeat(users, np.diff(scores.indptr))[index]
+    return owners, scores.indices[index], scores.data[index], mutual.data[index]
+
+
+async def _write(db: AsyncSession, users: np.ndarray, block: Tuple[np.ndarray, ...], computed_at: datetime) -> None:
+    owners = block[0]
+    for start in range(0, len(users), _WRITE_CHUNK):
+        chunk = users[start : start + _WRITE_CHUNK]
+        # Users are sorted, and so are the owners of their results.
+        lo = np.searchsorted(owners, chunk[0], side="left")
+        hi = np.searchsorted(owners, chunk[-1], side="right")
+        await db.execute(delete(FollowSuggestion).where(FollowSuggestion.user_id.in_(chunk.tolist())))
+        if hi > lo:
+            columns = zip(*(values[lo:hi].tolist() for values in block))
+            await db.execute(
+                insert(FollowSuggestion.__table__),
+                [
+                    {"user_id": o, "suggested_id": c, "score": s, "mutual_count": int(m), "computed_at": computed_at}
+                    for o, c, s, m in columns
+                ],
+            )
+        await db.commit()
+
+
+async def refresh_suggestions(
+    db: AsyncSession, full: bool = False, top_k: int = SUGGESTIONS_TOP_K, memory_mb: float = SUGGESTIONS_MEMORY_MB
+) -> Dict[str, float]:
+    """Recompute stale users' suggestions, or everyone's with ``full``; returns run stats."""
+    started = time.perf_counter()
+    computed_at = datetime.utcnow()
+    stale = np.array(
+        (await db.execute(select(StaleSuggestions.user_id).where(StaleSuggestions.marked_at <= computed_at)))
+        .scalars()
+        .all(),
+        dtype=np.int64,
+    )
+    if not full and not len(stale):
+        return {"users": 0, "suggestions": 0, "edges": 0, "blocks": 0, "seconds": 0.0}
+
+    graph = await load_graph(db)
+    if full:
+        users = np.flatnonzero(graph.work).astype(np.int64)
+    else:
+        users = await asyncio.to_thread(affected_users, graph, stale)
+
+    stats = {"users": len(users), "suggestions": 0, "edges": graph.adjacency.nnz, "blocks": 0}
+    for block_users in blocks(graph, users, memory_mb):
+        block = await asyncio.to_thread(score_block, graph, block_users, top_k)
+        await _write(db, block_users, block, computed_at)
+        stats["blocks"] += 1
+        stats["suggestions"] += len(block[0])
+
+    if full:
+        # Users who lost every candidate were not in any block.
+        await db.execute(delete(FollowSuggestion).where(FollowSuggestion.computed_at < computed_at))
+    # Marks made while this run was going are left for the next one.
+    await db.execute(delete(StaleSuggestions).where(StaleSuggestions.marked_at <= computed_at))
+    await db.commit()
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    return stats
+
+
+async def run_refresh_loop(session_factory) -> None:
+    """Background task started with the app when SUGGESTIONS_REFRESH_INTERVAL_SECONDS is set."""
+    while True:
+        await asyncio.sleep(SUGGESTIONS_REFRESH_INTERVAL_SECONDS)
+        try:
+            async with session_factory() as db:
+                stats = await refresh_suggestions(db)
+            if stats["users"]:
+                logger.info("refreshed follow suggestions: %s", stats)
+        except Exception:
+            logger.exception("follow suggestion refresh failed")
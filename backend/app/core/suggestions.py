@@ -0,0 +1,48 @@
+"""Reading precomputed follow suggestions, and flagging users whose suggestions are stale.
+
+Suggestions are computed in batch by :mod:`app.core.suggestion_job` and stored per user
+in ``follow_suggestions``, so serving them is one range read of the
+``(user_id, score)`` index. Follow and unfollow only record the follower in
+``stale_suggestions``; the next incremental run recomputes them and everyone whose
+suggestions ran through them.
+"""
+from datetime import datetime
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import dialect_name
+from app.core.follow_graph import follow_graph
+from app.models import FollowSuggestion, StaleSuggestions, User
+
+
+async def mark_stale(db: AsyncSession, user_ids: Iterable[int]) -> None:
+    """Queue ``user_ids`` for the next incremental run, in the caller's transaction."""
+    rows = [{"user_id": user_id, "marked_at": datetime.utcnow()} for user_id in set(user_ids)]
+    if not rows:
+        return
+    dialect = postgresql if dialect_name(db) == "postgresql" else sqlite
+    statement = dialect.insert(StaleSuggestions.__table__)
+    await db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[StaleSuggestions.__table__.c.user_id],
+            set_={"marked_at": statement.excluded.marked_at},
+        ),
+        rows,
+    )
+
+
+async def suggestions_for(db: AsyncSession, user_id: int, limit: int) -> List[Tuple[User, int, float]]:
+    """``(user, mutual_count, score)`` best first, minus anyone followed since the last run."""
+    followees = await follow_graph.following(db, user_id)
+    result = await db.execute(
+        select(User, FollowSuggestion.mutual_count, FollowSuggestion.score)
+        .join(FollowSuggestion, FollowSuggestion.suggested_id == User.id)
+        .where(FollowSuggestion.user_id == user_id, User.deleted_at.is_(None))
+        .order_by(FollowSuggestion.score.desc(), FollowSuggestion.suggested_id)
+        .limit(limit + len(followees))
+    )
+    rows = [tuple(row) for row in result.all() if row.User.id not in followees]
+    return rows[:limit]
@@ -0,0 +1,30 @@
+"""Get-or-create of tags by name."""
+from typing import Dict, Iterable
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import dialect_name
+from app.models import Tag
+
+
+async def upsert_tags(db: AsyncSession, names: Iterable[str]) -> Dict[str, Tag]:
+    """``{name: Tag}`` for ``names``, creating the missing ones, in one statement.
+
+    ``ON CONFLICT DO NOTHING RETURNING`` only returns the rows it inserted, so the conflict
+    branch is a no-op ``DO UPDATE``: that makes every row, new or existing, come back from
+    the same statement. Concurrent posts introducing the same tag both succeed instead of
+    one hitting the unique constraint on ``tags.name``. Rows are locked in name order, so
+    concurrent batches sharing several tags cannot deadlock on Postgres.
+    """
+    unique = sorted(set(names))
+    if not unique:
+        return {}
+    dialect = postgresql if dialect_name(db) == "postgresql" else sqlite
+    statement = dialect.insert(Tag.__table__).values([{"name": name} for name in unique])
+    statement = statement.on_conflict_do_update(
+        index_elements=[Tag.__table__.c.name], set_={"name": statement.excluded.name}
+    ).returning(Tag.__table__.c.id, Tag.__table__.c.name)
+    result = await db.execute(statement)
+    # Transient Tag objects, as the feed builds them: enough to serialize and link.
+    return {name: Tag(id=tag_id, name=name) for tag_id, name in result.all()}
@@ -0,0 +1,132 @@
+"""Materialized home timelines for the following feed (hybrid push/pull).
+
+Posts are pushed into every follower's ``timeline_entries`` when they are written.
+Authors with more than ``FANOUT_MAX_FOLLOWERS`` followers are not fanned out; their
+posts are flagged ``fanned_out = False`` and merged into the feed at read time instead.
+"""
+import os
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import and_, delete, func, insert, literal, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.core.pagination import before_time_key, page_with_cursor
+from app.models import Follow, Post, TimelineEntry, User
+
+FANOUT_MAX_FOLLOWERS = int(os.getenv("FANOUT_MAX_FOLLOWERS", "1000"))
+# How many of a user's latest posts land in a new follower's timeline.
+FOLLOW_BACKFILL_POSTS = int(os.getenv("TIMELINE_BACKFILL_POSTS", "200"))
+
+_ENTRY_COLUMNS = ["user_id", "post_id", "created_at"]
+
+
+def _followees(user_id: int):
+    return select(Follow.followed_id).where(Follow.follower_id == user_id)
+
+
+async def should_fan_out(db: AsyncSession, author_id: int) -> bool:
+    result = await db.execute(select(User.follower_count).where(User.id == author_id))
+    return (result.scalar_one_or_none() or 0) <= FANOUT_MAX_FOLLOWERS
+
+
+async def fan_out_posts(db: AsyncSession, post_ids: List[int]) -> None:
+    """Push flushed posts into their authors' followers' timelines, in one statement."""
+    await db.execute(
+        insert(TimelineEntry).from_select(
+            _ENTRY_COLUMNS,
+            select(Follow.follower_id, Post.id, Post.created_at)
+            .join(Post, Post.user_id == Follow.followed_id)
+            .where(Post.id.in_(post_ids), Post.fanned_out.is_(True)),
+        )
+    )
+
+
+async def backfill_timeline(db: AsyncSession, follower_id: int, followed_id: int) -> None:
+    """Copy the followed user's latest pushed posts into a new follower's timeline."""
+    recent = (
+        select(literal(follower_id), Post.id, Post.created_at)
+        .where(Post.user_id == followed_id, Post.fanned_out.is_(True))
+        .order_by(Post.created_at.desc(), Post.id.desc())
+        .limit(FOLLOW_BACKFILL_POSTS)
+    )
+    await db.execute(insert(TimelineEntry).from_select(_ENTRY_COLUMNS, recent))
+
+
+async def prune_timeline(db: AsyncSession, follower_id: int, followed_id: int) -> None:
+    await db.execute(
+        delete(TimelineEntry).where(
+            TimelineEntry.user_id == follower_id,
+            TimelineEntry.post_id.in_(select(Post.id).where(Post.user_id == followed_id)),
+        )
+    )
+
+
+def following_clause(user_id: int) -> ColumnElement:
+    """Membership test for the following feed, for queries that also filter on other columns."""
+    pushed = select(TimelineEntry.post_id).where(TimelineEntry.user_id == user_id)
+    return or_(
+        Post.id.in_(pushed),
+        and_(Post.fanned_out.is_(False), Post.user_id.in_(_followees(user_id))),
+    )
+
+
+async def read_following(
+    db: AsyncSession,
+    user_id: int,
+    after: Optional[tuple[datetime, int]],
+    skip: int,
+    limit: int,
+) -> tuple[list[int], Optional[str]]:
+    """Return one page of post ids for the following feed and the cursor for the next page.
+
+    Both sources are range reads in ``(created_at DESC, id DESC)`` order: the user's own
+    timeline rows, and the latest posts of followed authors that were not fanned out.
+    ``skip`` is ignored when resuming from ``after``, as in the other feeds.
+    """
+    if after:
+        skip = 0
+    window = skip + limit + 1
+    pushed = select(TimelineEntry.post_id, TimelineEntry.created_at).where(TimelineEntry.user_id == user_id)
+    pulled = select(Post.id, Post.created_at).where(
+        Post.fanned_out.is_(False), Post.user_id.in_(_followees(user_id))
+    )
+    if after:
+        pushed = pushed.where(before_time_key(TimelineEntry.created_at, TimelineEntry.post_id, *after))
+        pulled = pulled.where(before_time_key(Post.created_at, Post.id, *after))
+    pushed = pushed.order_by(TimelineEntry.created_at.desc(), TimelineEntry.post_id.desc()).limit(window)
+    pulled = pulled.order_by(Post.created_at.desc(), Post.id.desc()).limit(window)
+
+    rows = (await db.execute(pushed)).all() + (await db.execute(pulled)).all()
+    rows.sort(key=lambda row: (row[1], row[0]), reverse=True)
+    page, next_cursor = page_with_cursor(rows[skip:window], limit, lambda row: (row[1], row[0]))
+    return [row[0] for row in page], next_cursor
+
+
+async def rebuild_timelines(db: AsyncSession) -> int:
+    """Recompute every post's delivery mode and refill all timelines from ``follows``."""
+    follower_counts = (
+        select(Follow.followed_id, func.count().label("followers"))
+        .group_by(Follow.followed_id)
+        .subquery()
+    )
+    heavy_authors = select(follower_counts.c.followed_id).where(
+        follower_counts.c.followers > FANOUT_MAX_FOLLOWERS
+    )
+    await db.execute(delete(TimelineEntry))
+    await db.execute(
+        Post.__table__.update().values(
+            fanned_out=Post.user_id.not_in(heavy_authors), updated_at=Post.updated_at
+        )
+    )
+    result = await db.execute(
+        insert(TimelineEntry).from_select(
+            _ENTRY_COLUMNS,
+            select(Follow.follower_id, Post.id, Post.created_at)
+            .join(Post, Post.user_id == Follow.followed_id)
+            .where(Post.fanned_out.is_(True)),
+        )
+    )
+    await db.commit()
+    return result.rowcount
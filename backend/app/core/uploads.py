@@ -0,0 +1,43 @@
+"""Files stored under ``static/uploads`` and served from ``/static/uploads``."""
+import asyncio
+from pathlib import Path
+from typing import Iterable
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+UPLOAD_DIR = BASE_DIR / "static" / "uploads"
+UPLOAD_URL_PREFIX = "/static/uploads/"
+
+
+def _upload_paths(urls: Iterable[str]) -> list[Path]:
+    paths = []
+    for url in urls:
+        if not url or not url.startswith(UPLOAD_URL_PREFIX):
+            continue  # external media, or not ours
+        name = url[len(UPLOAD_URL_PREFIX):]
+        # Upload names are generated flat file names; anything else is not ours to delete.
+        if name and Path(name).name == name:
+            paths.append(UPLOAD_DIR / name)
+    return paths
+
+
+def _unlink(paths: list[Path]) -> int:
+    removed = 0
+    for path in paths:
+        try:
+            path.unlink()
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+async def remove_uploads(urls: Iterable[str]) -> int:
+    """Delete the uploaded files behind ``urls`` (off the event loop); returns how many existed.
+
+    Upload names are random per upload, so a file referenced by a deleted post or avatar is
+    not shared with anything else.
+    """
+    paths = _upload_paths(urls)
+    if not paths:
+        return 0
+    return await asyncio.to_thread(_unlink, paths)
@@ -0,0 +1,101 @@
+"""Group commit of small write transactions on SQLite.
+
+SQLite has one writer at a time, so concurrent comments and ratings would each wait for
+the write lock, take it for a few statements and commit. Instead they are submitted
+here as jobs: one task drains the queue and runs every job waiting in it in a single
+transaction on the writer connection. Each job gets its own SAVEPOINT, so one that
+fails is rolled back alone, and the batch commits once.
+
+On other databases writers do not exclude each other, so a job runs straight away in the
+caller's session.
+"""
+import asyncio
+import os
+from typing import Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import WriteSessionLocal, engine
+
+WRITE_BATCH_MAX = int(os.getenv("WRITE_BATCH_MAX", "64"))
+
+T = TypeVar("T")
+Job = Callable[[AsyncSession], Awaitable[T]]
+
+
+class WriteQueue:
+    def __init__(self, session_factory, max_batch: int, group_commit: bool) -> None:
+        self._session_factory = session_factory
+        self._max_batch = max_batch
+        self._group_commit = group_commit
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    async def submit(self, db: AsyncSession, job: Job) -> T:
+        """Run ``job`` in a write transaction and return its result once committed.
+
+        With group commit the job gets the batch's session, otherwise the caller's ``db``,
+        which is committed. The job must not commit, and its result must not need the
+        session afterwards (return plain values or loaded objects). Callers must not hold
+        a write transaction of their own while waiting: the batch needs the writer
+        connection.
+        """
+        if not self._group_commit:
+            # Not a session of its own: a request holding one connection while waiting
+            # for a second can drain the pool.
+            result = await job(db)
+            await db.commit()
+            return result
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((job, future))
+        return await future
+
+    async def close(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self._max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await self._commit_batch(batch)
+
+    async def _commit_batch(self, batch: List[Tuple[Job, asyncio.Future]]) -> None:
+        outcomes = []
+        try:
+            async with self._session_factory() as db:
+                for job, future in batch:
+                    if future.done():  # The request was cancelled while queued.
+                        continue
+                    try:
+                        async with db.begin_nested():
+                            outcomes.append((future, await job(db), None))
+                    except Exception as exc:
+                        outcomes.append((future, None, exc))
+                await db.commit()
+        except BaseException as exc:
+            for _, future in batch:
+                if future.done():
+                    continue
+                if isinstance(exc, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(exc)
+            if not isinstance(exc, Exception):
+                raise
+            return
+        for future, result, exc in outcomes:
+            if future.done():
+                continue
+            if exc is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exc)
+
+
+write_queue = WriteQueue(WriteSessionLocal, WRITE_BATCH_MAX, group_commit=engine.dialect.name == "sqlite")
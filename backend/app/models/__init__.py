@@ -1,10 +1,14 @@
 from app.core.database import Base
+from app.models.activity import ActiveUserSketch, DailyActivity, DailyMediaPosts
 from app.models.comment import Comment
 from app.models.follow import Follow
 from app.models.post import MediaType, Post
 from app.models.post_tag import PostTag
+from app.models.ranking import HotScoreParams
 from app.models.rating import Rating
+from app.models.suggestion import FollowSuggestion, StaleSuggestions
 from app.models.tag import Tag
+from app.models.timeline import TimelineEntry
 from app.models.user import User
 
 __all__ = [
@@ -17,4 +21,11 @@ __all__ = [
     "PostTag",
     "MediaType",
     "Follow",
+    "TimelineEntry",
+    "FollowSuggestion",
+    "StaleSuggestions",
+    "DailyActivity",
+    "DailyMediaPosts",
+    "ActiveUserSketch",
+    "HotScoreParams",
 ]
@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Date, DateTime, Integer, LargeBinary, String
+
+from app.core.database import Base
+
+
+class DailyActivity(Base):
+    """Per-day counts rolled up from the source tables by app/core/rollups.py (UTC days)."""
+
+    __tablename__ = "daily_activity"
+
+    day = Column(Date, primary_key=True)
+    signups = Column(Integer, nullable=False, default=0)
+    posts = Column(Integer, nullable=False, default=0)
+    comments = Column(Integer, nullable=False, default=0)
+    ratings = Column(Integer, nullable=False, default=0)
+    # Distinct users who posted, commented or rated that day.
+    active_users = Column(Integer, nullable=False, default=0)
+    rolled_up_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class DailyMediaPosts(Base):
+    """Posts created per day and media type, rolled up alongside ``daily_activity``."""
+
+    __tablename__ = "daily_media_posts"
+
+    day = Column(Date, primary_key=True)
+    media_type = Column(String(16), primary_key=True)
+    posts = Column(Integer, nullable=False)
+
+
+class ActiveUserSketch(Base):
+    """HyperLogLog registers of the users active on a UTC day, see app/core/sketches.py."""
+
+    __tablename__ = "active_user_sketches"
+
+    day = Column(Date, primary_key=True)
+    # zlib-compressed, one byte per register.
+    registers = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
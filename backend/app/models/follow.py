@@ -1,4 +1,4 @@
-from sqlalchemy import Column, ForeignKey, Integer, UniqueConstraint
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, UniqueConstraint, func
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -6,10 +6,17 @@ from app.core.database import Base
 
 class Follow(Base):
     __tablename__ = "follows"
-    __table_args__ = (UniqueConstraint("follower_id", "followed_id", name="uq_follow"),)
+    __table_args__ = (
+        UniqueConstraint("follower_id", "followed_id", name="uq_follow"),
+        # The primary key only serves lookups by follower; these serve both list directions
+        # in newest-first keyset order.
+        Index("ix_follows_followed_id_created_at", "followed_id", "created_at", "follower_id"),
+        Index("ix_follows_follower_id_created_at", "follower_id", "created_at", "followed_id"),
+    )
 
     follower_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
     followed_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     follower = relationship("User", foreign_keys=[follower_id], back_populates="following")
     followed = relationship("User", foreign_keys=[followed_id], back_populates="followers")
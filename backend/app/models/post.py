@@ -1,6 +1,7 @@
 from enum import Enum
+from typing import Optional
 
-from sqlalchemy import Column, DateTime, Enum as SQLEnum, ForeignKey, Integer, JSON, Text, func
+from sqlalchemy import Boolean, Column, DateTime, Enum as SQLEnum, Float, ForeignKey, Index, Integer, JSON, Text, func
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -14,6 +15,17 @@ class MediaType(str, Enum):
 
 class Post(Base):
     __tablename__ = "posts"
+    __table_args__ = (
+        # Keyset pagination of the feeds walks these in (created_at DESC, id DESC) order.
+        # Existing databases get them from scripts/backfill_post_counters.py.
+        Index("ix_posts_created_at_id", "created_at", "id"),
+        Index("ix_posts_user_id_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_posts_media_type_created_at_id", "media_type", "created_at", "id"),
+        Index("ix_posts_hot_score_id", "hot_score", "id"),
+    )
+    # Fetch server defaults (timestamps) with RETURNING on insert, so a new post can be
+    # serialized without reloading it.
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -27,8 +39,27 @@ class Post(Base):
         onupdate=func.now(),
         nullable=False,
     )
+    # Engagement counters maintained by the comment/rating endpoints in the same
+    # transaction as the write; scripts/backfill_post_counters.py repairs them.
+    comment_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Moved forward by every comment/rating write; the detail endpoint's ETag is built from it.
+    last_interaction_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # Ranking for sort=hot, see app/core/ranking.py.
+    hot_score = Column(Float, nullable=False, default=0.0, server_default="0")
+    # False when the author had too many followers to push the post into their
+    # timelines; such posts are pulled into the following feed at read time.
+    fanned_out = Column(Boolean, nullable=False, default=True, server_default="1")
 
     user = relationship("User", back_populates="posts")
-    comments = relationship("Comment", back_populates="post", cascade="all, delete-orphan")
-    ratings = relationship("Rating", back_populates="post", cascade="all, delete-orphan")
-    tags = relationship("Tag", secondary="post_tags", back_populates="posts")
+    # Children go through the database's ON DELETE CASCADE, see app/models/user.py.
+    comments = relationship("Comment", back_populates="post", cascade="all, delete-orphan", passive_deletes=True)
+    ratings = relationship("Rating", back_populates="post", cascade="all, delete-orphan", passive_deletes=True)
+    tags = relationship("Tag", secondary="post_tags", back_populates="posts", passive_deletes=True)
+
+    @property
+    def average_rating(self) -> Optional[float]:
+        if not self.rating_count:
+            return None
+        return self.rating_sum / self.rating_count
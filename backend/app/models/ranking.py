@@ -0,0 +1,14 @@
+from sqlalchemy import Column, DateTime, Float, Integer
+
+from app.core.database import Base
+
+
+class HotScoreParams(Base):
+    """The weight and half-life every stored ``posts.hot_score`` was computed with; one row."""
+
+    __tablename__ = "hot_score_params"
+
+    id = Column(Integer, primary_key=True)
+    half_life_hours = Column(Float, nullable=False)
+    comment_weight = Column(Float, nullable=False)
+    rescored_at = Column(DateTime(timezone=True), nullable=False)
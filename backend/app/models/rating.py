@@ -1,4 +1,4 @@
-from sqlalchemy import CheckConstraint, Column, DateTime, ForeignKey, Integer, UniqueConstraint, func
+from sqlalchemy import CheckConstraint, Column, DateTime, ForeignKey, Index, Integer, UniqueConstraint, func
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -9,6 +9,9 @@ class Rating(Base):
     __table_args__ = (
         UniqueConstraint("post_id", "user_id", name="uq_rating_post_user"),
         CheckConstraint("score BETWEEN 1 AND 5", name="ck_rating_score_range"),
+        Index("ix_ratings_post_id_created_at_id", "post_id", "created_at", "id"),
+        # Day range scans of the activity rollups.
+        Index("ix_ratings_created_at", "created_at"),
     )
 
     id = Column(Integer, primary_key=True, index=True)
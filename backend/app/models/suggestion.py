@@ -0,0 +1,26 @@
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer
+
+from app.core.database import Base
+
+
+class FollowSuggestion(Base):
+    """A precomputed "people you may know" candidate, written by app/core/suggestion_job.py."""
+
+    __tablename__ = "follow_suggestions"
+    __table_args__ = (Index("ix_follow_suggestions_user_id_score", "user_id", "score"),)
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    suggested_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True, index=True)
+    # Adamic-Adar over the followees the two have in common, and how many there are.
+    score = Column(Float, nullable=False)
+    mutual_count = Column(Integer, nullable=False)
+    computed_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class StaleSuggestions(Base):
+    """A user whose follows changed since their suggestions were last computed."""
+
+    __tablename__ = "stale_suggestions"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    marked_at = Column(DateTime(timezone=True), nullable=False)
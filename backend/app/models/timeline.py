@@ -0,0 +1,17 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer
+
+from app.core.database import Base
+
+
+class TimelineEntry(Base):
+    """A post pushed into a follower's home timeline when it was written."""
+
+    __tablename__ = "timeline_entries"
+    __table_args__ = (
+        Index("ix_timeline_entries_user_id_created_at_post_id", "user_id", "created_at", "post_id"),
+    )
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True, index=True)
+    # Copy of posts.created_at so a timeline page is a range read of this table alone.
+    created_at = Column(DateTime(timezone=True), nullable=False)
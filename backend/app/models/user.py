@@ -12,21 +12,32 @@ class User(Base):
     password_hash = Column(String(255), nullable=False)
     nickname = Column(String(100), nullable=True)
     avatar_url = Column(String(255), nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
     is_admin = Column(Boolean, nullable=False, server_default="0")
+    # Set when an admin deletes the account; the row itself goes once app/core/purge.py
+    # has removed everything the user wrote. Deleted users cannot log in.
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+    # Maintained by follow/unfollow in the same transaction as the follows row;
+    # scripts/backfill_follow_counts.py repairs them.
+    follower_count = Column(Integer, nullable=False, default=0, server_default="0")
+    following_count = Column(Integer, nullable=False, default=0, server_default="0")
 
-    posts = relationship("Post", back_populates="user", cascade="all, delete-orphan")
-    comments = relationship("Comment", back_populates="user", cascade="all, delete-orphan")
-    ratings = relationship("Rating", back_populates="user", cascade="all, delete-orphan")
+    # Children are removed by the database's ON DELETE CASCADE rather than loaded into
+    # the session and deleted one by one.
+    posts = relationship("Post", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+    comments = relationship("Comment", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+    ratings = relationship("Rating", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
     followers = relationship(
         "Follow",
         foreign_keys="Follow.followed_id",
         back_populates="followed",
         cascade="all, delete-orphan",
+        passive_deletes=True,
     )
     following = relationship(
         "Follow",
         foreign_keys="Follow.follower_id",
         back_populates="follower",
         cascade="all, delete-orphan",
+        passive_deletes=True,
     )
@@ -1,5 +1,6 @@
 from app.routers.auth import router as auth_router
 from app.routers.assistant import router as assistant_router
+from app.routers.export import router as export_router
 from app.routers.friends import router as friends_router
 from app.routers.interactions import router as interactions_router
 from app.routers.posts import router as posts_router
@@ -16,4 +17,5 @@ __all__ = [
     "users_router",
     "friends_router",
     "stats_router",
+    "export_router",
 ]
@@ -1,27 +1,29 @@
+import logging
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from jose import JWTError, jwt
 from pydantic import BaseModel
-from sqlalchemy import select
+from sqlalchemy import exc, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
+from app.core.database import AsyncSessionLocal, engine, get_db
+from app.core.passwords import password_hasher
+from app.core.principals import load_principal, principal_cache, principal_user, snapshot_of
 from app.core.security import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
-    ALGORITHM,
-    SECRET_KEY,
     create_access_token,
-    hash_password,
-    verify_password,
+    decode_token,
 )
 from app.models import User
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
+logger = logging.getLogger(__name__)
+
 
 class UserCreate(BaseModel):
     username: str
@@ -51,31 +53,37 @@ async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User
     return result.scalar_one_or_none()
 
 
-async def get_user_by_id(db: AsyncSession, user_id: int) -> Optional[User]:
-    result = await db.execute(select(User).where(User.id == user_id))
-    return result.scalar_one_or_none()
+async def authenticate(db: AsyncSession, token: str) -> Optional[User]:
+    """The active user ``token`` belongs to, or None: the one path behind both current-user
+    dependencies. Served from the principal cache when it can be (app/core/principals.py)."""
+    snapshot = principal_cache.get(token)
+    if snapshot is None:
+        claims = decode_token(token)
+        if claims is None:
+            return None
+        user_id, expires_at = claims
+        generation = principal_cache.generation
+        snapshot = await load_principal(db, user_id)
+        if snapshot is None and db.bind is not engine:
+            # Signed up moments ago on the primary and not replicated yet.
+            async with AsyncSessionLocal() as primary:
+                snapshot = await load_principal(primary, user_id)
+        if snapshot is None:
+            return None
+        principal_cache.put(token, expires_at, snapshot, generation)
+    return principal_user(snapshot)
 
 
 async def get_current_user(
     db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme)
 ) -> User:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        sub = payload.get("sub")
-        if sub is None:
-            raise credentials_exception
-        user_id = int(sub)
-    except (JWTError, ValueError):
-        raise credentials_exception
-
-    user = await get_user_by_id(db, user_id)
+    user = await authenticate(db, token)
     if user is None:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
 
@@ -84,10 +92,12 @@ async def register(user_in: UserCreate, db: AsyncSession = Depends(get_db)) -> U
     existing_user = await get_user_by_username(db, user_in.username)
     if existing_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username already registered")
+    # Hand the connection back while the password is hashed.
+    await db.commit()
 
     user = User(
         username=user_in.username,
-        password_hash=hash_password(user_in.password),
+        password_hash=await password_hasher.hash(user_in.password),
         nickname=user_in.nickname,
     )
     db.add(user)
@@ -96,19 +106,48 @@ async def register(user_in: UserCreate, db: AsyncSession = Depends(get_db)) -> U
     return user
 
 
+async def _store_rehash(db: AsyncSession, user_id: int, old_hash: str, new_hash: str) -> None:
+    """Replace a hash made at other cost settings; the login succeeds even if this fails."""
+    try:
+        # Unless the password changed since it was read.
+        await db.execute(
+            update(User)
+            .where(User.id == user_id, User.password_hash == old_hash)
+            .values(password_hash=new_hash)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+    except exc.SQLAlchemyError:
+        await db.rollback()
+        logger.warning("could not store the rehashed password of user %d", user_id, exc_info=True)
+        return
+    password_hasher.rehashed += 1
+
+
 @router.post("/token", response_model=Token)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)
 ) -> Token:
+    generation = principal_cache.generation
     user = await get_user_by_username(db, form_data.username)
-    if not user or not verify_password(form_data.password, user.password_hash):
+    # Hand the connection back first: hashing may queue behind other logins for seconds.
+    await db.commit()
+    valid, new_hash = False, None
+    if user and user.deleted_at is None:
+        valid, new_hash = await password_hasher.verify(form_data.password, user.password_hash)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    snapshot = snapshot_of(user)
+    if new_hash is not None:
+        await _store_rehash(db, user.id, user.password_hash, new_hash)
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(data={"sub": str(user.id)}, expires_delta=access_token_expires)
+    # The client's next requests present this token: have its principal ready.
+    principal_cache.put(access_token, time.time() + access_token_expires.total_seconds(), snapshot, generation)
     return Token(access_token=access_token, token_type="bearer")
 
 
@@ -0,0 +1,55 @@
+from datetime import datetime
+from typing import AsyncIterator, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import exc
+
+from app.core.database import AsyncSessionLocal
+from app.core.export import EXPORT_COLUMNS, MEDIA_TYPES, as_utc, export_headers, export_rows, watermark
+from app.core.replicas import replica_set
+from app.models import User
+from app.routers.auth import get_current_user
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+
+@router.get("/{table}")
+async def export_table(
+    table: str,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    since: Optional[datetime] = None,
+    gzip: bool = False,
+    current_user: User = Depends(get_current_user),
+):
+    """Stream every row of ``table`` (posts, comments, ratings or follows) created after
+    ``since`` and up to the ``X-Export-Watermark`` response header; pass that back as
+    ``since`` for the next incremental export. ``gzip`` compresses the body on the fly."""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    if table not in EXPORT_COLUMNS:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown export table")
+    if since is not None:
+        since = as_utc(since)
+
+    # Long sequential scans belong on a replica when there is one.
+    replica = replica_set.pick(None)
+    if replica is None:
+        sessions, until = AsyncSessionLocal, watermark()
+    else:
+        sessions, until = replica.sessions, watermark(replica.lag_seconds or 0.0)
+
+    async def body() -> AsyncIterator[bytes]:
+        try:
+            async for chunk in export_rows(sessions, table, format, since, until, gzip):
+                yield chunk
+        except (exc.OperationalError, exc.InterfaceError) as error:
+            if replica is not None:
+                replica.mark_down(repr(error))
+            raise
+
+    return StreamingResponse(
+        body(),
+        media_type="application/gzip" if gzip else MEDIA_TYPES[format],
+        headers=export_headers(table, format, gzip, until),
+    )
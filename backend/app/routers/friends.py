@@ -1,12 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
+from app.core import timeline
 from app.core.database import get_db
-from app.models import Follow, User
+from app.core.follow_graph import follow_graph
+from app.core.follows import add_follow, follower_page, following_page, remove_follow
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.replicas import get_read_db
+from app.core.suggestions import mark_stale
+from app.models import User
 from app.routers.auth import get_current_user
-from app.schemas import UserOut
+from app.schemas import FollowCounts, UserOut
 
 router = APIRouter(tags=["friends"])
 
@@ -19,18 +26,15 @@ async def follow_user(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot follow yourself")
 
     target = await db.get(User, user_id)
-    if not target:
+    if not target or target.deleted_at is not None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-    result = await db.execute(
-        select(Follow).where(Follow.follower_id == current_user.id, Follow.followed_id == user_id)
-    )
-    existing = result.scalar_one_or_none()
-    if existing:
+    if not await add_follow(db, current_user.id, user_id):
         return
-
-    db.add(Follow(follower_id=current_user.id, followed_id=user_id))
+    await timeline.backfill_timeline(db, current_user.id, user_id)
+    await mark_stale(db, [current_user.id])
     await db.commit()
+    follow_graph.followed(current_user.id, user_id)
     return
 
 
@@ -38,33 +42,48 @@ async def follow_user(
 async def unfollow_user(
     user_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)
 ):
-    result = await db.execute(
-        select(Follow).where(Follow.follower_id == current_user.id, Follow.followed_id == user_id)
-    )
-    follow = result.scalar_one_or_none()
-    if follow:
-        await db.delete(follow)
+    if await remove_follow(db, current_user.id, user_id):
+        await timeline.prune_timeline(db, current_user.id, user_id)
+        await mark_stale(db, [current_user.id])
         await db.commit()
+        follow_graph.unfollowed(current_user.id, user_id)
     return
 
 
-@router.get("/users/{user_id}/followers", response_model=list[UserOut])
-async def list_followers(user_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(Follow)
-        .options(selectinload(Follow.follower))
-        .where(Follow.followed_id == user_id)
-    )
-    follows = result.scalars().all()
-    return [f.follower for f in follows if f.follower]
+@router.get("/users/{user_id}/follow-counts", response_model=FollowCounts)
+async def follow_counts(user_id: int, db: AsyncSession = Depends(get_read_db)):
+    result = await db.execute(select(User.follower_count, User.following_count).where(User.id == user_id))
+    row = result.one_or_none()
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return FollowCounts(followers=row.follower_count, following=row.following_count)
+
+
+@router.get("/users/{user_id}/followers", response_model=List[UserOut])
+async def list_followers(
+    user_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_read_db),
+) -> List[User]:
+    """Newest followers first; the next page's cursor is sent in X-Next-Cursor."""
+    users, next_cursor = await follower_page(db, user_id, cursor, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return users
 
 
-@router.get("/users/{user_id}/following", response_model=list[UserOut])
-async def list_following(user_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(Follow)
-        .options(selectinload(Follow.followed))
-        .where(Follow.follower_id == user_id)
-    )
-    follows = result.scalars().all()
-    return [f.followed for f in follows if f.followed]
+@router.get("/users/{user_id}/following", response_model=List[UserOut])
+async def list_following(
+    user_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_read_db),
+) -> List[User]:
+    """Most recently followed users first; the next page's cursor is sent in X-Next-Cursor."""
+    users, next_cursor = await following_page(db, user_id, cursor, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return users
@@ -1,17 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import delete, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
+from app.core.counters import bump_post_counters
 from app.core.database import get_db
+from app.core.engagement import comment_page, rating_page
+from app.core.feed_cache import feed_cache
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.ratings import RATING_WRITE_BEHIND_MS, rating_buffer, remove_rating, upsert_rating
+from app.core.replicas import get_read_db
 from app.core.sensitive import check_sensitive_words
+from app.core.serialize import FastJSONResponse
+from app.core.sketches import active_users
+from app.core.write_queue import write_queue
 from app.models import Comment, Post, Rating, User
 from app.routers.auth import get_current_user
-from app.schemas import CommentCreate, CommentOut, RatingCreate, RatingOut
+from app.schemas import CommentCreate, CommentOut, RatingCreate, RatingOut, RatingPending
 
 router = APIRouter(tags=["interactions"])
 
 
+@router.get("/posts/{post_id}/comments", response_model=List[CommentOut])
+async def list_comments(
+    post_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+) -> List[Comment]:
+    """Newest-first comments of a post; the next page's cursor is sent in X-Next-Cursor."""
+    comments, next_cursor = await comment_page(db, post_id, cursor, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return comments
+
+
+@router.get("/posts/{post_id}/ratings", response_model=List[RatingOut])
+async def list_ratings(
+    post_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+) -> List[Rating]:
+    """Newest-first ratings of a post; the next page's cursor is sent in X-Next-Cursor."""
+    ratings, next_cursor = await rating_page(db, post_id, cursor, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return ratings
+
+
 @router.post("/posts/{post_id}/comments", response_model=CommentOut, status_code=status.HTTP_201_CREATED)
 async def add_comment(
     post_id: int,
@@ -20,17 +62,25 @@ async def add_comment(
     current_user: User = Depends(get_current_user),
 ) -> CommentOut:
     check_sensitive_words(comment_in.content)
-    post = await db.get(Post, post_id)
-    if not post:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
-
-    comment = Comment(post_id=post_id, user_id=current_user.id, content=comment_in.content)
-    db.add(comment)
-    await db.commit()
-    await db.refresh(comment)
 
-    # Ensure user relationship is available for response serialization.
-    comment.user = current_user
+    async def write(write_db: AsyncSession):
+        if not await bump_post_counters(write_db, post_id, comment_count=1):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+        result = await write_db.execute(
+            insert(Comment)
+            .values(post_id=post_id, user_id=current_user.id, content=comment_in.content)
+            .returning(Comment.id, Comment.created_at)
+        )
+        return result.one()
+
+    comment_id, created_at = await write_queue.submit(db, write)
+    feed_cache.bump(f"post:{post_id}", "hot")
+    active_users.record(current_user.id)
+
+    comment = Comment(
+        id=comment_id, post_id=post_id, user_id=current_user.id, content=comment_in.content, created_at=created_at
+    )
+    set_committed_value(comment, "user", current_user)
     return CommentOut.from_orm(comment)
 
 
@@ -52,36 +102,57 @@ async def delete_comment(
     ):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to delete this comment")
 
-    await db.delete(comment)
-    await db.commit()
+    async def write(write_db: AsyncSession) -> None:
+        result = await write_db.execute(delete(Comment).where(Comment.id == comment_id).returning(Comment.id))
+        # Deleted concurrently: the other request already decremented the counter.
+        if result.scalar_one_or_none() is not None:
+            await bump_post_counters(write_db, comment.post_id, comment_count=-1)
+
+    await write_queue.submit(db, write)
+    feed_cache.bump(f"post:{comment.post_id}", "hot")
     return None
 
 
-@router.post("/posts/{post_id}/rate", response_model=RatingOut)
+@router.post(
+    "/posts/{post_id}/rate",
+    response_model=RatingOut,
+    responses={
+        status.HTTP_202_ACCEPTED: {
+            "model": RatingPending,
+            "description": "Buffered (RATING_WRITE_BEHIND_MS set); written by the next flush",
+        }
+    },
+)
 async def rate_post(
     post_id: int,
     rating_in: RatingCreate,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
-) -> RatingOut:
-    post = await db.get(Post, post_id)
-    if not post:
+):
+    if RATING_WRITE_BEHIND_MS:
+        # Buffered: acknowledged with 202, written by the next flush. There is no rating
+        # id or created_at until then.
+        if await db.scalar(select(Post.id).where(Post.id == post_id)) is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+        rating_buffer.record(post_id, current_user.id, rating_in.score)
+        active_users.record(current_user.id)
+        pending = RatingPending(post_id=post_id, score=rating_in.score)
+        return FastJSONResponse(pending.model_dump(), status_code=status.HTTP_202_ACCEPTED)
+
+    written = await write_queue.submit(
+        db, lambda write_db: upsert_rating(write_db, post_id, current_user.id, rating_in.score)
+    )
+    if written is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+    feed_cache.bump(f"post:{post_id}", "hot")
+    active_users.record(current_user.id)
 
-    result = await db.execute(
-        select(Rating).where(Rating.post_id == post_id, Rating.user_id == current_user.id)
+    rating_id, created_at = written
+    rating = Rating(
+        id=rating_id, post_id=post_id, user_id=current_user.id, score=rating_in.score, created_at=created_at
     )
-    rating = result.scalar_one_or_none()
-
-    if rating:
-        rating.score = rating_in.score
-    else:
-        rating = Rating(post_id=post_id, user_id=current_user.id, score=rating_in.score)
-        db.add(rating)
-
-    await db.commit()
-    await db.refresh(rating)
-    rating.user = current_user
+    # Not attached to the session: only what the response serializes.
+    set_committed_value(rating, "user", current_user)
     return RatingOut.from_orm(rating)
 
 
@@ -91,13 +162,11 @@ async def delete_rating(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    result = await db.execute(
-        select(Rating).where(Rating.post_id == post_id, Rating.user_id == current_user.id)
-    )
-    rating = result.scalar_one_or_none()
-    if not rating:
-        return None  # Idempotent
+    if RATING_WRITE_BEHIND_MS:
+        rating_buffer.record(post_id, current_user.id, None)
+        return None
 
-    await db.delete(rating)
-    await db.commit()
+    if not await write_queue.submit(db, lambda write_db: remove_rating(write_db, post_id, current_user.id)):
+        return None  # Idempotent
+    feed_cache.bump(f"post:{post_id}", "hot")
     return None
@@ -1,107 +1,249 @@
-from typing import List, Optional
+import hashlib
+from datetime import datetime
+from typing import List, Literal, Optional, Tuple
 
 from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
-from jose import JWTError, jwt
-from sqlalchemy import func, select
+from sqlalchemy import func, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 
+from app.core import purge, ranking, search, timeline
 from app.core.database import get_db
-from app.core.llm import analyze_content
+from app.core.engagement import comment_page, rating_page
+from app.core.feed import feed_query, unpack_feed_rows, viewer_followees, viewer_flags
+from app.core.feed_cache import feed_cache, filter_scopes, post_scopes
+from app.core.llm import analyze_contents
+from app.core.pagination import (
+    NEXT_CURSOR_HEADER,
+    before_score_key,
+    before_time_key,
+    decode_score_cursor,
+    decode_time_cursor,
+    page_with_cursor,
+)
+from app.core.ratings import rating_buffer
+from app.core.replicas import get_read_db, replica_set
 from app.core.sensitive import check_sensitive_words
-from app.core.security import ALGORITHM, SECRET_KEY
-from app.models import Comment, Follow, Post, Rating, Tag, User
-from app.routers.auth import get_current_user
-from app.schemas import PostCreate, PostDetail, PostOut
+from app.core.serialize import FastJSONResponse, post_detail_dict, post_dict, with_viewer_flags
+from app.core.sketches import active_users
+from app.core.security import bearer_token
+from app.core.tags import upsert_tags
+from app.models import Comment, Post, PostTag, Tag, User
+from app.routers.auth import authenticate, get_current_user
+from app.schemas import PostBatchCreate, PostCreate, PostDetail, PostOut, PostSearchResult
 
 router = APIRouter(prefix="/posts", tags=["posts"])
 
 
-async def _get_following_ids(db: AsyncSession, user_id: int) -> set[int]:
-    result = await db.execute(select(Follow.followed_id).where(Follow.follower_id == user_id))
-    return {row[0] for row in result.all()}
-
-
 async def get_current_user_optional(
-    db: AsyncSession = Depends(get_db), authorization: Optional[str] = Header(default=None)
+    db: AsyncSession = Depends(get_read_db), authorization: Optional[str] = Header(default=None)
 ) -> Optional[User]:
-    if not authorization:
-        return None
-    parts = authorization.split()
-    if len(parts) != 2 or parts[0].lower() != "bearer":
+    token = bearer_token(authorization)
+    if token is None:
         return None
-    token = parts[1]
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        sub = payload.get("sub")
-        if sub is None:
-            return None
-        user_id = int(sub)
-    except (JWTError, ValueError):
-        return None
-    result = await db.execute(select(User).where(User.id == user_id))
-    return result.scalar_one_or_none()
+    return await authenticate(db, token)
+
+
+async def _attach_comment_previews(db: AsyncSession, posts: List[Post], per_post: int) -> None:
+    """Populate ``post.comments`` with only the latest ``per_post`` comments of each post.
+
+    One windowed query serves the whole page, so a post with thousands of comments costs
+    the same as one with ``per_post``.
+    """
+    previews: dict[int, List[Comment]] = {post.id: [] for post in posts}
+    if per_post and posts:
+        ranked = (
+            select(
+                Comment.id,
+                func.row_number()
+                .over(partition_by=Comment.post_id, order_by=(Comment.created_at.desc(), Comment.id.desc()))
+                .label("position"),
+            )
+            .where(Comment.post_id.in_(previews))
+            .subquery()
+        )
+        result = await db.execute(
+            select(Comment)
+            .options(joinedload(Comment.user))
+            .join(ranked, ranked.c.id == Comment.id)
+            .where(ranked.c.position <= per_post)
+            .order_by(Comment.created_at, Comment.id)
+        )
+        for comment in result.scalars():
+            previews[comment.post_id].append(comment)
+    for post in posts:
+        set_committed_value(post, "comments", previews[post.id])
+
+
+async def _load_post(db: AsyncSession, post_id: int, viewer_id: Optional[int]) -> Optional[Tuple[Post, bool, bool]]:
+    """``(post, is_following, is_liked)`` with author and tags, in the feed's single statement."""
+    result = await db.execute(feed_query(viewer_id).where(Post.id == post_id))
+    entries = unpack_feed_rows(result.all(), await viewer_followees(db, viewer_id))
+    return entries[0] if entries else None
+
+
+def _post_etag(post: Post, is_following: bool, is_liked: bool, *variant: int) -> str:
+    # Posts and their authors are not editable, so the body only changes with engagement
+    # (last_interaction_at and the counters) and the viewer's own flags.
+    state = (
+        post.id,
+        post.last_interaction_at.isoformat(),
+        post.comment_count,
+        post.rating_count,
+        post.rating_sum,
+        is_following,
+        is_liked,
+        *variant,
+    )
+    return 'W/"%s"' % hashlib.blake2b(repr(state).encode(), digest_size=12).hexdigest()
 
 
-async def _get_post_with_relations(db: AsyncSession, post_id: int) -> Optional[Post]:
-    result = await db.execute(
-        select(Post)
-        .options(
-            selectinload(Post.user),
-            selectinload(Post.tags),
-            selectinload(Post.comments).selectinload(Comment.user),
-            selectinload(Post.ratings).selectinload(Rating.user),
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison: W/ prefixes are ignored.
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+async def _create_posts(db: AsyncSession, author: User, posts_in: List[PostCreate]) -> List[Post]:
+    """Insert posts with their tags, timeline entries and search rows, in one transaction.
+
+    The statement count does not grow with the number of posts or tags, and the returned
+    posts carry everything the response needs, so nothing is reloaded. Tags are inferred
+    for all posts concurrently before the transaction starts.
+    """
+    for post_in in posts_in:
+        check_sensitive_words(post_in.content)
+    # Hand the connection back while tags are inferred.
+    await db.commit()
+    inferred = await analyze_contents([post_in.content for post_in in posts_in])
+    tag_names = []
+    for post_in, extra in zip(posts_in, inferred):
+        names = [tag.strip() for tag in (post_in.tags or []) if tag.strip()]
+        names.extend(extra)
+        tag_names.append(list(dict.fromkeys(names)))
+    tags = await upsert_tags(db, (name for names in tag_names for name in names))
+
+    fanned_out = await timeline.should_fan_out(db, author.id)
+    hot_score = ranking.hot_score(0, 0, datetime.utcnow())
+    posts = [
+        Post(
+            user_id=author.id,
+            content=post_in.content,
+            media_type=post_in.media_type,
+            media_urls=post_in.media_urls,
+            fanned_out=fanned_out,
+            hot_score=hot_score,
         )
-        .where(Post.id == post_id)
-    )
-    return result.scalar_one_or_none()
+        for post_in in posts_in
+    ]
+    db.add_all(posts)
+    await db.flush()
+    links = [{"post_id": post.id, "tag_id": tags[name].id} for post, names in zip(posts, tag_names) for name in names]
+    if links:
+        await db.execute(insert(PostTag), links)
+    await timeline.fan_out_posts(db, [post.id for post in posts])
+    await search.index_posts(db, [(post.id, post.content) for post in posts])
+    await db.commit()
+
+    for post, names in zip(posts, tag_names):
+        set_committed_value(post, "user", author)
+        set_committed_value(post, "tags", sorted((tags[name] for name in names), key=lambda tag: tag.id))
+        feed_cache.bump(*post_scopes(post.id, post.user_id, post.media_type.value, names))
+    active_users.record(author.id)
+    return posts
+
+
+def _new_post_detail(post: Post) -> dict:
+    return post_detail_dict(post, False, False, [], None, [], None)
 
 
 @router.post("", response_model=PostDetail, status_code=status.HTTP_201_CREATED)
 async def create_post(
     post_in: PostCreate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)
-) -> PostDetail:
-    check_sensitive_words(post_in.content)
-    inferred_tags = await analyze_content(post_in.content)
-
-    tag_names = [tag.strip() for tag in (post_in.tags or []) if tag.strip()]
-    if inferred_tags:
-        tag_names.extend(inferred_tags)
-    existing_tags = []
-    if tag_names:
-        result = await db.execute(select(Tag).where(Tag.name.in_(tag_names)))
-        existing_tags = result.scalars().all()
-        existing_names = {t.name for t in existing_tags}
-        for name in set(tag_names) - existing_names:
-            new_tag = Tag(name=name)
-            db.add(new_tag)
-            existing_tags.append(new_tag)
-        await db.flush()
-
-    post = Post(
-        user_id=current_user.id,
-        content=post_in.content,
-        media_type=post_in.media_type,
-        media_urls=post_in.media_urls,
-        tags=existing_tags,
-    )
-    db.add(post)
-    await db.commit()
+) -> Response:
+    (post,) = await _create_posts(db, current_user, [post_in])
+    return FastJSONResponse(_new_post_detail(post), status_code=status.HTTP_201_CREATED)
 
-    post_with_relations = await _get_post_with_relations(db, post.id)
-    if not post_with_relations:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to load post")
 
-    average_rating = None
-    if post_with_relations.ratings:
-        average_rating = sum(r.score for r in post_with_relations.ratings) / len(post_with_relations.ratings)
+@router.post("/batch", response_model=List[PostDetail], status_code=status.HTTP_201_CREATED)
+async def create_posts_batch(
+    batch: PostBatchCreate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)
+) -> Response:
+    """Create up to 100 posts for the current user atomically; for importers."""
+    posts = await _create_posts(db, current_user, batch.posts)
+    return FastJSONResponse([_new_post_detail(post) for post in posts], status_code=status.HTTP_201_CREATED)
+
+
+async def _load_feed_page(
+    db: AsyncSession,
+    viewer_id: Optional[int],
+    tag: Optional[str],
+    user_id: Optional[int],
+    media_type: Optional[str],
+    following: bool,
+    sort: str,
+    cursor: Optional[str],
+    skip: int,
+    limit: int,
+    comment_preview: int,
+) -> tuple[List[dict], Optional[str]]:
+    query = feed_query(viewer_id)
+    cursor_key: Optional[tuple] = None
+    if sort == "hot":
+        sort_columns = ("hot_score", "id")
+        query = query.order_by(Post.hot_score.desc(), Post.id.desc())
+        cursor_clause = before_score_key(Post.hot_score, Post.id, *decode_score_cursor(cursor)) if cursor else None
+    else:
+        sort_columns = ("created_at", "id")
+        query = query.order_by(Post.created_at.desc(), Post.id.desc())
+        cursor_key = decode_time_cursor(cursor) if cursor else None
+        cursor_clause = before_time_key(Post.created_at, Post.id, *cursor_key) if cursor_key else None
+
+    # The plain following feed is a range read of the viewer's materialized timeline;
+    # combined with other filters it falls back to a membership test on the same data.
+    feed_ids: Optional[List[int]] = None
+    next_cursor: Optional[str] = None
+    if following:
+        if tag or user_id or media_type or sort == "hot":
+            query = query.where(timeline.following_clause(viewer_id))
+        else:
+            feed_ids, next_cursor = await timeline.read_following(db, viewer_id, cursor_key, skip, limit)
+            query = query.where(Post.id.in_(feed_ids))
+
+    if feed_ids is None:
+        query = query.limit(limit + 1)
+        if cursor_clause is not None:
+            query = query.where(cursor_clause)
+        elif skip:
+            query = query.offset(skip)
+    if tag:
+        query = query.join(Post.tags).where(Tag.name == tag)
+    if user_id:
+        query = query.where(Post.user_id == user_id)
+    if media_type:
+        query = query.where(Post.media_type == media_type)
 
-    return PostDetail.from_orm(post_with_relations).copy(
-        update={
-            "comment_count": len(post_with_relations.comments),
-            "average_rating": average_rating,
-        }
-    )
+    result = await db.execute(query)
+    rows = result.all()
+    if feed_ids is None:
+        rows, next_cursor = page_with_cursor(
+            rows, limit, lambda row: tuple(getattr(row[0], column) for column in sort_columns)
+        )
+    if not rows:
+        return [], next_cursor
+
+    entries = unpack_feed_rows(rows, await viewer_followees(db, viewer_id))
+    # Only the latest few comments are embedded; the rest are paged via /posts/{id}/comments.
+    await _attach_comment_previews(db, [post for post, _, _ in entries], comment_preview)
+
+    users: dict = {}
+    page = [post_dict(post, is_following, is_liked, users=users) for post, is_following, is_liked in entries]
+    return page, next_cursor
 
 
 @router.get("", response_model=List[PostOut])
@@ -110,108 +252,121 @@ async def list_posts(
     user_id: Optional[int] = None,
     media_type: Optional[str] = None,
     filter: Optional[str] = None,
+    sort: Literal["new", "hot"] = "new",
+    cursor: Optional[str] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
-    db: AsyncSession = Depends(get_db),
+    comment_preview: int = Query(3, ge=0, le=20),
+    db: AsyncSession = Depends(get_read_db),
     current_user: Optional[User] = Depends(get_current_user_optional),
-) -> List[PostOut]:
-    query = (
-        select(Post)
-        .options(
-            selectinload(Post.user),
-            selectinload(Post.tags),
-            selectinload(Post.comments).selectinload(Comment.user)
-        )
-        .order_by(Post.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-    )
-
-    if tag:
-        query = query.join(Post.tags).where(Tag.name == tag)
-    if filter == "following":
-        if not current_user:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Login required for following feed")
-        query = query.join(Follow, Post.user_id == Follow.followed_id).where(
-            Follow.follower_id == current_user.id
+) -> Response:
+    # Pages are keyed on (created_at, id), or (hot_score, id) for sort=hot; pass the
+    # X-Next-Cursor header of the previous response as `cursor`. `skip` is only honoured
+    # for clients that have not moved over yet.
+    following = filter == "following"
+    if following and not current_user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Login required for following feed")
+    viewer_id = current_user.id if current_user else None
+
+    # Right after their own write a viewer reads the primary (see get_read_db); the shared
+    # cache may hold a page computed from a lagging replica, so skip it for them too.
+    if following or replica_set.is_sticky(viewer_id):
+        page, next_cursor = await _load_feed_page(
+            db, viewer_id, tag, user_id, media_type, following, sort, cursor, skip, limit, comment_preview
         )
-    if user_id:
-        query = query.where(Post.user_id == user_id)
-    if media_type:
-        query = query.where(Post.media_type == media_type)
+    else:
+        # Everything but the following feed is the same for every viewer: serve it from the
+        # shared cache and overlay the viewer's own is_following / is_liked flags.
+        cache_key = (tag, user_id, media_type and media_type.lower(), sort, cursor, skip, limit, comment_preview)
+        cached = feed_cache.get(cache_key)
+        if cached is not None:
+            page, next_cursor = cached
+            if viewer_id is not None:
+                page = await _overlay_viewer_flags(db, viewer_id, page)
+        else:
+            generation = feed_cache.generation
+            page, next_cursor = await _load_feed_page(
+                db, viewer_id, tag, user_id, media_type, False, sort, cursor, skip, limit, comment_preview
+            )
+            shared = with_viewer_flags(page, {})
+            scopes = filter_scopes(tag, user_id, media_type, sort) + [f"post:{post['id']}" for post in page]
+            feed_cache.put(cache_key, scopes, (shared, next_cursor), generation)
+    if viewer_id is not None:
+        rating_buffer.overlay(viewer_id, page)
 
-    result = await db.execute(query)
-    posts = result.scalars().unique().all()
-    if not posts:
-        return []
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return FastJSONResponse(page, headers=headers)
 
-    post_ids = [p.id for p in posts]
 
-    following_ids: set[int] = set()
-    if current_user:
-        following_ids = await _get_following_ids(db, current_user.id)
+async def _overlay_viewer_flags(db: AsyncSession, viewer_id: int, page: List[dict]) -> List[dict]:
+    if not page:
+        return page
+    return with_viewer_flags(page, await viewer_flags(db, viewer_id, page))
 
-    comment_counts_result = await db.execute(
-        select(Comment.post_id, func.count(Comment.id)).where(Comment.post_id.in_(post_ids)).group_by(Comment.post_id)
-    )
-    comment_counts = {post_id: count for post_id, count in comment_counts_result.all()}
 
-    rating_result = await db.execute(
-        select(Rating.post_id, func.avg(Rating.score)).where(Rating.post_id.in_(post_ids)).group_by(Rating.post_id)
+@router.get("/search", response_model=List[PostSearchResult])
+async def search_posts(
+    q: str = Query(..., min_length=1, max_length=200),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    comment_preview: int = Query(0, ge=0, le=20),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Optional[User] = Depends(get_current_user_optional),
+) -> Response:
+    # Relevance order has no stable keyset to resume from, so results are paged with skip.
+    matches = search.search_matches(db, q)
+    if matches is None:
+        return FastJSONResponse([])
+    viewer_id = current_user.id if current_user else None
+    result = await db.execute(
+        feed_query(viewer_id)
+        .join(matches, matches.c.post_id == Post.id)
+        .order_by(matches.c.rank, Post.id.desc())
+        .offset(skip)
+        .limit(limit)
     )
-    avg_ratings = {post_id: float(avg) for post_id, avg in rating_result.all()}
-
-    # Get user's liked posts (ratings > 0)
-    liked_post_ids: set[int] = set()
+    entries = unpack_feed_rows(result.all(), await viewer_followees(db, viewer_id))
+    await _attach_comment_previews(db, [post for post, _, _ in entries], comment_preview)
+
+    results = []
+    users: dict = {}
+    for post, is_following, is_liked in entries:
+        body = post_dict(post, is_following, is_liked, users=users)
+        body["snippet"], body["highlights"] = search.snippet(post.content, q)
+        results.append(body)
     if current_user:
-        liked_result = await db.execute(
-            select(Rating.post_id).where(
-                Rating.user_id == current_user.id,
-                Rating.post_id.in_(post_ids),
-                Rating.score > 0
-            )
-        )
-        liked_post_ids = {row[0] for row in liked_result.all()}
-
-    post_out_list: List[PostOut] = []
-    for post in posts:
-        post_out = PostOut.from_orm(post).copy(
-            update={
-                "comment_count": comment_counts.get(post.id, 0),
-                "average_rating": avg_ratings.get(post.id),
-                "is_following": post.user_id in following_ids if current_user else False,
-                "is_liked": post.id in liked_post_ids,
-            }
-        )
-        post_out_list.append(post_out)
-
-    return post_out_list
+        rating_buffer.overlay(current_user.id, results)
+    return FastJSONResponse(results)
 
 
 @router.get("/{post_id}", response_model=PostDetail)
 async def get_post(
     post_id: int,
-    db: AsyncSession = Depends(get_db),
+    comment_limit: int = Query(20, ge=0, le=100),
+    rating_limit: int = Query(20, ge=0, le=100),
+    if_none_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_read_db),
     current_user: Optional[User] = Depends(get_current_user_optional),
-) -> PostDetail:
-    post = await _get_post_with_relations(db, post_id)
-    if not post:
+) -> Response:
+    loaded = await _load_post(db, post_id, current_user.id if current_user else None)
+    if not loaded:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
 
-    following_ids: set[int] = set()
+    post, is_following, is_liked = loaded
     if current_user:
-        following_ids = await _get_following_ids(db, current_user.id)
-
-    average_rating = None
-    if post.ratings:
-        average_rating = sum(r.score for r in post.ratings) / len(post.ratings)
-
-    return PostDetail.from_orm(post).copy(
-        update={
-            "comment_count": len(post.comments),
-            "average_rating": average_rating,
-            "is_following": bool(current_user and post.user_id in following_ids),
-        }
+        is_liked = rating_buffer.is_liked(current_user.id, post.id, is_liked)
+    # Clients re-polling a detail page revalidate with If-None-Match and get a bodiless
+    # 304 (after one query) until someone comments or rates.
+    etag = _post_etag(post, is_following, is_liked, comment_limit, rating_limit)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    comments, comments_cursor = await comment_page(db, post.id, None, comment_limit)
+    ratings, ratings_cursor = await rating_page(db, post.id, None, rating_limit)
+    return FastJSONResponse(
+        post_detail_dict(post, is_following, is_liked, comments, comments_cursor, ratings, ratings_cursor),
+        headers=headers,
     )
 
 
@@ -227,6 +382,7 @@ async def delete_post(
     if not (current_user.is_admin or post.user_id == current_user.id):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to delete this post")
 
-    await db.delete(post)
-    await db.commit()
+    tag_names = (await db.execute(select(Tag.name).join(Post.tags).where(Post.id == post.id))).scalars().all()
+    await purge.delete_post(db, post)
+    feed_cache.bump(*post_scopes(post.id, post.user_id, post.media_type.value, tag_names))
     return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,70 +1,86 @@
-from datetime import datetime, timedelta
+from datetime import date, timedelta
+from typing import Literal, Optional
 
-from fastapi import APIRouter, Depends
-from sqlalchemy import func, select
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
-from app.models import Post, User
+from app.core.database import engine, read_engine
+from app.core.feed_cache import feed_cache
+from app.core.follow_graph import follow_graph
+from app.core.passwords import password_hasher
+from app.core.pool import pool_stats
+from app.core.principals import principal_cache
+from app.core.replicas import get_read_db, replica_set
+from app.core.retention import MAX_WEEKS, retention_matrix
+from app.core.rollups import dashboard_stats, stats_cache, utc_today
+from app.core.sketches import MAX_DAILY_RANGE_DAYS, MAX_RANGE_DAYS, active_user_counts
+from app.models import User
+from app.routers.auth import get_current_user
 
 router = APIRouter(prefix="/stats", tags=["stats"])
 
 
 @router.get("/dashboard")
-async def get_dashboard_stats(db: AsyncSession = Depends(get_db)):
-    total_users_result = await db.execute(select(func.count(User.id)))
-    total_posts_result = await db.execute(select(func.count(Post.id)))
+async def get_dashboard_stats(db: AsyncSession = Depends(get_read_db)):
+    """Totals, the last week's active users and posts per media type, from the daily rollups."""
+    return await dashboard_stats(db)
 
-    total_users = total_users_result.scalar_one() or 0
-    total_posts = total_posts_result.scalar_one() or 0
 
-    # Real Daily Active Users (DAU) Calculation
-    # Definition: Anyone who posted, commented, or rated on that day.
-    from app.models import Comment, Rating
-    from sqlalchemy import union
+@router.get("/active")
+async def get_active_users(
+    start: Optional[date] = Query(None, alias="from"),
+    end: Optional[date] = Query(None, alias="to"),
+    granularity: Literal["day", "week", "month"] = "day",
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Estimated distinct active users per day, week or month of ``from``..``to``.
 
-    today = datetime.utcnow().date()
-    
-    # Total Interactions (Comments + Ratings)
-    total_comments = (await db.execute(select(func.count(Comment.id)))).scalar_one() or 0
-    total_ratings = (await db.execute(select(func.count(Rating.id)))).scalar_one() or 0
-    total_interactions = total_comments + total_ratings
-
-    daily_active = []
-    
-    for i in range(7):
-        target_date = today - timedelta(days=6 - i)
-        start_dt = datetime.combine(target_date, datetime.min.time())
-        end_dt = datetime.combine(target_date, datetime.max.time())
-        
-        # Select user_ids from all 3 tables for this time range
-        q_posts = select(Post.user_id).where(Post.created_at >= start_dt, Post.created_at <= end_dt)
-        q_comments = select(Comment.user_id).where(Comment.created_at >= start_dt, Comment.created_at <= end_dt)
-        q_ratings = select(Rating.user_id).where(Rating.created_at >= start_dt, Rating.created_at <= end_dt)
-        
-        # Union them to get unique active users
-        u_query = union(q_posts, q_comments, q_ratings)
-        
-        # Count the result of the union
-        result = await db.execute(
-             select(func.count()).select_from(u_query.subquery())
+    Defaults to the last 30 days. Counts come from HyperLogLog sketches and are within
+    ``relative_error`` (one standard error) of the exact figure.
+    """
+    end = end or utc_today()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'from' is after 'to'")
+    limit = MAX_DAILY_RANGE_DAYS if granularity == "day" else MAX_RANGE_DAYS
+    if (end - start).days >= limit:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"Range exceeds {limit} days for granularity {granularity}"
         )
-        active_count = result.scalar_one() or 0
-        
-        daily_active.append({"date": target_date.isoformat(), "active": active_count})
-
-    # Content Type Distribution
-    content_type_result = await db.execute(
-        select(Post.media_type, func.count(Post.id)).group_by(Post.media_type)
+    return await stats_cache.get(
+        ("active", start, end, granularity), lambda: active_user_counts(db, start, end, granularity)
     )
-    content_type_distribution = [
-        {"name": row[0], "value": row[1]} for row in content_type_result.all()
-    ]
 
-    return {
-        "total_users": total_users,
-        "total_posts": total_posts,
-        "total_interactions": total_interactions,
-        "daily_active": daily_active,
-        "content_type_distribution": content_type_distribution,
-    }
+
+@router.get("/retention")
+async def get_retention(weeks: int = Query(12, ge=1, le=MAX_WEEKS), db: AsyncSession = Depends(get_read_db)):
+    """Weekly signup cohorts of the last ``weeks`` weeks × weeks since signup.
+
+    ``active[k]`` is how many of a cohort posted, commented or rated in their k-th week
+    after signing up, ``retention[k]`` the same as a fraction of the cohort.
+    """
+    return await retention_matrix(db, weeks)
+
+
+@router.get("/cache")
+async def get_cache_stats(current_user: User = Depends(get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return {"feed": feed_cache.stats(), "follow_graph": follow_graph.stats(), "principals": principal_cache.stats()}
+
+
+@router.get("/pool")
+async def get_pool_stats(current_user: User = Depends(get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    if read_engine is engine:
+        stats = {"primary": pool_stats(engine)}
+    else:
+        stats = {"writer": pool_stats(engine), "reader": pool_stats(read_engine)}
+    if replica_set.replicas:
+        stats["replicas"] = [
+            {**health, "pool": pool_stats(replica.engine)}
+            for replica, health in zip(replica_set.replicas, replica_set.stats())
+        ]
+    stats["password_hashing"] = password_hasher.stats()
+    return stats
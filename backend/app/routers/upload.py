@@ -4,13 +4,11 @@ import shutil
 
 from fastapi import APIRouter, File, UploadFile
 
+from app.core.uploads import UPLOAD_DIR, UPLOAD_URL_PREFIX
 from app.schemas import UploadResponse
 
 router = APIRouter(tags=["upload"])
 
-BASE_DIR = Path(__file__).resolve().parent.parent.parent
-UPLOAD_DIR = BASE_DIR / "static" / "uploads"
-
 
 @router.post("/upload", response_model=UploadResponse)
 async def upload_file(file: UploadFile = File(...)) -> UploadResponse:
@@ -23,5 +21,5 @@ async def upload_file(file: UploadFile = File(...)) -> UploadResponse:
     with destination.open("wb") as buffer:
         shutil.copyfileobj(file.file, buffer)
 
-    url = f"/static/uploads/{unique_name}"
+    url = f"{UPLOAD_URL_PREFIX}{unique_name}"
     return UploadResponse(url=url)
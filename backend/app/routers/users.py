@@ -1,11 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
+from app.core import purge
+from app.core.database import AsyncSessionLocal, get_db
+from app.core.principals import principal_cache
+from app.core.replicas import get_read_db
+from app.core.suggestions import suggestions_for
 from app.models import User
 from app.routers.auth import get_current_user
-from app.schemas import UserOut
+from app.schemas import SuggestionOut, UserOut
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -25,7 +31,7 @@ async def list_users(
     current_user: User = Depends(get_current_user)
 ) -> list[UserOut]:
     await _ensure_admin(current_user)
-    query = select(User).order_by(User.created_at.desc())
+    query = select(User).where(User.deleted_at.is_(None)).order_by(User.created_at.desc())
     
     if search:
         search_term = f"%{search}%"
@@ -41,15 +47,33 @@ async def list_users(
     return users
 
 
+@router.get("/me/suggestions", response_model=list[SuggestionOut])
+async def list_suggestions(
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+) -> list[SuggestionOut]:
+    """People the current user may know, from the last batch run (app/core/suggestion_job.py)."""
+    rows = await suggestions_for(db, current_user.id, limit)
+    return [SuggestionOut(user=user, mutual_count=mutual_count, score=score) for user, mutual_count, score in rows]
+
+
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_user(
     user_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)
 ) -> Response:
     await _ensure_admin(current_user)
     user = await db.get(User, user_id)
-    if not user:
+    if not user or user.deleted_at is not None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-    await db.delete(user)
+    # Locks the account out straight away; the rows are removed by the purge.
+    user.deleted_at = datetime.utcnow()
     await db.commit()
+    principal_cache.invalidate(user.id)
+
+    if await purge.owned_rows(db, user.id) > purge.PURGE_INLINE_MAX_ROWS:
+        purge.schedule_user_purge(AsyncSessionLocal, user.id)
+        return Response(status_code=status.HTTP_202_ACCEPTED)
+    await purge.purge_user(db, user.id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
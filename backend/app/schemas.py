@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List, Optional, Literal
+from typing import List, Optional, Literal, Tuple
 
 from pydantic import BaseModel, Field
 
@@ -18,6 +18,17 @@ class UserOut(BaseModel):
         from_attributes = True
 
 
+class FollowCounts(BaseModel):
+    followers: int
+    following: int
+
+
+class SuggestionOut(BaseModel):
+    user: UserOut
+    mutual_count: int
+    score: float
+
+
 class TagOut(BaseModel):
     id: int
     name: str
@@ -58,6 +69,14 @@ class RatingOut(BaseModel):
         from_attributes = True
 
 
+class RatingPending(BaseModel):
+    """A rating accepted by the write-behind buffer (202); written by the next flush."""
+
+    post_id: int
+    score: int
+    pending: bool = True
+
+
 class PostCreate(BaseModel):
     content: str
     media_type: MediaType
@@ -65,6 +84,10 @@ class PostCreate(BaseModel):
     tags: List[str] = []
 
 
+class PostBatchCreate(BaseModel):
+    posts: List[PostCreate] = Field(..., min_length=1, max_length=100)
+
+
 class PostOut(BaseModel):
     id: int
     user_id: int
@@ -85,9 +108,20 @@ class PostOut(BaseModel):
         from_attributes = True
 
 
+class PostSearchResult(PostOut):
+    snippet: str = ""
+    # (start, end) character offsets of the matched terms within ``snippet``.
+    highlights: List[Tuple[int, int]] = []
+
+
 class PostDetail(PostOut):
+    # Newest-first first pages; pass the cursors to /posts/{id}/comments and
+    # /posts/{id}/ratings for the rest. None when the first page is everything.
     comments: List[CommentOut] = []
     ratings: List[RatingOut] = []
+    rating_count: int = 0
+    comments_cursor: Optional[str] = None
+    ratings_cursor: Optional[str] = None
 
 
 class UploadResponse(BaseModel):
@@ -1,15 +1,34 @@
+import asyncio
+import gc
+
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
 
 load_dotenv()
 
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
+from sqlalchemy import exc
 
-from app.core.database import Base, engine
+from app.core.database import AsyncSessionLocal, Base, engine
+from app.core.export import WATERMARK_HEADER
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.passwords import password_hasher
+from app.core.pool import check_connection_budget
+from app.core.purge import resume_pending_purges
+from app.core.ranking import run_redecay_loop
+from app.core.ratings import RATING_WRITE_BEHIND_MS, rating_buffer, run_flush_loop
+from app.core.replicas import StickyWriteMiddleware, replica_set, run_health_loop
+from app.core.rollups import STATS_ROLLUP_INTERVAL_SECONDS, run_rollup_loop
+from app.core.search import create_search_index
+from app.core.sketches import ACTIVE_SKETCH_FLUSH_SECONDS, active_users, run_sketch_flush_loop
+from app.core.suggestion_job import SUGGESTIONS_REFRESH_INTERVAL_SECONDS, run_refresh_loop
+from app.core.write_queue import write_queue
 from app.routers import (
     auth_router,
     assistant_router,
+    export_router,
     friends_router,
     interactions_router,
     posts_router,
@@ -27,7 +46,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, WATERMARK_HEADER],
 )
+app.add_middleware(StickyWriteMiddleware)
+
+
+@app.exception_handler(exc.TimeoutError)
+async def pool_timeout_handler(request: Request, error: exc.TimeoutError) -> JSONResponse:
+    # Every pooled connection stayed busy for DB_POOL_TIMEOUT: shed the request.
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Database busy, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -36,6 +68,48 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 async def on_startup() -> None:
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(create_search_index)
+    await check_connection_budget(engine)
+    # Move everything allocated at import time out of the collector's reach so full
+    # collections only scan request-time objects instead of stalling the tail latency.
+    gc.freeze()
+    app.state.redecay_task = asyncio.create_task(run_redecay_loop(AsyncSessionLocal))
+    app.state.rating_flush_task = (
+        asyncio.create_task(run_flush_loop(AsyncSessionLocal)) if RATING_WRITE_BEHIND_MS else None
+    )
+    app.state.replica_health_task = asyncio.create_task(run_health_loop()) if replica_set.replicas else None
+    app.state.suggestions_task = (
+        asyncio.create_task(run_refresh_loop(AsyncSessionLocal)) if SUGGESTIONS_REFRESH_INTERVAL_SECONDS else None
+    )
+    app.state.rollup_task = (
+        asyncio.create_task(run_rollup_loop(AsyncSessionLocal)) if STATS_ROLLUP_INTERVAL_SECONDS else None
+    )
+    app.state.sketch_flush_task = (
+        asyncio.create_task(run_sketch_flush_loop(AsyncSessionLocal)) if ACTIVE_SKETCH_FLUSH_SECONDS else None
+    )
+    await resume_pending_purges(AsyncSessionLocal)
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    app.state.redecay_task.cancel()
+    await write_queue.close()
+    password_hasher.close()
+    if app.state.replica_health_task:
+        app.state.replica_health_task.cancel()
+    if app.state.suggestions_task:
+        app.state.suggestions_task.cancel()
+    if app.state.rollup_task:
+        app.state.rollup_task.cancel()
+    if app.state.rating_flush_task:
+        app.state.rating_flush_task.cancel()
+        # Write out what was acknowledged but not flushed yet.
+        async with AsyncSessionLocal() as db:
+            await rating_buffer.flush(db)
+    if app.state.sketch_flush_task:
+        app.state.sketch_flush_task.cancel()
+        async with AsyncSessionLocal() as db:
+            await active_users.flush(db)
 
 
 @app.get("/")
@@ -51,3 +125,4 @@ app.include_router(upload_router)
 app.include_router(users_router)
 app.include_router(friends_router)
 app.include_router(stats_router)
+app.include_router(export_router)
@@ -0,0 +1,181 @@
+"""Shared helpers for the scripts/bench_*.py load benchmarks.
+
+The benchmarks drive the real FastAPI app in-process through httpx's ASGI transport
+against a scratch database, so they can be run against any revision of the backend.
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Add parent dir to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PASSWORD = "bench-password"
+TAGS = ["bench", "travel", "food", "tech", "music"]
+
+
+def prepare(database_url=None):
+    """Point the app at ``database_url`` (default: a fresh SQLite file) and import it."""
+    if database_url is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="bench-"), "bench.db")
+        database_url = f"sqlite+aiosqlite:///{path}"
+    os.environ["DATABASE_URL"] = database_url
+    import main
+
+    return main.app
+
+
+def client(app):
+    import httpx
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+
+async def create_schema(app):
+    for handler in app.router.on_startup:
+        await handler()
+
+
+async def seed(users=50, posts_per_user=40, comments_per_post=10, ratings_per_post=10, follows_per_user=20):
+    """Bulk-insert a synthetic social graph; returns the list of user ids."""
+    from sqlalchemy import insert
+
+    from app.core.database import AsyncSessionLocal
+    from app.core.security import hash_password
+    from app.models import Comment, Follow, MediaType, Post, PostTag, Rating, Tag, User
+
+    rng = random.Random(42)
+    password_hash = hash_password(PASSWORD)
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            insert(User),
+            [{"username": f"user{i}", "password_hash": password_hash, "nickname": f"User {i}"} for i in range(users)],
+        )
+        user_ids = list(range(1, users + 1))
+        posts = []
+        for n in range(users * posts_per_user):
+            posts.append(
+                {
+                    "user_id": rng.choice(user_ids),
+                    "content": f"bench post {n} #bench",
+                    "media_type": MediaType.TEXT,
+                    "media_urls": [],
+                    "created_at": now - timedelta(seconds=users * posts_per_user - n),
+                }
+            )
+        await db.execute(insert(Post), posts)
+        post_ids = range(1, len(posts) + 1)
+        await db.execute(insert(Tag), [{"name": name} for name in TAGS])
+        await db.execute(
+            insert(PostTag),
+            [
+                {"post_id": pid, "tag_id": tag_id}
+                for pid in post_ids
+                for tag_id in rng.sample(range(1, len(TAGS) + 1), 2)
+            ],
+        )
+        await db.execute(
+            insert(Comment),
+            [
+                {"post_id": pid, "user_id": rng.choice(user_ids), "content": "bench comment"}
+                for pid in post_ids
+                for _ in range(comments_per_post)
+            ],
+        )
+        ratings = []
+        for pid in post_ids:
+            for uid in rng.sample(user_ids, min(ratings_per_post, users)):
+                ratings.append({"post_id": pid, "user_id": uid, "score": rng.randint(1, 5)})
+        await db.execute(insert(Rating), ratings)
+        follows = []
+        for uid in user_ids:
+            for target in rng.sample(user_ids, min(follows_per_user + 1, users)):
+                if target != uid:
+                    follows.append({"follower_id": uid, "followed_id": target})
+        await db.execute(insert(Follow), follows)
+        await db.commit()
+
+        # Derived data introduced after the baseline; absent on older revisions.
+        try:
+            from app.core.counters import repair_post_counters
+
+            await repair_post_counters(db)
+        except ImportError:
+            pass
+        try:
+            from app.core.follows import repair_follow_counts
+
+            await repair_follow_counts(db)
+        except ImportError:
+            pass
+        try:
+            from app.core.timeline import rebuild_timelines
+
+            await rebuild_timelines(db)
+        except ImportError:
+            pass
+    return user_ids
+
+
+async def login(http, user_id):
+    response = await http.post("/auth/token", data={"username": f"user{user_id - 1}", "password": PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@contextmanager
+def count_statements(latency_ms=0.0, pattern=None):
+    """Count SQL statements issued while active, optionally adding a fixed per-statement delay.
+
+    The delay stands in for the network round trip to a remote database server. With a
+    ``pattern`` (a regular expression), statements matching it are also counted apart.
+    """
+    import re
+
+    from sqlalchemy import event
+
+    from app.core import database
+
+    # Revisions with a separate SQLite read pool have a second engine to watch.
+    engines = {database.engine, getattr(database, "read_engine", database.engine)}
+    counter = {"statements": 0, "matching": 0}
+    matcher = re.compile(pattern) if pattern else None
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter["statements"] += 1
+        if matcher is not None and matcher.search(statement):
+            counter["matching"] += 1
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+
+    for engine in engines:
+        event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        for engine in engines:
+            event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def report(label, samples_ms, **extra):
+    fields = " ".join(f"{key}={value}" for key, value in extra.items())
+    print(
+        f"{label:<28} n={len(samples_ms):<5} p50={percentile(samples_ms, 50):7.2f}ms "
+        f"p99={percentile(samples_ms, 99):7.2f}ms mean={statistics.fmean(samples_ms):7.2f}ms {fields}"
+    )
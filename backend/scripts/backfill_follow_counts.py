@@ -0,0 +1,58 @@
+import asyncio
+import os
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Add parent dir to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+
+from app.core.database import AsyncSessionLocal, Base, engine
+from app.core.follows import repair_follow_counts
+from app.models import Follow, User
+
+COUNTER_COLUMNS = {
+    "follower_count": "INTEGER NOT NULL DEFAULT 0",
+    "following_count": "INTEGER NOT NULL DEFAULT 0",
+}
+
+
+def _add_missing_columns(sync_conn) -> list[str]:
+    # Databases created before the counters existed only get new tables from create_all.
+    inspector = inspect(sync_conn)
+    added = []
+    existing = {col["name"] for col in inspector.get_columns(User.__tablename__)}
+    for name, ddl in COUNTER_COLUMNS.items():
+        if name not in existing:
+            sync_conn.execute(text(f"ALTER TABLE {User.__tablename__} ADD COLUMN {name} {ddl}"))
+            added.append(f"{User.__tablename__}.{name}")
+    existing = {col["name"] for col in inspector.get_columns(Follow.__tablename__)}
+    if "created_at" not in existing:
+        # SQLite cannot add a column defaulting to CURRENT_TIMESTAMP. Existing follows all
+        # get the migration time and are paged among themselves by user id.
+        sync_conn.execute(text(f"ALTER TABLE {Follow.__tablename__} ADD COLUMN created_at TIMESTAMP"))
+        sync_conn.execute(text(f"UPDATE {Follow.__tablename__} SET created_at = CURRENT_TIMESTAMP"))
+        added.append(f"{Follow.__tablename__}.created_at")
+    for index in Follow.__table__.indexes:
+        index.create(sync_conn, checkfirst=True)
+    return added
+
+
+async def backfill():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        added = await conn.run_sync(_add_missing_columns)
+    if added:
+        print(f"Added columns: {', '.join(added)}")
+
+    async with AsyncSessionLocal() as db:
+        repaired = await repair_follow_counts(db)
+    print(f"Recomputed follow counts for {repaired} users.")
+
+
+if __name__ == "__main__":
+    asyncio.run(backfill())
@@ -0,0 +1,61 @@
+import asyncio
+import os
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Add parent dir to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+
+from app.core.counters import repair_post_counters
+from app.core.database import AsyncSessionLocal, Base, engine
+from app.core.ranking import redecay_hot_scores
+from app.models import Post, PostTag
+
+COUNTER_COLUMNS = {
+    "comment_count": "INTEGER NOT NULL DEFAULT 0",
+    "rating_sum": "INTEGER NOT NULL DEFAULT 0",
+    "rating_count": "INTEGER NOT NULL DEFAULT 0",
+    "hot_score": "FLOAT NOT NULL DEFAULT 0",
+    # SQLite cannot add a column defaulting to CURRENT_TIMESTAMP; filled in below.
+    "last_interaction_at": "TIMESTAMP",
+}
+
+
+def _add_missing_counter_columns(sync_conn) -> list[str]:
+    # Databases created before the counters existed only get new tables from create_all.
+    existing = {col["name"] for col in inspect(sync_conn).get_columns(Post.__tablename__)}
+    added = []
+    for name, ddl in COUNTER_COLUMNS.items():
+        if name not in existing:
+            sync_conn.execute(text(f"ALTER TABLE {Post.__tablename__} ADD COLUMN {name} {ddl}"))
+            added.append(name)
+    if "last_interaction_at" in added:
+        sync_conn.execute(text(f"UPDATE {Post.__tablename__} SET last_interaction_at = updated_at"))
+    # create_all does not add indexes to tables that already exist: the feeds' keyset
+    # indexes (tag pages included) and sort=hot's all need creating here.
+    for table in (Post.__table__, PostTag.__table__):
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+    return added
+
+
+async def backfill():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        added = await conn.run_sync(_add_missing_counter_columns)
+    if added:
+        print(f"Added columns: {', '.join(added)}")
+
+    async with AsyncSessionLocal() as db:
+        repaired = await repair_post_counters(db)
+        await redecay_hot_scores(db, window_days=None)
+    print(f"Recomputed counters and hot scores for {repaired} posts.")
+
+
+if __name__ == "__main__":
+    asyncio.run(backfill())
@@ -0,0 +1,130 @@
+"""Latency and accuracy of GET /stats/active, against an exact COUNT(DISTINCT) scan.
+
+Usage: python scripts/bench_active.py [--users 200000] [--daily-users 20000] [--days 90]
+
+Each of the last ``--days`` days gets ``--daily-users`` random active users, stored both
+as posts (what an exact query has to scan) and as that day's sketch. Reported: the
+endpoint per granularity over the whole range, the exact distinct count of the last
+30 days, the sketch's error against it, the stored size of a day's sketch, and the
+cost of recording and flushing one day's activity.
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+
+import _bench
+
+
+async def _seed(args, rng):
+    import numpy as np
+    from sqlalchemy import func, insert, select
+
+    from app.core.database import AsyncSessionLocal
+    from app.core.sketches import merge_day, sketch
+    from app.models import ActiveUserSketch, MediaType, Post, User
+
+    today = datetime.utcnow().date()
+    async with AsyncSessionLocal() as db:
+        for start in range(0, args.users, 10_000):
+            await db.execute(
+                insert(User),
+                [{"username": f"user{i}", "password_hash": "x"} for i in range(start, min(start + 10_000, args.users))],
+            )
+        await db.commit()
+        daily = {}
+        for offset in range(args.days):
+            day = today - timedelta(days=offset)
+            user_ids = rng.choice(np.arange(1, args.users + 1), size=args.daily_users, replace=False)
+            daily[day] = user_ids
+            at = datetime.combine(day, datetime.min.time()) + timedelta(hours=12)
+            await db.execute(
+                insert(Post),
+                [
+                    {"user_id": int(uid), "content": "x", "media_type": MediaType.TEXT, "media_urls": [], "created_at": at}
+                    for uid in user_ids
+                ],
+            )
+            await merge_day(db, day, sketch(user_ids.tolist()))
+            await db.commit()
+        size = (await db.execute(select(func.avg(func.length(ActiveUserSketch.registers))))).scalar_one()
+    return daily, size
+
+
+async def run(args):
+    import numpy as np
+
+    os.environ["STATS_ROLLUP_INTERVAL_SECONDS"] = "0"
+    app = _bench.prepare(args.database_url)
+    await _bench.create_schema(app)
+    rng = np.random.default_rng(42)
+    daily, size = await _seed(args, rng)
+    print(f"sketch bytes per day: {size:.0f}")
+
+    from sqlalchemy import func, select
+
+    from app.core.database import AsyncSessionLocal
+    from app.core.rollups import stats_cache
+    from app.core.sketches import ActiveUserRecorder
+    from app.models import Post
+
+    today = datetime.utcnow().date()
+    first = today - timedelta(days=args.days - 1)
+    async with _bench.client(app) as http:
+        for granularity in ("day", "week", "month"):
+            params = {"from": first.isoformat(), "to": today.isoformat(), "granularity": granularity}
+            samples = []
+            for _ in range(args.requests):
+                stats_cache.clear()
+                started = time.perf_counter()
+                response = await http.get("/stats/active", params=params)
+                samples.append((time.perf_counter() - started) * 1000)
+                response.raise_for_status()
+            _bench.report(f"active by {granularity}", samples, buckets=len(response.json()["buckets"]))
+
+        month_start = today - timedelta(days=29)
+        params = {"from": month_start.isoformat(), "to": today.isoformat(), "granularity": "month"}
+        stats_cache.clear()
+        estimated = (await http.get("/stats/active", params=params)).json()["total"]
+    exact = len(np.unique(np.concatenate([ids for day, ids in daily.items() if day >= month_start])))
+    samples = []
+    async with AsyncSessionLocal() as db:
+        for _ in range(max(1, args.requests // 10)):
+            started = time.perf_counter()
+            counted = (
+                await db.execute(
+                    select(func.count(func.distinct(Post.user_id))).where(
+                        Post.created_at >= datetime.combine(month_start, datetime.min.time())
+                    )
+                )
+            ).scalar_one()
+            samples.append((time.perf_counter() - started) * 1000)
+    assert counted == exact
+    _bench.report("exact 30-day distinct (SQL)", samples, exact=exact, sketch=estimated, error=f"{(estimated - exact) / exact:+.2%}")
+
+    recorder = ActiveUserRecorder()
+    ids = rng.choice(np.arange(1, args.users + 1), size=args.daily_users, replace=False).tolist()
+    started = time.perf_counter()
+    for uid in ids:
+        recorder.record(uid)
+    recorded = (time.perf_counter() - started) * 1e6 / len(ids)
+    async with AsyncSessionLocal() as db:
+        started = time.perf_counter()
+        await recorder.flush(db)
+        flushed = (time.perf_counter() - started) * 1000
+    print(f"record: {recorded:.2f}us per call; flush of {len(ids)} ids into an existing day: {flushed:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="defaults to a scratch SQLite file")
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--daily-users", type=int, default=20_000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--requests", type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Users lookups per request under mixed authenticated load, with and without the
+principal cache.
+
+Usage: python scripts/bench_auth.py [--requests 4000] [--concurrency 32] [--latency-ms 0.5]
+
+Logged-in clients page the feed, open posts, read /auth/me, comment and rate. The same
+request mix runs twice: with AUTH_PRINCIPAL_TTL_SECONDS at 0 (a users lookup per
+authenticated request, as before the cache) and at its configured value, starting cold
+both times, after an unreported warm-up pass. ``--latency-ms`` adds a delay per statement to stand in for a remote database.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import _bench
+
+# The principal lookup: active user by id.
+USER_LOOKUP = r"FROM users\s+WHERE users\.id = \S+ AND users\.deleted_at IS NULL"
+
+
+async def _load(http, tokens, args, seed):
+    rng = random.Random(seed)
+    posts = range(1, args.users * 10 + 1)
+    samples = {"read": [], "write": []}
+    pending = iter(range(args.requests))
+
+    async def client():
+        for _ in pending:
+            headers = rng.choice(tokens)
+            roll = rng.random()
+            kind = "read" if roll < 0.8 else "write"
+            if roll < 0.4:
+                call = http.get("/posts", params={"limit": 20}, headers=headers)
+            elif roll < 0.7:
+                call = http.get(f"/posts/{rng.choice(posts)}", headers=headers)
+            elif roll < 0.8:
+                call = http.get("/auth/me", headers=headers)
+            elif roll < 0.9:
+                call = http.post(f"/posts/{rng.choice(posts)}/comments", json={"content": "nice"}, headers=headers)
+            else:
+                call = http.post(f"/posts/{rng.choice(posts)}/rate", json={"score": rng.randint(1, 5)}, headers=headers)
+            started = time.perf_counter()
+            response = await call
+            response.raise_for_status()
+            samples[kind].append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(args.concurrency)))
+    return samples, time.perf_counter() - started
+
+
+async def run(args):
+    app = _bench.prepare(args.database_url)
+    await _bench.create_schema(app)
+    user_ids = await _bench.seed(users=args.users, posts_per_user=10, comments_per_post=3, ratings_per_post=3)
+
+    from app.core.principals import principal_cache
+
+    configured_ttl = principal_cache.ttl_seconds
+    async with _bench.client(app) as http:
+        tokens = [await _bench.login(http, user_id) for user_id in user_ids]
+        # Unreported: warms the feed cache and follow graph for both measured runs.
+        principal_cache.ttl_seconds = 0.0
+        await _load(http, tokens, args, seed=7)
+        for label, ttl in (("no principal cache", 0.0), (f"principal cache {configured_ttl:g}s", configured_ttl)):
+            principal_cache.clear()
+            principal_cache.ttl_seconds = ttl
+            with _bench.count_statements(args.latency_ms, USER_LOOKUP) as counter:
+                samples, elapsed = await _load(http, tokens, args, seed=7)
+            total = len(samples["read"]) + len(samples["write"])
+            print(
+                f"{label}: {total / elapsed:.0f} req/s, {counter['statements'] / total:.2f} statements/req, "
+                f"{counter['matching']} users lookups"
+            )
+            for kind in ("read", "write"):
+                _bench.report(f"  {kind}s", samples[kind])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="defaults to a scratch SQLite file")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Mixed read/write throughput under concurrent clients.
+
+Usage: python scripts/bench_concurrency.py [--seconds 10] [--writers 16] [--readers 8]
+
+Writers keep commenting on and rating a handful of posts while readers page the feed
+and open post details. Requests that fail, e.g. with "database is locked", are counted
+rather than retried. Meant for the default SQLite setup; pass --database-url to compare.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import _bench
+
+
+async def run(args):
+    app = _bench.prepare(args.database_url)
+    await _bench.create_schema(app)
+    user_ids = await _bench.seed(users=args.users, posts_per_user=10, comments_per_post=3, ratings_per_post=3)
+    hot_posts = list(range(1, args.hot_posts + 1))
+
+    async with _bench.client(app) as http:
+        tokens = [await _bench.login(http, user_id) for user_id in user_ids]
+        rng = random.Random(11)
+        results = {"write": [], "read": []}
+        errors = {"write": 0, "read": 0}
+
+        async def request(kind, call):
+            started = time.perf_counter()
+            try:
+                response = await call()
+                ok = response.status_code < 400
+            except Exception:
+                ok = False
+            if ok:
+                results[kind].append((time.perf_counter() - started) * 1000)
+            else:
+                errors[kind] += 1
+
+        async def writer(deadline):
+            while time.perf_counter() < deadline:
+                headers = rng.choice(tokens)
+                post_id = rng.choice(hot_posts)
+                if rng.random() < 0.5:
+                    call = lambda: http.post(f"/posts/{post_id}/comments", json={"content": "nice"}, headers=headers)
+                else:
+                    score = rng.randint(1, 5)
+                    call = lambda: http.post(f"/posts/{post_id}/rate", json={"score": score}, headers=headers)
+                await request("write", call)
+
+        async def reader(deadline):
+            while time.perf_counter() < deadline:
+                headers = rng.choice(tokens)
+                if rng.random() < 0.5:
+                    call = lambda: http.get("/posts", params={"limit": 20}, headers=headers)
+                else:
+                    post_id = rng.choice(hot_posts)
+                    call = lambda: http.get(f"/posts/{post_id}", headers=headers)
+                await request("read", call)
+
+        with _bench.count_statements(args.latency_ms):
+            started = time.perf_counter()
+            deadline = started + args.seconds
+            await asyncio.gather(
+                *(writer(deadline) for _ in range(args.writers)),
+                *(reader(deadline) for _ in range(args.readers)),
+            )
+            elapsed = time.perf_counter() - started
+        for kind, clients in (("write", args.writers), ("read", args.readers)):
+            samples = results[kind] or [0.0]
+            _bench.report(
+                f"{kind}s x{clients}",
+                samples,
+                per_s=round(len(results[kind]) / elapsed),
+                errors=errors[kind],
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="defaults to a scratch SQLite file")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--hot-posts", type=int, default=5)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--writers", type=int, default=16)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Write throughput of POST /posts and POST /posts/batch.
+
+Usage: python scripts/bench_create_post.py [--posts 500] [--concurrency 8] [--batch-size 50]
+
+Each post carries a mix of existing and brand-new tags. Concurrent writers share a small
+pool of new tag names so they race to create the same tags.
+"""
+import argparse
+import asyncio
+import time
+
+import _bench
+
+
+def payload(n, new_tags):
+    return {
+        "content": f"bench write {n}",
+        "media_type": "text",
+        "media_urls": [],
+        "tags": ["bench", "travel", f"new{n % new_tags}"],
+    }
+
+
+async def run(args):
+    app = _bench.prepare(args.database_url)
+    await _bench.create_schema(app)
+    user_ids = await _bench.seed(users=args.users, posts_per_user=5)
+
+    async with _bench.client(app) as http:
+        author = await _bench.login(http, user_ids[0])
+
+        samples = []
+        with _bench.count_statements(args.latency_ms) as counter:
+            started = time.perf_counter()
+            for n in range(args.posts):
+                t0 = time.perf_counter()
+                response = await http.post("/posts", json=payload(n, args.posts), headers=author)
+                samples.append((time.perf_counter() - t0) * 1000)
+                response.raise_for_status()
+            elapsed = time.perf_counter() - started
+        _bench.report(
+            "sequential",
+            samples,
+            posts_per_s=round(args.posts / elapsed),
+            statements_per_post=counter["statements"] / args.posts,
+        )
+
+        failures = 0
+        samples = []
+
+        async def write(n):
+            nonlocal failures
+            t0 = time.perf_counter()
+            response = await http.post("/posts", json=payload(args.posts + n, args.new_tags), headers=author)
+            samples.append((time.perf_counter() - t0) * 1000)
+            failures += response.status_code != 201
+
+        with _bench.count_statements(args.latency_ms):
+            started = time.perf_counter()
+            for offset in range(0, args.posts, args.concurrency):
+                await asyncio.gather(*(write(offset + i) for i in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+        _bench.report(
+            f"concurrent x{args.concurrency}",
+            samples,
+            posts_per_s=round(len(samples) / elapsed),
+            failures=failures,
+        )
+
+        batch = [payload(2 * args.posts + n, args.posts) for n in range(args.batch_size)]
+        probe = await http.post("/posts/batch", json={"posts": batch[:1]}, headers=author)
+        if probe.status_code == 404 or probe.status_code == 405:
+            print("batch endpoint not available")
+            return
+        samples = []
+        with _bench.count_statements(args.latency_ms) as counter:
+            started = time.perf_counter()
+            for _ in range(max(1, args.posts // args.batch_size)):
+                t0 = time.perf_counter()
+                response = await http.post("/posts/batch", json={"posts": batch}, headers=author)
+                samples.append((time.perf_counter() - t0) * 1000)
+                response.raise_for_status()
+            elapsed = time.perf_counter() - started
+        written = len(samples) * args.batch_size
+        _bench.report(
+            f"batch of {args.batch_size}",
+            samples,
+            posts_per_s=round(written / elapsed),
+            statements_per_post=round(counter["statements"] / written, 2),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="defaults to a scratch SQLite file")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--posts", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--new-tags", type=int, default=4, help="distinct new tags the concurrent writers race on")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=1.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Latency and statement count of GET /stats/dashboard, and the cost of the rollups behind it.
+
+Usage: python scripts/bench_dashboard.py [--users 2000] [--days 90] [--requests 50]
+
+Seeded rows are spread evenly over the last ``--days`` days. "dashboard uncached"
+clears the stats cache before every request, so it measures the rollup reads;
+"dashboard cached" is a refresh storm hitting the cache. Revisions without rollups
+compute everything from the source tables on every request.
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+
+import _bench
+
+
+async def _spread(days):
+    from sqlalchemy import select, update
+
+    from app.core.database import AsyncSessionLocal
+    from app.models import Comment, Post, Rating, User
+
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        for model in (User, Post, Comment, Rating):
+            ids = (await db.execute(select(model.id).order_by(model.id))).scalars().all()
+            step = days * 86400 / max(1, len(ids))
+            rows = [{"id": id_, "created_at": now - timedelta(seconds=(len(ids) - i) * step)} for i, id_ in enumerate(ids)]
+            for start in range(0, len(rows), 10_000):
+                await db.execute(update(model), rows[start : start + 10_000])
+            await db.commit()
+
+
+async def run(args):
+    # Rollups are run explicitly below, not by the app's background loop.
+    os.environ["STATS_ROLLUP_INTERVAL_SECONDS"] = "0"
+    app = _bench.prepare(args.database_url)
+    await _bench.create_schema(app)
+    await _bench.seed(users=args.users, posts_per_user=10, comments_per_post=5, ratings_per_post=5, follows_per_user=1)
+    await _spread(args.days)
+
+    try:
+        from app.core import rollups
+    except ImportError:
+        rollups = None
+    if rollups is not None:
+        from app.core.database import AsyncSessionLocal
+
+        async with AsyncSessionLocal() as db:
+            for label, since in (("rollup full", None), ("rollup reopened days", "reopened")):
+                if since == "reopened":
+                    since = await rollups.reopened_since(db)
+                started = time.perf_counter()
+                days = await rollups.roll_up(db, since)
+                print(f"{label:<28} days={days} {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    async with _bench.client(app) as http:
+        modes = [("dashboard uncached", True)]
+        if rollups is not None:
+            modes.append(("dashboard cached", False))
+        for label, clear in modes:
+            (await http.get("/stats/dashboard")).raise_for_status()  # warm up
+            samples = []
+            with _bench.count_statements(args.latency_ms) as counter:
+                for _ in range(args.requests):
+                    if clear and rollups is not None:
+                        rollups.stats_cache.clear()
+                    started = time.perf_counter()
+                    response = await http.get("/stats/dashboard")
+                    samples.append((time.perf_counter() - started) * 1000)
+                    response.raise_for_status()
+            _bench.report(label, samples, statements_per_request=counter["statements"] / args.requests)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="defaults to a scratch SQLite file")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
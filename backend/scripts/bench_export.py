@@ -0,0 +1,109 @@
+"""Full-table export of posts: /export/posts against paging GET /posts with skip.
+
+Usage: python scripts/bench_export.py [--posts 100000] [--page-size 100]
+
+The export is timed by running the response body generator directly: httpx's ASGI
+transport buffers whole responses, which would hide the streaming. Peak memory is what
+tracemalloc sees allocated during a separate export run; it should stay flat as
+``--posts`` grows. The paging client walks ``skip`` the way the old scraper did, with
+``comment_preview=0``; ``--max-pages`` caps it on large tables.
+"""
+import argparse
+import asyncio
+import os
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import _bench
+
+
+async def _seed(posts):
+    from sqlalchemy import insert
+
+    from app.core.database import AsyncSessionLocal
+    from app.models import MediaType, Post, User
+
+    now = datetime.utcnow() - timedelta(minutes=1)
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(User), [{"username": "author", "password_hash": "x"}])
+        for start in range(0, posts, 20_000):
+            await db.execute(
+                insert(Post),
+                [
+                    {
+                        "user_id": 1,
+                        "content": f"bench post {n} with a little more text to export, as posts have",
+                        "media_type": MediaType.IMAGE,
+                        "media_urls": [f"/static/uploads/{n}.jpg"],
+                        "created_at": now - timedelta(seconds=posts - n),
+                    }
+                    for n in range(start, min(start + 20_000, posts))
+                ],
+            )
+            await db.commit()
+
+
+async def _export(fmt, gzip):
+    from app.core.database import AsyncSessionLocal
+    from app.core.export import export_rows, watermark
+
+    size = 0
+    async for chunk in export_rows(AsyncSessionLocal, "posts", fmt, None, watermark(), gzip):
+        size += len(chunk)
+    return size
+
+
+async def run(args):
+    os.environ["STATS_ROLLUP_INTERVAL_SECONDS"] = "0"
+    os.environ["ACTIVE_SKETCH_FLUSH_SECONDS"] = "0"
+    app = _bench.prepare(args.database_url)
+    await _bench.create_schema(app)
+    await _seed(args.posts)
+
+    for fmt, gzip in (("ndjson", False), ("csv", False), ("ndjson", True), ("csv", True)):
+        started = time.perf_counter()
+        size = await _export(fmt, gzip)
+        elapsed = time.perf_counter() - started
+        tracemalloc.start()
+        await _export(fmt, gzip)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        _bench.report(
+            f"export {fmt}{' gzip' if gzip else ''}",
+            [elapsed * 1000],
+            rows_per_s=round(args.posts / elapsed),
+            mb=f"{size / 2**20:.1f}",
+            peak_mb=f"{peak / 2**20:.1f}",
+        )
+
+    pages = min(args.max_pages, -(-args.posts // args.page_size))
+    samples = []
+    async with _bench.client(app) as http:
+        for page in range(pages):
+            started = time.perf_counter()
+            response = await http.get(
+                "/posts", params={"skip": page * args.page_size, "limit": args.page_size, "comment_preview": 0}
+            )
+            response.raise_for_status()
+            samples.append((time.perf_counter() - started) * 1000)
+    total = sum(samples) / 1000
+    _bench.report(
+        f"GET /posts skip ({pages} pages)",
+        samples,
+        total_s=f"{total:.1f}",
+        rows_per_s=round(pages * args.page_size / total),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="defaults to a scratch SQLite file")
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--max-pages", type=int, default=1000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Latency and round-trip count of GET /posts.
+
+Usage: python scripts/bench_feed.py [--requests 300] [--limit 20] [--latency-ms 1.0]
+
+--latency-ms adds a fixed sleep per SQL statement to model a remote database, which is
+where the number of sequential round trips per request dominates.
+"""
+import argparse
+import asyncio
+import time
+
+import _bench
+
+
+async def run(args):
+    app = _bench.prepare(args.database_url)
+    await _bench.create_schema(app)
+    user_ids = await _bench.seed(
+        users=args.users, posts_per_user=args.posts_per_user, follows_per_user=args.follows_per_user
+    )
+
+    async with _bench.client(app) as http:
+        viewer = await _bench.login(http, user_ids[0])
+        scenarios = [
+            ("anonymous", {}, {}),
+            ("personalized", {}, viewer),
+            ("following", {"filter": "following"}, viewer),
+            ("tag", {"tag": "bench"}, viewer),
+        ]
+        for label, params, headers in scenarios:
+            params = dict(params, limit=args.limit)
+            await http.get("/posts", params=params, headers=headers)  # warm up
+            samples = []
+            with _bench.count_statements(args.latency_ms) as counter:
+                for _ in range(args.requests):
+                    started = time.perf_counter()
+                    response = await http.get("/posts", params=params, headers=headers)
+                    samples.append((time.perf_counter() - started) * 1000)
+                    response.raise_for_status()
+            _bench.report(label, samples, statements_per_request=counter["statements"] / args.requests)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="defaults to a scratch SQLite file")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--posts-per-user", type=int, default=40)
+    parser.add_argument("--follows-per-user", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=1.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Latency of a popular account's follower list and follow counts, and of follow/unfollow.
+
+Usage: python scripts/bench_follows.py [--followers 5000] [--requests 100]
+
+User 1 is followed by every other seeded user. "profile counts" is what the
+mini-program profile page needs: GET /users/{id}/follow-counts where it exists, else
+both full lists, which is how the page counted before.
+"""
+import argparse
+import asyncio
+import time
+
+import _bench
+
+
+async def _add_star_followers(user_ids):
+    from sqlalchemy import insert, select
+
+    from app.core.database import AsyncSessionLocal
+    from app.models import Follow
+
+    async with AsyncSessionLocal() as db:
+        existing = set((await db.execute(select(Follow.follower_id).where(Follow.followed_id == 1))).scalars())
+        rows = [{"follower_id": uid, "followed_id": 1} for uid in user_ids[1:] if uid not in existing]
+        await db.execute(insert(Follow), rows)
+        await db.commit()
+        try:
+            from app.core.follows import repair_follow_counts
+
+            await repair_follow_counts(db)
+        except ImportError:
+            pass
+
+
+async def run(args):
+    app = _bench.prepare(args.database_url)
+    await _bench.create_schema(app)
+    user_ids = await _bench.seed(
+        users=args.followers + 1, posts_per_user=1, comments_per_post=1, ratings_per_post=1, follows_per_user=1
+    )
+    await _add_star_followers(user_ids)
+
+    async with _bench.client(app) as http:
+        has_counts = (await http.get("/users/1/follow-counts")).status_code == 200
+
+        async def followers():
+            return await http.get("/users/1/followers")
+
+        async def profile_counts():
+            if has_counts:
+                return await http.get("/users/1/follow-counts")
+            await http.get("/users/1/followers")
+            return await http.get("/users/1/following")
+
+        for label, call in (("followers page", followers), ("profile counts", profile_counts)):
+            response = await call()  # warm up
+            samples = []
+            with _bench.count_statements(args.latency_ms) as counter:
+                for _ in range(args.requests):
+                    started = time.perf_counter()
+                    response = await call()
+                    samples.append((time.perf_counter() - started) * 1000)
+                    response.raise_for_status()
+            _bench.report(
+                label,
+                samples,
+                statements_per_request=counter["statements"] / args.requests,
+                response_bytes=len(response.content),
+            )
+
+        headers = await _bench.login(http, user_ids[1])
+        target = user_ids[-1]
+        samples = []
+        with _bench.count_statements(args.latency_ms) as counter:
+            for _ in range(args.requests):
+                started = time.perf_counter()
+                (await http.post(f"/users/{target}/follow", headers=headers)).raise_for_status()
+                (await http.delete(f"/users/{target}/follow", headers=headers)).raise_for_status()
+                samples.append((time.perf_counter() - started) * 1000)
+        _bench.report("follow+unfollow", samples, statements_per_request=counter["statements"] / args.requests)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="defaults to a scratch SQLite file")
+    parser.add_argument("--followers", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Sustained like throughput of POST/DELETE /posts/{id}/rate on a viral post.
+
+Usage: python scripts/bench_likes.py [--seconds 10] [--concurrency 16] [--raters 200] [--write-behind-ms 0]
+
+Concurrent clients keep liking, re-scoring and unliking the same few posts for
+``--seconds``. ``--write-behind-ms`` turns on the buffered mode (RATING_WRITE_BEHIND_MS);
+it is ignored by revisions without it. At the end the posts' counters are compared with
+a recount of the ratings table.
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+import _bench
+
+
+async def check_counters(post_ids):
+    from sqlalchemy import func, select
+
+    from app.core.database import AsyncSessionLocal
+    from app.models import Post, Rating
+
+    async with AsyncSessionLocal() as db:
+        stored = await db.execute(select(Post.id, Post.rating_count, Post.rating_sum).where(Post.id.in_(post_ids)))
+        actual = await db.execute(
+            select(Rating.post_id, func.count(), func.sum(Rating.score))
+            .where(Rating.post_id.in_(post_ids))
+            .group_by(Rating.post_id)
+        )
+    actual = {post_id: (count, total) for post_id, count, total in actual.all()}
+    return all(actual.get(post_id, (0, None)) == (count, total or None) for post_id, count, total in stored.all())
+
+
+async def run(args):
+    if args.write_behind_ms:
+        os.environ["RATING_WRITE_BEHIND_MS"] = str(args.write_behind_ms)
+    app = _bench.prepare(args.database_url)
+    await _bench.create_schema(app)
+    user_ids = await _bench.seed(
+        users=args.raters, posts_per_user=1, comments_per_post=1, ratings_per_post=1, follows_per_user=1
+    )
+    viral = list(range(1, args.posts + 1))
+
+    async with _bench.client(app) as http:
+        raters = [await _bench.login(http, user_id) for user_id in user_ids]
+        rng = random.Random(7)
+        samples = []
+        failures = 0
+
+        async def client(deadline):
+            nonlocal failures
+            while time.perf_counter() < deadline:
+                headers = rng.choice(raters)
+                url = f"/posts/{rng.choice(viral)}/rate"
+                started = time.perf_counter()
+                if rng.random() < 0.2:
+                    response = await http.delete(url, headers=headers)
+                else:
+                    response = await http.post(url, json={"score": rng.randint(1, 5)}, headers=headers)
+                samples.append((time.perf_counter() - started) * 1000)
+                failures += response.status_code >= 400
+
+        with _bench.count_statements(args.latency_ms) as counter:
+            started = time.perf_counter()
+            deadline = started + args.seconds
+            await asyncio.gather(*(client(deadline) for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+            statements = counter["statements"]
+            # Let a buffered mode write out its backlog before checking the counters.
+            for handler in app.router.on_shutdown:
+                await handler()
+        _bench.report(
+            f"likes x{args.concurrency}",
+            samples,
+            likes_per_s=round(len(samples) / elapsed),
+            statements_per_like=round(statements / len(samples), 2),
+            failures=failures,
+            counters_consistent=await check_counters(viral),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="defaults to a scratch SQLite file")
+    parser.add_argument("--raters", type=int, default=200)
+    parser.add_argument("--posts", type=int, default=3, help="viral posts the likes are spread over")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--write-behind-ms", type=float, default=0)
+    parser.add_argument("--latency-ms", type=float, default=1.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Feed latency while a storm of logins hashes passwords on the same worker.
+
+Usage: python scripts/bench_login_storm.py [--seconds 10] [--feed-clients 8] [--login-clients 16]
+
+Feed clients page GET /posts throughout; for the second half of the run, login clients
+keep posting to /auth/token as well. Feed latency is reported separately for the quiet
+and the storm phase, with failed feed requests counted apart. Only HTTP is used, so it
+runs against any revision: compare with one that still hashes on the event loop.
+Logins turned away with 503 are counted and retried after Retry-After.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import _bench
+
+
+async def run(args):
+    app = _bench.prepare(args.database_url)
+    await _bench.create_schema(app)
+    user_ids = await _bench.seed(users=args.users, posts_per_user=10, comments_per_post=3, ratings_per_post=3)
+
+    async with _bench.client(app) as http:
+        tokens = [await _bench.login(http, user_id) for user_id in user_ids[: args.feed_clients]]
+        feed = {"quiet": [], "storm": []}
+        feed_errors = {"quiet": 0, "storm": 0}
+        logins = []
+        rejected = 0
+        phase = "quiet"
+        started = time.perf_counter()
+        deadline = started + args.seconds
+        storm_at = started + args.seconds / 2
+
+        async def feed_client(headers):
+            while time.perf_counter() < deadline:
+                sent = time.perf_counter()
+                response = await http.get("/posts", params={"limit": 20}, headers=headers)
+                if response.status_code >= 400:
+                    # e.g. 503 after DB_POOL_TIMEOUT when a blocked loop held connections
+                    feed_errors[phase] += 1
+                    continue
+                feed[phase].append((time.perf_counter() - sent) * 1000)
+
+        async def login_client(seed):
+            nonlocal rejected
+            rng = random.Random(seed)
+            await asyncio.sleep(max(0.0, storm_at - time.perf_counter()))
+            while time.perf_counter() < deadline:
+                user_id = rng.choice(user_ids)
+                sent = time.perf_counter()
+                response = await http.post(
+                    "/auth/token", data={"username": f"user{user_id - 1}", "password": _bench.PASSWORD}
+                )
+                if response.status_code == 503:
+                    rejected += 1
+                    await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+                    continue
+                response.raise_for_status()
+                logins.append((time.perf_counter() - sent) * 1000)
+
+        async def switch_phase():
+            nonlocal phase
+            await asyncio.sleep(storm_at - time.perf_counter())
+            phase = "storm"
+
+        await asyncio.gather(
+            switch_phase(),
+            *(feed_client(headers) for headers in tokens),
+            *(login_client(i) for i in range(args.login_clients)),
+        )
+
+        half = args.seconds / 2
+        for name in ("quiet", "storm"):
+            _bench.report(
+                f"feed ({name})", feed[name] or [0.0], per_s=round(len(feed[name]) / half), errors=feed_errors[name]
+            )
+        _bench.report(
+            f"logins x{args.login_clients}", logins or [0.0], per_s=round(len(logins) / half, 1), rejected=rejected
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="defaults to a scratch SQLite file")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--feed-clients", type=int, default=8)
+    parser.add_argument("--login-clients", type=int, default=16)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
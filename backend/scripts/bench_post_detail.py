@@ -0,0 +1,89 @@
+"""Latency and body size of GET /posts/{id} for a popular post.
+
+Usage: python scripts/bench_post_detail.py [--comments 5000] [--ratings 2000] [--requests 200]
+
+Measures a plain fetch and, where the server sends an ETag, a re-poll with If-None-Match.
+"""
+import argparse
+import asyncio
+import time
+
+import _bench
+
+
+async def make_popular(post_id, comments, ratings, user_ids):
+    from sqlalchemy import insert
+
+    from app.core.database import AsyncSessionLocal
+    from app.core.security import hash_password
+    from app.models import Comment, Rating, User
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            insert(Comment),
+            [{"post_id": post_id, "user_id": user_ids[i % len(user_ids)], "content": f"comment {i}"} for i in range(comments)],
+        )
+        # Ratings are unique per user, so bring in extra raters.
+        password_hash = hash_password(_bench.PASSWORD)
+        await db.execute(
+            insert(User),
+            [{"username": f"rater{i}", "password_hash": password_hash} for i in range(ratings)],
+        )
+        first = len(user_ids) + 1
+        await db.execute(
+            insert(Rating),
+            [{"post_id": post_id, "user_id": first + i, "score": i % 5 + 1} for i in range(ratings)],
+        )
+        await db.commit()
+        try:
+            from app.core.counters import repair_post_counters
+
+            await repair_post_counters(db)
+        except ImportError:
+            pass
+
+
+async def run(args):
+    app = _bench.prepare(args.database_url)
+    await _bench.create_schema(app)
+    user_ids = await _bench.seed(users=args.users, posts_per_user=2, comments_per_post=2, ratings_per_post=2)
+    await make_popular(1, args.comments, args.ratings, user_ids)
+
+    async with _bench.client(app) as http:
+        viewer = await _bench.login(http, user_ids[0])
+        first = await http.get("/posts/1", headers=viewer)
+        first.raise_for_status()
+        scenarios = [("detail", viewer)]
+        etag = first.headers.get("etag")
+        if etag:
+            scenarios.append(("detail if-none-match", {**viewer, "If-None-Match": etag}))
+        for label, headers in scenarios:
+            samples = []
+            with _bench.count_statements(args.latency_ms) as counter:
+                for _ in range(args.requests):
+                    started = time.perf_counter()
+                    response = await http.get("/posts/1", headers=headers)
+                    samples.append((time.perf_counter() - started) * 1000)
+                    assert response.status_code in (200, 304), response.status_code
+            _bench.report(
+                label,
+                samples,
+                status=response.status_code,
+                bytes=len(response.content),
+                statements_per_request=counter["statements"] / args.requests,
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="defaults to a scratch SQLite file")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--comments", type=int, default=5000)
+    parser.add_argument("--ratings", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=1.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Time and memory of the /stats/retention matrix, against one COUNT(DISTINCT) per cell.
+
+Usage: python scripts/bench_retention.py [--users 100000] [--activity 1000000] [--weeks 12]
+
+Users sign up evenly over the last ``--weeks`` weeks; ``--activity`` posts and comments
+are spread over the time since each author signed up. Peak memory is what tracemalloc
+sees allocated while the matrix is computed (NumPy arrays and fetched rows); the
+database's own sort for the UNION is not included.
+"""
+import argparse
+import asyncio
+import os
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import _bench
+
+
+async def _seed(args):
+    import numpy as np
+    from sqlalchemy import insert
+
+    from app.core.database import AsyncSessionLocal
+    from app.models import Comment, MediaType, Post, User
+
+    rng = np.random.default_rng(42)
+    now = datetime.utcnow()
+    span = args.weeks * 7 * 86400
+    signed_up = np.sort(rng.uniform(0, span, args.users))[::-1]  # seconds ago, oldest first
+    async with AsyncSessionLocal() as db:
+        for start in range(0, args.users, 10_000):
+            await db.execute(
+                insert(User),
+                [
+                    {"username": f"user{i}", "password_hash": "x", "created_at": now - timedelta(seconds=float(signed_up[i]))}
+                    for i in range(start, min(start + 10_000, args.users))
+                ],
+            )
+        await db.execute(insert(Post), [{"user_id": 1, "content": "x", "media_type": MediaType.TEXT, "media_urls": []}])
+        await db.commit()
+        authors = rng.integers(0, args.users, args.activity)
+        ago = signed_up[authors] * rng.random(args.activity)
+        for start in range(0, args.activity, 50_000):
+            chunk = range(start, min(start + 50_000, args.activity))
+            posts = [i for i in chunk if i % 2 == 0]
+            await db.execute(
+                insert(Post),
+                [
+                    {
+                        "user_id": int(authors[i]) + 1,
+                        "content": "x",
+                        "media_type": MediaType.TEXT,
+                        "media_urls": [],
+                        "created_at": now - timedelta(seconds=float(ago[i])),
+                    }
+                    for i in posts
+                ],
+            )
+            await db.execute(
+                insert(Comment),
+                [
+                    {"post_id": 1, "user_id": int(authors[i]) + 1, "content": "x", "created_at": now - timedelta(seconds=float(ago[i]))}
+                    for i in chunk
+                    if i % 2
+                ],
+            )
+            await db.commit()
+
+
+async def _per_cell(db, weeks):
+    """The matrix with one query per cell, for comparison."""
+    from sqlalchemy import func, select, union
+
+    from app.core.rollups import utc_today
+    from app.models import Comment, Post, Rating, User
+
+    today = utc_today()
+    first = today - timedelta(days=today.weekday(), weeks=weeks - 1)
+    matrix = []
+    for c in range(weeks):
+        start = datetime.combine(first + timedelta(weeks=c), datetime.min.time())
+        cohort = select(User.id).where(User.created_at >= start, User.created_at < start + timedelta(weeks=1))
+        row = []
+        for k in range(weeks - c):
+            lo, hi = start + timedelta(weeks=k), start + timedelta(weeks=k + 1)
+            actions = union(
+                *(
+                    select(model.user_id).where(model.user_id.in_(cohort), model.created_at >= lo, model.created_at < hi)
+                    for model in (Post, Comment, Rating)
+                )
+            ).subquery()
+            row.append((await db.execute(select(func.count()).select_from(actions))).scalar_one())
+        matrix.append(row)
+    return matrix
+
+
+async def run(args):
+    os.environ["STATS_ROLLUP_INTERVAL_SECONDS"] = "0"
+    app = _bench.prepare(args.database_url)
+    await _bench.create_schema(app)
+    await _seed(args)
+
+    from app.core.database import AsyncSessionLocal
+    from app.core.retention import _retention
+
+    async with AsyncSessionLocal() as db:
+        samples = []
+        for _ in range(args.requests):
+            started = time.perf_counter()
+            matrix = await _retention(db, args.weeks)
+            samples.append((time.perf_counter() - started) * 1000)
+        # A separate run: tracing slows down the row fetching several times over.
+        tracemalloc.start()
+        await _retention(db, args.weeks)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        _bench.report("retention (numpy)", samples, peak_mb=f"{peak / 2**20:.1f}")
+        if args.per_cell:
+            started = time.perf_counter()
+            cells = await _per_cell(db, args.weeks)
+            elapsed = (time.perf_counter() - started) * 1000
+            _bench.report("retention (query per cell)", [elapsed], queries=sum(len(row) for row in cells))
+            assert cells == [row["active"] for row in matrix["cohorts"]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="defaults to a scratch SQLite file")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--activity", type=int, default=1_000_000)
+    parser.add_argument("--weeks", type=int, default=12)
+    parser.add_argument("--requests", type=int, default=3)
+    parser.add_argument("--per-cell", action="store_true", help="also time one COUNT(DISTINCT) query per cell")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""CPU cost of turning a loaded feed page into a JSON body.
+
+Usage: python scripts/bench_serialize.py [--limit 100] [--comments 20] [--rounds 200]
+
+Compares the Pydantic path the routes used to take (``PostOut.from_orm(...).copy(...)``,
+then FastAPI re-validating against ``response_model`` and ``json.dumps``) with the
+dict builders and encoder in ``app.core.serialize``, on the same ORM objects.
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import List
+
+import _bench
+
+
+def pydantic_body(entries, adapter, PostOut):
+    page = [
+        PostOut.model_validate(post).model_copy(update={"is_following": is_following, "is_liked": is_liked})
+        for post, is_following, is_liked in entries
+    ]
+    content = adapter.dump_python(adapter.validate_python(page, from_attributes=True), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def dict_body(entries, post_dict, dumps):
+    users = {}
+    return dumps([post_dict(post, is_following, is_liked, users=users) for post, is_following, is_liked in entries])
+
+
+def measure(label, build, rounds):
+    build()  # warm up
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        body = build()
+        samples.append((time.perf_counter() - started) * 1000)
+    _bench.report(label, samples, bytes=len(body))
+    return body
+
+
+async def run(args):
+    app = _bench.prepare(args.database_url)
+    await _bench.create_schema(app)
+    await _bench.seed(users=args.users, posts_per_user=args.posts_per_user, comments_per_post=args.comments)
+
+    from pydantic import TypeAdapter
+
+    from app.core.database import AsyncSessionLocal
+    from app.core.feed import feed_query, unpack_feed_rows, viewer_followees
+    from app.core.serialize import dumps, orjson, post_dict
+    from app.models import Post
+    from app.routers.posts import _attach_comment_previews
+    from app.schemas import PostOut
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(feed_query(1).order_by(Post.created_at.desc(), Post.id.desc()).limit(args.limit))
+        entries = unpack_feed_rows(result.all(), await viewer_followees(db, 1))
+        await _attach_comment_previews(db, [post for post, _, _ in entries], args.comments)
+
+        adapter = TypeAdapter(List[PostOut])
+        print(f"{len(entries)} posts x {args.comments} comments, encoder={'orjson' if orjson else 'json'}")
+        old = measure("pydantic from_orm+copy", lambda: pydantic_body(entries, adapter, PostOut), args.rounds)
+        new = measure("dict builders", lambda: dict_body(entries, post_dict, dumps), args.rounds)
+        assert json.loads(old) == json.loads(new), "serializers disagree"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="defaults to a scratch SQLite file")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--posts-per-user", type=int, default=10)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--comments", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=200)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Run time and memory of the follow-suggestion batch job on a synthetic graph.
+
+Usage: python scripts/bench_suggestions.py [--users 100000] [--follows-per-user 10]
+
+Followees are drawn with a heavy-tailed popularity, as on a real network. Reports a full
+run, an incremental run after 1% of users changed their follows, and for comparison the
+per-request SQL friends-of-friends query it replaces. Measure the job's memory by running
+scripts/refresh_suggestions.py in a process of its own against the same --database-url:
+this one also holds the seeding's garbage.
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+import _bench
+
+
+async def seed_graph(users, follows_per_user):
+    from sqlalchemy import insert
+
+    from app.core.database import AsyncSessionLocal
+    from app.models import Follow, User
+
+    rng = np.random.default_rng(7)
+    async with AsyncSessionLocal() as db:
+        for start in range(0, users, 10_000):
+            await db.execute(
+                insert(User),
+                [{"username": f"user{i}", "password_hash": "x"} for i in range(start, min(users, start + 10_000))],
+            )
+        await db.commit()
+        # Zipf-like popularity: a few accounts are followed by a large share of everyone.
+        popularity = 1.0 / np.arange(1, users + 1) ** 0.8
+        popularity /= popularity.sum()
+        followed = rng.choice(users, size=users * follows_per_user, p=popularity) + 1
+        followers = np.repeat(np.arange(1, users + 1), follows_per_user)
+        pairs = np.unique(np.stack([followers, followed], axis=1), axis=0)
+        pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+        for start in range(0, len(pairs), 50_000):
+            chunk = pairs[start : start + 50_000]
+            await db.execute(insert(Follow), [{"follower_id": int(a), "followed_id": int(b)} for a, b in chunk])
+            await db.commit()
+    return len(pairs)
+
+
+async def sql_friends_of_friends(user_ids):
+    from sqlalchemy import func, select
+    from sqlalchemy.orm import aliased
+
+    from app.core.database import AsyncSessionLocal
+    from app.models import Follow
+
+    first, second = aliased(Follow), aliased(Follow)
+    samples = []
+    async with AsyncSessionLocal() as db:
+        for user_id in user_ids:
+            started = time.perf_counter()
+            await db.execute(
+                select(second.followed_id, func.count())
+                .select_from(first)
+                .join(second, second.follower_id == first.followed_id)
+                .where(first.follower_id == user_id, second.followed_id != user_id)
+                .group_by(second.followed_id)
+                .order_by(func.count().desc())
+                .limit(20)
+            )
+            samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+async def run(args):
+    app = _bench.prepare(args.database_url)
+    await _bench.create_schema(app)
+    edges = await seed_graph(args.users, args.follows_per_user)
+    print(f"{args.users} users, {edges} follows")
+
+    from app.core.database import AsyncSessionLocal
+    from app.core.suggestion_job import refresh_suggestions
+    from app.core.suggestions import mark_stale
+
+    async with AsyncSessionLocal() as db:
+        stats = await refresh_suggestions(db, full=True, memory_mb=args.memory_mb)
+        print("full", stats)
+        changed = np.random.default_rng(3).choice(args.users, size=max(1, args.users // 100), replace=False) + 1
+        await mark_stale(db, changed.tolist())
+        await db.commit()
+        stats = await refresh_suggestions(db, memory_mb=args.memory_mb)
+        print("incremental (1% stale)", stats)
+
+    _bench.report("sql friends-of-friends", await sql_friends_of_friends(range(1, args.users + 1, args.users // 50)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="defaults to a scratch SQLite file")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--follows-per-user", type=int, default=10)
+    parser.add_argument("--memory-mb", type=float, default=256)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import asyncio
+import os
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Add parent dir to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, select, text
+
+from app.core.database import AsyncSessionLocal, Base, engine
+from app.core.purge import purge_user
+from app.models import User
+
+
+def _add_deleted_at_column(sync_conn) -> bool:
+    # Databases created before account purging only get new tables from create_all.
+    existing = {col["name"] for col in inspect(sync_conn).get_columns(User.__tablename__)}
+    if "deleted_at" in existing:
+        return False
+    sync_conn.execute(text(f"ALTER TABLE {User.__tablename__} ADD COLUMN deleted_at TIMESTAMP"))
+    return True
+
+
+async def purge_pending():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        if await conn.run_sync(_add_deleted_at_column):
+            print("Added column: deleted_at")
+
+    async with AsyncSessionLocal() as db:
+        user_ids = (await db.execute(select(User.id).where(User.deleted_at.is_not(None)))).scalars().all()
+        for user_id in user_ids:
+            await purge_user(db, user_id)
+            print(f"Purged user {user_id}.")
+    print(f"Purged {len(user_ids)} deleted users.")
+
+
+if __name__ == "__main__":
+    asyncio.run(purge_pending())
@@ -0,0 +1,65 @@
+"""Fill the per-day active user sketches in from posts, comments and ratings.
+
+Merges into what is stored, so it is safe to run while the app is recording: use it
+after deploying the sketches on an existing database, or to repair days whose
+recorded ids were lost (e.g. a worker killed between flushes).
+"""
+import argparse
+import asyncio
+import os
+import sys
+from datetime import date, datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Add parent dir to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from sqlalchemy import select, union
+
+from app.core.database import AsyncSessionLocal, Base, engine
+from app.core.rollups import as_date, utc_day
+from app.core.sketches import REGISTERS, add, merge_day
+from app.models import Comment, Post, Rating
+
+# (day, user) pairs fetched per round trip.
+BATCH = 50_000
+
+
+async def rebuild(args):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    sketches = {}
+    pairs = 0
+    async with AsyncSessionLocal() as db:
+        actions = []
+        for model in (Post, Comment, Rating):
+            action = select(utc_day(db, model.created_at).label("day"), model.user_id.label("user_id"))
+            if args.since:
+                action = action.where(model.created_at >= datetime.combine(args.since, datetime.min.time()))
+            actions.append(action)
+        result = await db.stream(union(*actions).execution_options(yield_per=BATCH))
+        async for partition in result.partitions():
+            by_day = {}
+            for day, user_id in partition:
+                by_day.setdefault(day, []).append(user_id)
+            for day, user_ids in by_day.items():
+                registers = sketches.setdefault(as_date(day), np.zeros(REGISTERS, dtype=np.uint8))
+                add(registers, np.array(user_ids, dtype=np.int64))
+            pairs += len(partition)
+
+    async with AsyncSessionLocal() as db:
+        for day, registers in sorted(sketches.items()):
+            await merge_day(db, day, registers)
+            await db.commit()
+    print(f"Merged {pairs} (day, user) pairs into {len(sketches)} daily sketches.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the active user sketches behind /stats/active")
+    parser.add_argument("--since", type=date.fromisoformat, help="first day to rebuild (YYYY-MM-DD); default every day")
+    asyncio.run(rebuild(parser.parse_args()))
@@ -0,0 +1,39 @@
+import argparse
+import asyncio
+import os
+import sys
+from datetime import date
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Add parent dir to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import AsyncSessionLocal, Base, engine
+from app.core.rollups import roll_up
+from app.models import Comment, Rating, User
+
+
+def _create_indexes(sync_conn) -> None:
+    # create_all does not add indexes to tables that already exist.
+    for table in (User.__table__, Comment.__table__, Rating.__table__):
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+async def rebuild(args):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_create_indexes)
+
+    async with AsyncSessionLocal() as db:
+        days = await roll_up(db, args.since)
+    print(f"Rolled up {days} days of activity.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute the daily activity rollups behind /stats/dashboard")
+    parser.add_argument("--since", type=date.fromisoformat, help="first day to redo (YYYY-MM-DD); default every day")
+    asyncio.run(rebuild(parser.parse_args()))
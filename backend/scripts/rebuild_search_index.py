@@ -0,0 +1,27 @@
+import asyncio
+import os
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Add parent dir to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import AsyncSessionLocal, Base, engine
+from app.core.search import create_search_index, rebuild_search_index
+
+
+async def rebuild():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(create_search_index)
+
+    async with AsyncSessionLocal() as db:
+        indexed = await rebuild_search_index(db)
+    print(f"Indexed {indexed} posts.")
+
+
+if __name__ == "__main__":
+    asyncio.run(rebuild())
@@ -0,0 +1,42 @@
+import asyncio
+import os
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Add parent dir to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect, text
+
+from app.core.database import AsyncSessionLocal, Base, engine
+from app.core.timeline import rebuild_timelines
+from app.models import Post
+
+
+def _add_fanned_out_column(sync_conn) -> bool:
+    # Databases created before timelines existed only get new tables from create_all.
+    existing = {col["name"] for col in inspect(sync_conn).get_columns(Post.__tablename__)}
+    if "fanned_out" in existing:
+        return False
+    sync_conn.execute(
+        text(f"ALTER TABLE {Post.__tablename__} ADD COLUMN fanned_out BOOLEAN NOT NULL DEFAULT '1'")
+    )
+    return True
+
+
+async def rebuild():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        if await conn.run_sync(_add_fanned_out_column):
+            print("Added column: fanned_out")
+
+    async with AsyncSessionLocal() as db:
+        entries = await rebuild_timelines(db)
+    print(f"Wrote {entries} timeline entries.")
+
+
+if __name__ == "__main__":
+    asyncio.run(rebuild())
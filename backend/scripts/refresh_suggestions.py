@@ -0,0 +1,34 @@
+import argparse
+import asyncio
+import os
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Add parent dir to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import AsyncSessionLocal, Base, engine
+from app.core.suggestion_job import SUGGESTIONS_MEMORY_MB, SUGGESTIONS_TOP_K, refresh_suggestions
+
+
+async def refresh(args):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with AsyncSessionLocal() as db:
+        stats = await refresh_suggestions(db, full=args.full, top_k=args.top_k, memory_mb=args.memory_mb)
+    print(
+        f"Scored {stats['users']} users over {stats['edges']} follows in {stats['blocks']} blocks: "
+        f"{stats['suggestions']} suggestions in {stats['seconds']}s."
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute follow suggestions")
+    parser.add_argument("--full", action="store_true", help="every user, not only those marked stale")
+    parser.add_argument("--top-k", type=int, default=SUGGESTIONS_TOP_K)
+    parser.add_argument("--memory-mb", type=float, default=SUGGESTIONS_MEMORY_MB)
+    asyncio.run(refresh(parser.parse_args()))
@@ -13,6 +13,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app.core.database import AsyncSessionLocal, engine, Base
 from app.models import User, Post, Comment, Rating, Tag, Follow
 from app.core.security import hash_password
+from app.core.follows import repair_follow_counts
 from sqlalchemy import select
 
 # Mock data
@@ -221,6 +222,7 @@ async def seed_data():
                     db.add(Follow(follower_id=u.id, followed_id=t.id))
 
         await db.commit()
+        await repair_follow_counts(db)
         print("Seed data generation complete!")
 
 if __name__ == "__main__":